@@ -0,0 +1,63 @@
+"""Benchmark of the `datetime` column construction
+
+Compares the previous row-wise `DataFrame.apply` parsing with
+`dataset.add_datetime` on a synthetic play log, and reports rows/sec.
+
+    python benchmarks/bench_datetime.py -n 2000000
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from radio_repeat.dataset import add_datetime
+
+
+def synthetic_log(n_rows, n_days=365, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.date_range('2020-01-01', periods=n_days).strftime('%Y-%m-%d')
+    minutes = rng.integers(0, 24 * 60, n_rows)
+    return pd.DataFrame({
+        'date': days.to_numpy()[rng.integers(0, n_days, n_rows)],
+        'time': [f'{m // 60:02d}:{m % 60:02d}' for m in minutes],
+    })
+
+
+def rowwise_datetime(df):
+    df['datetime'] = df[['date', 'time']].apply(
+        lambda x: pd.to_datetime(
+            f'{x.date} {x.time}', format='%Y/%m/%d %H:%M'),
+        axis=1)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def rows_per_sec(fn, df):
+    start = time.perf_counter()
+    fn(df.copy())
+    return len(df) / (time.perf_counter() - start)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument('-n', '--rows', type=int, default=2_000_000)
+    parser.add_argument(
+        '--rowwise-rows',
+        type=int,
+        default=50_000,
+        help='rows used for the (slow) row-wise baseline')
+    args = parser.parse_args()
+
+    df = synthetic_log(args.rows)
+    rowwise = rows_per_sec(rowwise_datetime, df[:args.rowwise_rows])
+    vectorized = rows_per_sec(add_datetime, df)
+
+    print(f'row-wise apply: {rowwise:14,.0f} rows/sec')
+    print(f'vectorized:     {vectorized:14,.0f} rows/sec')
+    print(f'speedup:        {vectorized / rowwise:14,.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Micro-benchmark of the html extraction backends
+
+Extracts the plays of the saved fixture pages in tests/fixtures with
+each backend of radio_repeat.extractors and reports pages/sec.
+
+    python benchmarks/bench_extract.py --pad 50
+"""
+import glob
+import os
+import time
+
+from radio_repeat import extractors
+from radio_repeat.scrape_cidadefm import CidadeFM
+from radio_repeat.scrape_comercial import Comercial
+from radio_repeat.scrape_megafm import MegaFM
+from radio_repeat.scrape_rfm import RFM
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, 'tests', 'fixtures')
+STATIONS = [RFM, MegaFM, CidadeFM, Comercial]
+# markup similar to the rest of a station page (menus, banners...)
+FILLER = ('<div class="menu-item"><a href="/programas">Programas</a>'
+          '<span class="icon"></span></div>\n')
+
+
+def load_pages(pad):
+    pages = []
+    for station in STATIONS:
+        paths = glob.glob(os.path.join(FIXTURES_DIR, f'{station.name}*.html'))
+        for path in sorted(paths):
+            with open(path) as f:
+                filler = FILLER * pad
+                pages.append((station.spec, filler + f.read() + filler))
+    return pages
+
+
+def pages_per_sec(extract, pages, seconds):
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for spec, page in pages:
+            extract(page, spec)
+        n += len(pages)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+        '--pad',
+        type=int,
+        default=0,
+        help='filler elements added around each page')
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pad)
+    for spec, page in pages:
+        expected = extractors.extract_bs4(page, spec)
+        for name, extract in extractors.BACKENDS.items():
+            assert extract(page, spec) == expected, name
+
+    print(f'{len(pages)} pages, avg {sum(len(p) for _, p in pages) // len(pages)} bytes')
+    for name, extract in extractors.BACKENDS.items():
+        rate = pages_per_sec(extract, pages, args.seconds)
+        print(f'{name:>6}: {rate:10,.0f} pages/sec')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""Benchmark of the pipeline stages on synthetic play logs
+
+Generates play logs of each size with benchmarks/synth.py, times each
+stage (cleaning, datetime, repetition counts, overlaps, storage) and
+appends a json line per (size, stage) to the results file, with the
+current git commit. `--compare` prints the timings of two commits.
+
+    python benchmarks/bench_pipeline.py --sizes 10000 1000000 10000000
+    python benchmarks/bench_pipeline.py --compare
+"""
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+import synth
+from radio_repeat import analysis
+from radio_repeat import clean_data
+from radio_repeat.cube import build_cube
+from radio_repeat.dataset import add_datetime
+from radio_repeat.store import read_store, write_store
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+def stage_normalize(state):
+    state['df'] = clean_data.normalize(state['df'], verbose=False)
+
+
+def stage_unify(state):
+    state['df'] = clean_data.clean_musics_with_multiple_artists(state['df'])
+
+
+def stage_datetime(state):
+    state['df'] = add_datetime(state['df'])
+
+
+def stage_histograms(state):
+    analysis.repetition_histograms(state['df'])
+
+
+def stage_overlaps(state):
+    analysis.overlaps(state['df'])
+
+
+def stage_store_write(state):
+    write_store(state['df'], os.path.join(state['tmp_dir'], 'store'))
+
+
+def stage_store_read(state):
+    read_store(os.path.join(state['tmp_dir'], 'store'))
+
+
+def stage_cube(state):
+    build_cube(state['df'])
+
+
+# in pipeline order: each stage works on the output of the previous
+STAGES = {
+    'normalize': stage_normalize,
+    'unify': stage_unify,
+    'datetime': stage_datetime,
+    'histograms': stage_histograms,
+    'overlaps': stage_overlaps,
+    'store_write': stage_store_write,
+    'store_read': stage_store_read,
+    'cube': stage_cube,
+}
+# the earlier stages whose output each stage needs: they are run
+# untimed when only the later stage is asked for
+FRAME = ['normalize', 'unify', 'datetime']
+REQUIRES = {
+    'unify': ['normalize'],
+    'histograms': FRAME,
+    'overlaps': FRAME,
+    'store_write': FRAME,
+    'store_read': FRAME + ['store_write'],
+    'cube': FRAME,
+}
+
+
+def git_commit():
+    """Returns the short hash of HEAD, marked when the tree has changes"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=cwd, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        changes = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=cwd, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + '-dirty' if changes.strip() else commit
+
+
+def run(n_rows, stages, catalog=None, seed=0):
+    """Times `stages` on a synthetic log of `n_rows` plays
+
+    Yields (stage, seconds) as each stage ends, starting with the
+    generation of the log. The stages needed by `stages` are run too,
+    but not timed.
+    """
+    if catalog is None:
+        catalog = max(800, n_rows // 250)
+
+    start = time.perf_counter()
+    state = {'df': synth.generate(n_rows, catalog_size=catalog, seed=seed)}
+    yield 'generate', time.perf_counter() - start
+
+    # - the normalization caches would hide the cost of a fresh run
+    clean_data.normalize_artist.cache_clear()
+    clean_data.normalize_song.cache_clear()
+
+    needed = set(stages)
+    for name in stages:
+        needed.update(REQUIRES.get(name, []))
+
+    state['tmp_dir'] = tempfile.mkdtemp()
+    try:
+        for name, stage in STAGES.items():
+            if name not in needed:
+                continue
+            start = time.perf_counter()
+            stage(state)
+            if name in stages:
+                yield name, time.perf_counter() - start
+    finally:
+        shutil.rmtree(state['tmp_dir'])
+
+
+def record(path, n_rows, stage, seconds, commit):
+    with open(path, 'a') as f:
+        f.write(
+            json.dumps({
+                'commit': commit,
+                'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'rows': n_rows,
+                'stage': stage,
+                'seconds': round(seconds, 4),
+                'rows_per_sec': round(n_rows / seconds),
+            }) + '\n')
+
+
+def compare(path, base=None, head=None):
+    """Prints the last timings of the commits `base` and `head`, by
+    default the last two commits of the results file"""
+    results = pd.read_json(path, lines=True)
+    commits = list(dict.fromkeys(results['commit'].astype(str)))
+    head = head or commits[-1]
+    base = base or (commits[-2] if len(commits) > 1 else commits[-1])
+
+    last = results.astype({
+        'commit': str
+    }).groupby(['commit', 'rows', 'stage'])['seconds'].last()
+    table = pd.DataFrame({
+        base: last.get(base),
+        head: last.get(head),
+    }).dropna(how='all')
+    table['ratio'] = table[head] / table[base]
+    print(table.to_string(float_format=lambda x: f'{x:.3f}'))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument(
+        '--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument(
+        '--catalog',
+        type=int,
+        default=None,
+        help='catalog size (default: grows with the number of rows)')
+    parser.add_argument('-o', '--output', type=str, default=RESULTS_PATH)
+    parser.add_argument(
+        '--compare',
+        nargs='*',
+        metavar='COMMIT',
+        default=None,
+        help='compare the results of two commits instead of running')
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        compare(args.output, *args.compare[:2])
+        return
+
+    commit = git_commit()
+    for n_rows in args.sizes:
+        # - recorded one by one, in case a large size runs out of memory
+        for stage, seconds in run(n_rows, args.stages, args.catalog):
+            print(f'{n_rows:>10,} {stage:<12} {seconds:8.3f}s')
+            record(args.output, n_rows, stage, seconds, commit)
+    print(f'Results appended to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
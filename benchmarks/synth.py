@@ -0,0 +1,216 @@
+"""Synthetic play logs, like the files written by the scrapers
+
+The plays of each station are drawn from a shared catalog with a
+skewed (Zipf) rotation: a few songs are played many times a day and
+most of the catalog rarely. Songs with featured artists are credited
+in several ways ('a feat. b', 'b x a', only 'a'...), and a fraction of
+the plays have dirty spellings (case, accents, punctuation, extra
+info in parenthesis), as the cleaning step has to handle.
+
+    python benchmarks/synth.py -o /tmp/plays/ --stations 4 --days 30
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+RADIOS = ['rfm', 'comercial', 'megafm', 'cidadefm']
+WORDS = [
+    'love', 'night', 'dance', 'heart', 'fire', 'summer', 'alma', 'noite',
+    'baby', 'sol', 'mar', 'city', 'lights', 'dream', 'forever', 'gold',
+    'rain', 'saudade', 'wild', 'blue', 'river', 'shadow', 'road', 'sky'
+]
+NAMES = [
+    'ana', 'bruno', 'carla', 'diogo', 'eva', 'filipe', 'gaspar', 'helena',
+    'ines', 'joao', 'katia', 'luis', 'marta', 'nuno', 'olivia', 'pedro',
+    'rita', 'sara', 'tiago', 'vera'
+]
+FEATURING = ['{a} feat. {b}', '{a} ft. {b}', '{a} & {b}', '{a}, {b}',
+             '{b} x {a}', '{a}']
+EXTRA = [' (Radio Edit)', ' [Live]', ' - Remix', '!', '...']
+ACCENTS = str.maketrans({'a': 'á', 'e': 'é', 'o': 'ô', 'c': 'ç'})
+
+
+def station_names(n_stations):
+    return (RADIOS + [f'station{i}' for i in range(len(RADIOS), n_stations)
+                      ])[:n_stations]
+
+
+def make_catalog(n_songs, featured=0.2, seed=0):
+    """Returns a pd.DataFrame with the `song`, `artist` and `featured`
+    artist (or None) of each song"""
+    rng = np.random.default_rng(seed)
+    n_artists = max(n_songs // 4, 2)
+    artists = np.array([
+        ' '.join(rng.choice(NAMES, 2)) + f' {i}' for i in range(n_artists)
+    ])
+    songs = [
+        ' '.join(rng.choice(WORDS, rng.integers(1, 4))) + f' {i}'
+        for i in range(n_songs)
+    ]
+    main = rng.integers(0, n_artists, n_songs)
+    other = (main + rng.integers(1, n_artists, n_songs)) % n_artists
+    has_featured = rng.random(n_songs) < featured
+    return pd.DataFrame({
+        'song': songs,
+        'artist': artists[main],
+        'featured': np.where(has_featured, artists[other], None),
+    })
+
+
+def dirty(value, rng):
+    """Misspells `value` as some stations do"""
+    kind = rng.integers(0, 5)
+    if kind == 0:
+        return value.upper()
+    if kind == 1:
+        return value.title()
+    if kind == 2:
+        return value.translate(ACCENTS)
+    if kind == 3:
+        return value + EXTRA[rng.integers(0, len(EXTRA))]
+    return value.replace(' ', '  ', 1)
+
+
+def variants(catalog, dirty_share=0.05, seed=0):
+    """Spellings of the songs and artist credits of the catalog
+
+    Returns (songs, artists, weights, offsets, counts): the spellings
+    of song i are at offsets[i]:offsets[i] + counts[i] of `songs`,
+    `artists` and their `weights`, the clean ones first. Dirty
+    spellings get `dirty_share` of the plays of a song.
+    """
+    rng = np.random.default_rng(seed)
+    songs, artists, weights, counts = [], [], [], []
+    for song, artist, featured in zip(catalog['song'], catalog['artist'],
+                                      catalog['featured']):
+        if featured is None:
+            credits = [artist]
+        else:
+            credits = [form.format(a=artist, b=featured) for form in FEATURING]
+        spellings = [(song, credit) for credit in credits]
+        spellings += [(dirty(song, rng), credits[0]),
+                      (song, dirty(credits[0], rng))]
+
+        n_clean = len(credits)
+        songs += [s for s, _ in spellings]
+        artists += [a for _, a in spellings]
+        weights += [(1 - dirty_share) / n_clean] * n_clean
+        weights += [dirty_share / 2] * 2
+        counts.append(len(spellings))
+
+    counts = np.array(counts)
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return (np.array(songs, dtype=object), np.array(artists, dtype=object),
+            np.array(weights), offsets, counts)
+
+
+def generate(n_rows=None, stations=4, days=7, catalog_size=800, skew=0.7,
+             featured=0.2, dirty_share=0.05, start='2020-08-10', seed=0):
+    """Generates a raw play log like the scraped files
+
+    Returns a pd.DataFrame with the columns `time`, `song`, `artist`,
+    `date` and `radio`, ordered by radio, date and time. With `n_rows`,
+    the number of `days` is chosen to get about that many plays
+    (~400 a day per station).
+    """
+    rng = np.random.default_rng(seed)
+    names = station_names(stations)
+    if n_rows is not None:
+        days = max(int(np.ceil(n_rows / (stations * 400))), 1)
+
+    catalog = make_catalog(catalog_size, featured, seed)
+    songs, artists, weights, offsets, counts = variants(
+        catalog, dirty_share, seed)
+
+    # - every station plays ~3.6 minutes per song, for the whole day
+    gaps = rng.integers(2, 6, size=(stations * days, 24 * 60 // 2))
+    minutes = np.cumsum(gaps, axis=1) - gaps[:, :1]
+    on_air = minutes < 24 * 60
+    n_plays = on_air.sum(axis=1)
+    minutes = minutes[on_air]
+    day_index = np.repeat(np.arange(stations * days), n_plays)
+
+    # - each station has its own taste on top of a shared popularity
+    popularity = 1 / np.arange(1, catalog_size + 1)**skew
+    picks = np.empty(len(minutes), dtype=np.int64)
+    for station in range(stations):
+        sel = day_index // days == station
+        taste = popularity * rng.lognormal(0, 0.5, catalog_size)
+        picks[sel] = rng.choice(
+            catalog_size, size=sel.sum(), p=taste / taste.sum())
+
+    # - pick a spelling of each play
+    # - songs with the same number of spellings have the same weights
+    spellings = np.empty(len(picks), dtype=np.int64)
+    draws = rng.random(len(picks))
+    for n in np.unique(counts[picks]):
+        sel = counts[picks] == n
+        first = offsets[picks[sel]]
+        cumulative = np.cumsum(weights[first[0]:first[0] + n])
+        spellings[sel] = first + np.searchsorted(
+            cumulative, draws[sel] * cumulative[-1], side='right')
+
+    dates = pd.date_range(start, periods=days)
+    df = pd.DataFrame({
+        'time': _format_minutes(minutes),
+        'song': songs[spellings],
+        'artist': artists[spellings],
+        'date': dates.strftime('%Y-%m-%d').to_numpy()[day_index % days],
+        'radio': np.array(names, dtype=object)[day_index // days],
+    })
+    return df[:n_rows] if n_rows is not None else df
+
+
+def _format_minutes(minutes):
+    labels = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60)],
+                      dtype=object)
+    return labels[minutes]
+
+
+def write_files(df, out_dir):
+    """Writes a scraper-like `{radio}_{day}_{month}_{year}.csv` file
+    per radio and date"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for (radio, date), plays in df.groupby(['radio', 'date'], sort=False):
+        year, month, day = date.split('-')
+        path = os.path.join(out_dir, f'{radio}_{day}_{month}_{year}.csv')
+        plays[['time', 'song', 'artist']].to_csv(
+            path, sep='|', header=False, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generates play logs')
+    parser.add_argument('-o', '--out', type=str, required=True)
+    parser.add_argument('-n', '--rows', type=int, default=None)
+    parser.add_argument('--stations', type=int, default=4)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--catalog', type=int, default=800)
+    parser.add_argument(
+        '--skew', type=float, default=0.7, help='Zipf exponent of rotation')
+    parser.add_argument(
+        '--featured',
+        type=float,
+        default=0.2,
+        help='share of songs with a featured artist')
+    parser.add_argument(
+        '--dirty',
+        type=float,
+        default=0.05,
+        help='share of plays with a dirty spelling')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate(args.rows, args.stations, args.days, args.catalog,
+                  args.skew, args.featured, args.dirty, seed=args.seed)
+    paths = write_files(df, args.out)
+    print(f'Wrote {len(df)} plays to {len(paths)} files in {args.out}')
+
+
+if __name__ == '__main__':
+    main()
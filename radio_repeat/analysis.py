@@ -1,8 +1,10 @@
 import numpy as np
 import pandas as pd
-pd.set_option('display.max_rows', 200)
-import matplotlib.pyplot as plt
-import datetime as dt
+
+from radio_repeat import instrument
+from radio_repeat.dataset import TEXT_COLUMNS, load_dataset
+from radio_repeat.playlog import PlayLog
+from radio_repeat.similarity import similarity, similarity_matrix
 
 RADIOS = ['cidadefm', 'comercial', 'megafm', 'rfm']
 RADIO_NAME_MAP = {
@@ -12,50 +14,217 @@ RADIO_NAME_MAP = {
     'cidadefm': 'CidadeFM'
 }
 
-def overlaps(df):
-    """Outputs musics that played simultaneously"""
-    print('\n\nOverlaps\n')
-
-    df['dt_start'] = df['datetime']
-    df['dt_end'] = 0
-    for _, group in df.groupby(['radio']):
-        dt_end = group.sort_values('datetime')['dt_start'].shift(-1)
-        df.loc[group.index, 'dt_end'] = dt_end
-
-    simultaneous = []
-    for _, group in df.groupby(['song', 'artist']):
-        group = group.sort_values('dt_start')
-        group['merged'] = (group['dt_start'] >
-                           group['dt_end'].shift()).cumsum()
-
-        result = group.groupby('merged').agg(
-            date=('date', 'first'),
-            song=('song', 'first'),
-            artist=('artist', 'first'),
-            radios=('radio', lambda x: ' | '.join(x)),
-            radios_count=('radio', 'count'),
-            times=('time', lambda x: ' | '.join(x)))
-
-        result = result[result.radios_count > 1]
-        if len(result) > 0:
-            simultaneous.append(result)
-
-    if len(simultaneous) == 0:
-        return pd.DataFrame()
-
-    simultaneous = pd.concat(simultaneous).reset_index()
-    print(simultaneous)
-    print(f'Found: {len(simultaneous)}')
-
-    print(
-        simultaneous.groupby(['song',
-                              'artist']).size().sort_values(ascending=False))
-
-    print(simultaneous.groupby(['date']).size())
+OPEN_END = np.iinfo(np.int64).max
+OVERLAP_COLUMNS = [
+    'merged', 'date', 'song', 'artist', 'radios', 'radios_count', 'times'
+]
+
+
+def play_intervals(radio_ids, start):
+    """Computes the end of each play
+
+    A play lasts until the next play on the same radio. `start` is an
+    int64 array; the last play of each radio ends at OPEN_END.
+    """
+    order = np.lexsort((start, radio_ids))
+    end = np.full(len(start), OPEN_END, dtype=np.int64)
+
+    same_radio = radio_ids[order][1:] == radio_ids[order][:-1]
+    end[order[:-1][same_radio]] = start[order][1:][same_radio]
+    return end
+
+
+def overlap_clusters(key_ids, start, end):
+    """Groups plays of the same song whose intervals overlap
+
+    Sorts the plays once by (key, start) and sweeps over them: a new
+    cluster begins when the key changes or when a play starts after
+    the end of the previous play of the same key.
+
+    Returns a tuple (order, cluster, merged) where `order` sorts the
+    plays, and `cluster` and `merged` hold, in that order, the global
+    cluster id and its index within the key.
+    """
+    order = np.lexsort((start, key_ids))
+    keys, starts, ends = key_ids[order], start[order], end[order]
+
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = keys[1:] != keys[:-1]
+    gap = np.zeros(len(keys), dtype=bool)
+    gap[1:] = starts[1:] > ends[:-1]
+
+    cluster = np.cumsum(new_key | gap) - 1
+    key_first_cluster = np.maximum.accumulate(np.where(new_key, cluster, 0))
+    merged = cluster - key_first_cluster
+    return order, cluster, merged
+
+
+@instrument.stage
+def overlaps(df, verbose=False):
+    """Finds musics that played simultaneously
+
+    `df` is either a pd.DataFrame of plays or a PlayLog. Returns a
+    pd.DataFrame with a row per group of overlapping plays of the same
+    song. With `verbose`, the results are also printed.
+    """
+    if verbose:
+        print('\n\nOverlaps\n')
+
+    if isinstance(df, PlayLog):
+        key_ids = df.pair_ids()
+        df = df.take(key_ids >= 0)
+        key_ids = key_ids[key_ids >= 0]
+        radio_ids = df.radio
+        start = df.timestamps()
+    else:
+        df = df[df['song'].notna() & df['artist'].notna()]
+        key_ids = df.groupby(['song', 'artist'],
+                             sort=True).ngroup().to_numpy()
+        radio_ids = pd.factorize(df['radio'])[0]
+        start = df['datetime'].to_numpy().astype('datetime64[ns]').view(
+            np.int64)
+
+    end = play_intervals(radio_ids, start)
+    order, cluster, merged = overlap_clusters(key_ids, start, end)
+
+    selected = np.bincount(cluster)[cluster] > 1
+    if not selected.any():
+        return pd.DataFrame(columns=OVERLAP_COLUMNS)
+
+    if isinstance(df, PlayLog):
+        # - only the overlapping plays are converted to strings
+        plays = df.take(order[selected]).to_frame()
+    else:
+        plays = df.iloc[order[selected]]
+    simultaneous = plays.groupby(cluster[selected]).agg(
+        date=('date', 'first'),
+        song=('song', 'first'),
+        artist=('artist', 'first'),
+        radios=('radio', ' | '.join),
+        radios_count=('radio', 'count'),
+        times=('time', ' | '.join))
+    simultaneous.insert(0, 'merged',
+                        pd.Series(merged[selected]).groupby(
+                            cluster[selected]).first().to_numpy())
+    simultaneous = simultaneous.reset_index(drop=True)
+
+    if verbose:
+        print(simultaneous)
+        print(f'Found: {len(simultaneous)}')
+
+        print(
+            simultaneous.groupby(
+                ['song', 'artist']).size().sort_values(ascending=False))
+
+        print(simultaneous.groupby(['date']).size())
     return simultaneous
 
 
-def count_daily_radio_repetitions(df, radio):
+@instrument.stage
+def repetition_histograms(df):
+    """Counts daily and week repetitions of songs for every radio
+
+    Groups the plays once by (radio, song, artist, date) and derives
+    both histograms from those counts. `df` is either a pd.DataFrame
+    of plays or a PlayLog. Returns a tidy pd.DataFrame with the
+    columns `radio`, `period` ('daily' or 'week'), `repetitions` and
+    `occurrences`.
+    """
+    if isinstance(df, PlayLog):
+        return _log_repetition_histograms(df)
+
+    daily = df.groupby(['radio', 'song', 'artist', 'date'])['time'].count()
+    return daily_histograms(daily)
+
+
+def daily_histograms(daily):
+    """repetition_histograms from the plays per (radio, song, artist,
+    date), a pd.Series with that index"""
+    days = daily.groupby(level=['radio', 'song', 'artist'],
+                         observed=True).size()
+
+    frames = []
+    for period, counts in [('daily', daily), ('week', days)]:
+        hist = counts.groupby(
+            [counts.index.get_level_values('radio'),
+             counts.to_numpy()]).size()
+        hist.index.names = ['radio', 'repetitions']
+        hist = hist.rename('occurrences').reset_index()
+        hist.insert(1, 'period', period)
+        frames.append(hist)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _log_repetition_histograms(log):
+    """repetition_histograms of a PlayLog, on the integer ids
+
+    Sorts the plays by (radio, song and artist, day) and counts the
+    runs of equal keys, instead of grouping strings.
+    """
+    pair_ids = log.pair_ids()
+    days = log.days()
+    valid = (pair_ids >= 0) & (log.radio >= 0)
+    valid &= log.minute != np.iinfo(np.int32).min
+    radio_ids, pair_ids, days = log.radio[valid], pair_ids[valid], days[valid]
+
+    order = np.lexsort((days, pair_ids, radio_ids))
+    radio_ids, pair_ids, days = (radio_ids[order], pair_ids[order],
+                                 days[order])
+
+    new_pair = np.ones(len(order), dtype=bool)
+    new_pair[1:] = ((radio_ids[1:] != radio_ids[:-1]) |
+                    (pair_ids[1:] != pair_ids[:-1]))
+    new_day = new_pair.copy()
+    new_day[1:] |= days[1:] != days[:-1]
+
+    # - plays per (radio, pair, day), and days per (radio, pair)
+    daily = _run_lengths(new_day)
+    days = _run_lengths(new_pair[new_day])
+
+    radios = np.array(log.radios, dtype=object)
+    frames = []
+    for period, counts, starts in [('daily', daily, new_day),
+                                   ('week', days, new_pair)]:
+        hist = pd.DataFrame({
+            'radio': radio_ids[starts],
+            'repetitions': counts
+        }).groupby(['radio', 'repetitions']).size()
+        hist = hist.rename('occurrences').reset_index()
+        hist['radio'] = radios[hist['radio'].to_numpy()]
+        hist.insert(1, 'period', period)
+        frames.append(hist)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def _run_lengths(starts):
+    """Lengths of the runs that begin where `starts` is True"""
+    return np.diff(np.append(np.flatnonzero(starts), len(starts)))
+
+
+def select_radio(df, radio):
+    """Selects the plays of `radio` from a pd.DataFrame or a PlayLog"""
+    if isinstance(df, PlayLog):
+        return df.take(df.radio_mask(radio))
+    return df[df['radio'] == radio]
+
+
+def count_days(df):
+    """Counts the dates with plays in a pd.DataFrame or a PlayLog"""
+    if isinstance(df, PlayLog):
+        return len(np.unique(df.days()))
+    return len(df['date'].unique())
+
+
+def radio_histogram(histograms, radio, period):
+    """Selects the histogram of a radio from repetition_histograms"""
+    sel = (histograms['radio'] == radio) & (histograms['period'] == period)
+    counts = histograms[sel].set_index('repetitions')['occurrences']
+    return counts.sort_index()
+
+
+def count_daily_radio_repetitions(df, radio, histograms=None):
     """Count daily repetitions of songs
     
     Returns a pd.Series with the number of occurences of a given # of
@@ -71,28 +240,23 @@ def count_daily_radio_repetitions(df, radio):
     - 1 song that was played twice
     - 4 songs that were played 3 times
     """
+    if histograms is None:
+        histograms = repetition_histograms(select_radio(df, radio))
 
-    radio_df = df[df['radio'] == radio]
-    radio_counts = radio_df.groupby(['song', 'artist',
-                                     'date']).agg(count=('time', 'count'))
-
-    radio_counts = radio_counts.groupby('count').size().sort_index()
-    radio_counts = radio_counts
-
-    return radio_counts
+    return radio_histogram(histograms, radio, 'daily')
 
 
-def avg_daily_radio_repetitions(df, radio):
+def avg_daily_radio_repetitions(df, radio, histograms=None, days=None):
     """Computes the average daily repetitions of songs on a given radio
 
     Returns a scalar with the average number of times songs are played
-    on a given station.
+    on a given station. `days` is the number of dates of `df`, which
+    is only needed when the histograms are given (see
+    streaming.streaming_histograms).
     """
-    dates = df['date'].unique()
-
     # Compute avg daily repetitions
-    counts = count_daily_radio_repetitions(df, radio)
-    counts /= len(dates)
+    counts = count_daily_radio_repetitions(df, radio, histograms)
+    counts /= count_days(df) if days is None else days
 
     # Compute the weighted average of weekly repetitions.
     times = counts.index.to_numpy()
@@ -103,33 +267,51 @@ def avg_daily_radio_repetitions(df, radio):
     return daily_avg
 
 
-def daily_repetitions_stats(df):
+@instrument.stage
+def daily_repetitions_stats(df, histograms=None, days=None, radios=None):
     """Outputs avg daily repetitions for the radios"""
     print('\n\nDaily Stats\n')
 
-    for radio_idx, radio in enumerate(RADIOS):
-        avg = avg_daily_radio_repetitions(df, radio)
+    if histograms is None:
+        histograms = repetition_histograms(df)
+    for radio_idx, radio in enumerate(radios or RADIOS):
+        avg = avg_daily_radio_repetitions(df, radio, histograms, days)
         print(f'{radio}: plays musics an avg of {avg:.1f} times per day')
 
 
-def daily_repetitions_pie(df):
-    """Generates pie chart of daily repetitions for the radios.
-    """
-    fig, axes = plt.subplots(
-        nrows=2,
-        ncols=2,
-        squeeze=False,
-        figsize=(12, 15),
-        subplot_kw={},
-        gridspec_kw={})
-    axes = axes.ravel()
+PIES = {
+    'daily': {
+        'title': 'Quantas vezes passa uma música ao longo do dia? '
+        '(média ao longo de 1 semana)',
+        'colors': [
+            '#77DD76', '#BDE7BD', '#E7F1E8', '#FFD5D4', '#FFB6B3', '#FF6962'
+        ],
+    },
+    'week': {
+        'title': 'Em quantos dias da semana passa uma música?',
+        'colors': [
+            'cornflowerblue', 'sandybrown', 'yellowgreen', 'lightcoral',
+            'palevioletred', 'peru', 'violet'
+        ],
+    },
+}
 
-    dates = df['date'].unique()
-    for radio_idx, radio in enumerate(RADIOS):
-        ax = axes[radio_idx]
 
-        radio_counts = count_daily_radio_repetitions(df, radio)
-        radio_counts /= len(dates)
+def daily_repetitions_pie_data(df, histograms=None, days=None, radios=None):
+    """Slices of daily_repetitions_pie
+
+    Returns a {radio: pd.Series} with the avg number of songs per day
+    by # of repetitions, the 5-9 and 10+ repetitions binned together.
+    """
+    if histograms is None:
+        histograms = repetition_histograms(df)
+    if days is None:
+        days = count_days(df)
+
+    data = {}
+    for radio in radios or RADIOS:
+        radio_counts = count_daily_radio_repetitions(df, radio, histograms)
+        radio_counts /= days
 
         others_5_9 = radio_counts[(radio_counts.index >= 5)
                                   & (radio_counts.index < 10)].sum()
@@ -142,29 +324,67 @@ def daily_repetitions_pie(df):
         if not np.isclose(others_10p, 0.0):
             radio_counts_binned = radio_counts_binned.append(
                 pd.Series(others_10p, index=['10+']))
+        data[radio] = radio_counts_binned
+
+    return data
+
+
+def week_repetitions_pie_data(df, histograms=None, radios=None):
+    """Slices of week_repetitions_pie: a {radio: pd.Series} with the
+    number of songs by # of days they were played"""
+    if histograms is None:
+        histograms = repetition_histograms(df)
+    return {
+        radio: count_week_radio_repetitions(df, radio, histograms)
+        for radio in radios or RADIOS
+    }
+
+
+def draw_pies(kind, data, path):
+    """Draws a pie chart per radio of `data`, a {radio: pd.Series} of
+    slices, with the title and colors of PIES[kind], and saves the
+    figure to `path`"""
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(
+        nrows=2,
+        ncols=2,
+        squeeze=False,
+        figsize=(12, 15),
+        subplot_kw={},
+        gridspec_kw={})
+    axes = axes.ravel()
 
+    for radio_idx, (radio, counts) in enumerate(data.items()):
+        ax = axes[radio_idx]
         ax.pie(
-            radio_counts_binned.to_numpy(),
-            labels=radio_counts_binned.index,
+            counts.to_numpy(),
+            labels=counts.index,
             autopct='%1.f%%',
             startangle=90,
             pctdistance=.9,
-            explode=[.05] * len(radio_counts_binned),
-            colors=[
-                '#77DD76', '#BDE7BD', '#E7F1E8', '#FFD5D4', '#FFB6B3',
-                '#FF6962'
-            ])
+            explode=[.05] * len(counts),
+            colors=PIES[kind]['colors'])
 
         ax.set_title(RADIO_NAME_MAP[radio])
 
-    plt.suptitle(
-        'Quantas vezes passa uma música ao longo do dia? (média ao longo de 1 semana)'
-    )
+    plt.suptitle(PIES[kind]['title'])
+    _hide_unused(axes, list(data))
     plt.tight_layout()
-    plt.savefig('daily_repetitions.png')
+    plt.savefig(path)
+    plt.close(fig)
+
 
+@instrument.stage
+def daily_repetitions_pie(df, histograms=None, days=None, radios=None,
+                          path='daily_repetitions.png'):
+    """Generates pie chart of daily repetitions for the radios.
+    """
+    draw_pies('daily',
+              daily_repetitions_pie_data(df, histograms, days, radios), path)
 
-def count_week_radio_repetitions(df, radio):
+
+def count_week_radio_repetitions(df, radio, histograms=None):
     """Count repetitions of songs during the week days
     
     Returns a pd.Series with the number of days a given song is
@@ -180,14 +400,13 @@ def count_week_radio_repetitions(df, radio):
     - 1 song that was played in two days
     - 4 songs that were played in three days
     """
-    radio_df = df[df['radio'] == radio]
-    radio_counts = radio_df.groupby(
-        ['song', 'artist']).agg(count=('date', lambda x: x.nunique()))
-    radio_counts = radio_counts.groupby('count').size().sort_index()
-    return radio_counts
+    if histograms is None:
+        histograms = repetition_histograms(select_radio(df, radio))
+
+    return radio_histogram(histograms, radio, 'week')
 
 
-def avg_week_radio_repetitions(df, radio):
+def avg_week_radio_repetitions(df, radio, histograms=None):
     """Computes the average # of days a song is repeated, on a given radio
 
     Returns a scalar with the average number of days that songs are played
@@ -195,7 +414,7 @@ def avg_week_radio_repetitions(df, radio):
     """
 
     # Count frequency of # of days that songs are repeated
-    radio_counts = count_week_radio_repetitions(df, radio)
+    radio_counts = count_week_radio_repetitions(df, radio, histograms)
 
     # Compute weighted average
     times = radio_counts.index.to_numpy()
@@ -204,66 +423,111 @@ def avg_week_radio_repetitions(df, radio):
     return avg
 
 
-def week_repetitions_stats(df):
+@instrument.stage
+def week_repetitions_stats(df, histograms=None, radios=None):
     """Outputs avg # of days where songs are repeated"""
     print('\n\nWeek Stats\n')
-    for radio_idx, radio in enumerate(RADIOS):
-        avg = avg_week_radio_repetitions(df, radio)
+    if histograms is None:
+        histograms = repetition_histograms(df)
+    for radio_idx, radio in enumerate(radios or RADIOS):
+        avg = avg_week_radio_repetitions(df, radio, histograms)
         print(f'{radio}: plays musics an avg of {avg:.1f} days per week')
 
 
-def week_repetitions_pie(df):
+@instrument.stage
+def week_repetitions_pie(df, histograms=None, radios=None,
+                         path='weekly_repetitions.png'):
     """Generates pie chart of # of days where songs were repeated
     """
-    fig, axes = plt.subplots(
-        nrows=2,
-        ncols=2,
-        squeeze=False,
-        figsize=(12, 15),
-        subplot_kw={},
-        gridspec_kw={})
-    axes = axes.ravel()
-    for radio_idx, radio in enumerate(RADIOS):
-        ax = axes[radio_idx]
+    draw_pies('week', week_repetitions_pie_data(df, histograms, radios),
+              path)
 
-        radio_counts = count_week_radio_repetitions(df, radio)
 
-        ax.pie(
-            radio_counts.to_numpy(),
-            labels=radio_counts.index,
-            autopct='%1.f%%',
-            startangle=90,
-            pctdistance=.9,
-            explode=[.05] * len(radio_counts),
-            colors=[
-                'cornflowerblue', 'sandybrown', 'yellowgreen', 'lightcoral',
-                'palevioletred', 'peru', 'violet'
-            ])
+def _hide_unused(axes, radios):
+    for ax in axes[len(radios or RADIOS):]:
+        ax.set_visible(False)
 
-        ax.set_title(RADIO_NAME_MAP[radio])
 
-    plt.suptitle('Em quantos dias da semana passa uma música?')
-    plt.tight_layout()
-    plt.savefig('weekly_repetitions.png')
+@instrument.stage
+def similarity_stats(df, radios=None):
+    """Outputs the similarity of the playlists of the radios, over
+    the whole period and on average per day"""
+    print('\n\nSimilarity Stats\n')
+
+    radios = radios or RADIOS
+    pairs = similarity(df)
+    for column in ['jaccard', 'cosine']:
+        print(f'{column}:')
+        print(similarity_matrix(pairs, column, radios).round(2))
+        print()
+
+    daily = similarity(df, by_day=True)
+    daily = daily.groupby(['radio_a',
+                           'radio_b'])[['jaccard', 'cosine']].sum()
+    days = count_days(df)
+    for a_idx, a in enumerate(radios):
+        for b in radios[a_idx + 1:]:
+            key = (a, b) if (a, b) in daily.index else (b, a)
+            jaccard, cosine = (daily.loc[key] / days if key in daily.index
+                               else (0.0, 0.0))
+            print(f'{a} & {b}: an avg daily jaccard of {jaccard:.2f} and '
+                  f'cosine of {cosine:.2f}')
+
+
+REPORTS = ['stats', 'pies', 'overlaps', 'similarity']
 
 
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Repetition stats, pie charts and overlaps of the '
+        'radios')
+    parser.add_argument(
+        'reports',
+        nargs='*',
+        metavar='report',
+        help=f'any of {", ".join(REPORTS)} (default: all)')
+    parser.add_argument(
+        '-i',
+        '--input',
+        type=str,
+        default=None,
+        help='store or csv file (default: the dataset)')
+    # - the week of the post
+    parser.add_argument('--start', type=str, default='2020-08-10')
+    parser.add_argument('--end', type=str, default='2020-08-16')
+    parser.add_argument('--radios', nargs='+', choices=RADIOS, default=None)
+    parser.add_argument(
+        '-o', '--out', type=str, default='.', help='folder of the figures')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+    reports = args.reports or REPORTS
+    for report in set(reports) - set(REPORTS):
+        parser.error(f'unknown report {report!r}, choose from {REPORTS}')
+
+    instrument.start_from_args(args)
     pd.set_option('display.max_rows', 500)
-    df = pd.read_csv('./data/all_data.csv', delimiter='|')
-    df['datetime'] = df[['date', 'time']].apply(
-        lambda x: pd.to_datetime(
-            f'{x.date} {x.time}', format='%Y/%m/%d %H:%M'),
-        axis=1)
-    df['date'] = pd.to_datetime(df['date'])
-
-    df = df[(df['date'] >= dt.datetime(year=2020, month=8, day=10))
-            & (df['date'] <= dt.datetime(year=2020, month=8, day=16))]
-
-    daily_repetitions_stats(df)
-    week_repetitions_stats(df)
-    daily_repetitions_pie(df)
-    week_repetitions_pie(df)
-    overlaps(df)
+    # - the lists of artists are not used by any report
+    df = load_dataset(args.input, args.start, args.end, args.radios,
+                      columns=TEXT_COLUMNS)
+
+    if 'stats' in reports or 'pies' in reports:
+        histograms = repetition_histograms(df)
+    if 'stats' in reports:
+        daily_repetitions_stats(df, histograms, radios=args.radios)
+        week_repetitions_stats(df, histograms, radios=args.radios)
+    if 'pies' in reports:
+        # - the pies are only drawn again when their data changed
+        from radio_repeat import figures
+        figures.render(
+            figures.pie_jobs(df, args.out, args.radios,
+                             histograms=histograms))
+    if 'overlaps' in reports:
+        overlaps(df, verbose=True)
+    if 'similarity' in reports:
+        similarity_stats(df, radios=args.radios)
+    instrument.finish_from_args(args)
 
 
 if __name__ == '__main__':
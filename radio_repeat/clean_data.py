@@ -1,14 +1,21 @@
 import os
 import glob
+import numpy as np
 import pandas as pd
 import csv
 import re
 import unidecode
 import functools
-import operator
+
+from radio_repeat import dedupe
+from radio_repeat import instrument
+from radio_repeat.dataset import TEXT_COLUMNS, add_datetime
 
 
 RADIOS = ['rfm', 'comercial', 'megafm', 'cidadefm']
+# - bump it when the normalization changes in a way that its source
+#   does not show, to clean every file again (see ingest.py)
+NORMALIZE_VERSION = 1
 
 
 def date_from_filename(filename):
@@ -18,115 +25,197 @@ def date_from_filename(filename):
     return int(day), int(month), int(year)
 
 
-def lowercase(df):
-    df['song'] = df['song'].str.lower()
-    df['artist'] = df['artist'].str.lower()
-    return df
+def sort_artists(artist):
+    """Sorts the ' & ' separated artist names lexicographically"""
+    return ' & '.join(sorted(artist.split(' & ')))
 
 
-def clean_artist(df):
+# Ordered rule tables. Each rule is either a (regex, replacement)
+# pair or a str -> str function, applied in order.
+ARTIST_RULES = [
     # typos/inconsistencies detected manually
-    df['artist'] = df['artist'].str.replace('xutos e pontapés', 'xutos & pontapés', regex=True)
-    df['artist'] = df['artist'].str.replace('lil peep', 'lil pump')
-    df['artist'] = df['artist'].str.replace('lil peep', 'lil pump')
-    df['artist'] = df['artist'].str.replace('nial horan', 'niall horan')
-    df['artist'] = df['artist'].str.replace('michele marrone', 'michele morrone')
-    df['artist'] = df['artist'].str.replace('the cranberries', 'cranberries')
-    df['artist'] = df['artist'].str.replace('elvis costelo', 'elvis costello')
-    df['artist'] = df['artist'].str.replace('rag n bone man', 'ragnbone man')
-    df['artist'] = df['artist'].str.replace('r\.e\.m', 'rem')
-
-    df['artist'] = df['artist'].str.replace('diogo piã‡arra', 'diogo picarra', regex=True)
-    df['artist'] = df['artist'].str.replace('diogo pi_arra', 'diogo picarra')
+    ('xutos e pontapés', 'xutos & pontapés'),
+    ('lil peep', 'lil pump'),
+    ('nial horan', 'niall horan'),
+    ('michele marrone', 'michele morrone'),
+    ('the cranberries', 'cranberries'),
+    ('elvis costelo', 'elvis costello'),
+    ('rag n bone man', 'ragnbone man'),
+    (r'r\.e\.m', 'rem'),
+    ('diogo piã‡arra', 'diogo picarra'),
+    ('diogo pi_arra', 'diogo picarra'),
 
     # normalize the artist separations with &
     # - we found two bands that uses & in their name. so we repeat it.
-    df['artist'] = df['artist'].str.replace('xutos & pontapés', 'xutos && pontapés', regex=True)
-    df['artist'] = df['artist'].str.replace('years & years', 'years && years', regex=True)
+    ('xutos & pontapés', 'xutos && pontapés'),
+    ('years & years', 'years && years'),
 
     # - replace "feat.", "ft.", "x", "&", "x", "[+]" for &
-    df['artist'] = df['artist'].str.replace(' feat(\.)? ', ' & ', regex=True)
-    df['artist'] = df['artist'].str.replace(' ft(\.)? ', ' & ', regex=True)
-    df['artist'] = df['artist'].str.replace(' \[\+\] ', ' & ', regex=True)
+    (r' feat(\.)? ', ' & '),
+    (r' ft(\.)? ', ' & '),
+    (r' \[\+\] ', ' & '),
     # ' x ' needs to be processed before comma, because some artist names end in X
-    df['artist'] = df['artist'].str.replace(' x ', ' & ', regex=True)
-    df['artist'] = df['artist'].str.replace(' , ', ' & ', regex=True)
-    df['artist'] = df['artist'].str.replace(', ', ' & ', regex=True)
-    df['artist'] = df['artist'].str.replace(' / ', ' & ', regex=True)
+    (' x ', ' & '),
+    (' , ', ' & '),
+    (', ', ' & '),
+    (' / ', ' & '),
 
     # remove extra symbols
     # - necessary since some statios use them, other dont
-    df['artist'] = df['artist'].str.replace('\[.*\]', '', regex=True)
-    df['artist'] = df['artist'].str.replace("'", '')
-    df['artist'] = df['artist'].str.replace('\.', ' ')
-    df['artist'] = df['artist'].str.replace('!', ' ')
-    df['artist'] = df['artist'].str.replace('-', ' ')
+    (r'\[.*\]', ''),
+    ("'", ''),
+    (r'\.', ' '),
+    ('!', ' '),
+    ('-', ' '),
 
     # further cleaning
     # - ascii only
-    df['artist'] = df['artist'].apply(lambda x: unidecode.unidecode(x))
+    unidecode.unidecode,
     # - sort artist names lexicographically
-    df['artist'] = df['artist'].apply(lambda x: ' & '.join(sorted(x.split(' & '))))
+    sort_artists,
     # - remove extra info in parenthesis
-    df['artist'] = df['artist'].str.replace('\(.*\)', '', regex=True)
+    (r'\(.*\)', ''),
     # - remove unnecessary spaces
-    df['artist'] = df['artist'].str.replace('\s+', ' ', regex=True)
-    df['artist'] = df['artist'].str.strip()
-
-    return df
+    (r'\s+', ' '),
+    str.strip,
+]
 
-
-def clean_songs(df):
+SONG_RULES = [
     # typos/inconsistencies detected manually
-    df['song'] = df['song'].str.replace('banana \(ft\. shaggy\) dj fle remix', 'banana')
-    df['song'] = df['song'].str.replace('wonderfull', 'wonderful')
+    (r'banana \(ft\. shaggy\) dj fle remix', 'banana'),
+    ('wonderfull', 'wonderful'),
 
     # normalize songs
     # - remove extra symbols, extra info in (), make it ascii, and
     #   remove unecessary spaces
-    df['song'] = df['song'].str.replace('\.\.\./\.\.\.', ' ')
-    df['song'] = df['song'].str.replace('\.\.\.', ' ')
-    df['song'] = df['song'].str.replace('\.', '')
-    df['song'] = df['song'].str.replace('\?', ' ')
-    df['song'] = df['song'].str.replace('!', ' ')
-    df['song'] = df['song'].str.replace(',', '')
-    df['song'] = df['song'].str.replace('-', ' ')
-    df['song'] = df['song'].str.replace("'", '')
-    df['song'] = df['song'].str.replace('`', '')
-    df['song'] = df['song'].str.replace('\[.*\]', '', regex=True)
-    df['song'] = df['song'].str.replace('\(.*\)', '', regex=True)
-
-    df['song'] = df['song'].apply(lambda x: unidecode.unidecode(x))
-
-    df['song'] = df['song'].str.replace('\s+', ' ', regex=True)
-    df['song'] = df['song'].str.strip()
+    (r'\.\.\./\.\.\.', ' '),
+    (r'\.\.\.', ' '),
+    (r'\.', ''),
+    (r'\?', ' '),
+    ('!', ' '),
+    (',', ''),
+    ('-', ' '),
+    ("'", ''),
+    ('`', ''),
+    (r'\[.*\]', ''),
+    (r'\(.*\)', ''),
+    unidecode.unidecode,
+    (r'\s+', ' '),
+    str.strip,
+]
+
+
+def compile_rules(rules):
+    """Compiles a rule table into a memoized str -> str function"""
+    steps = []
+    for rule in rules:
+        if callable(rule):
+            steps.append(rule)
+        else:
+            pattern, replacement = rule
+            steps.append(functools.partial(re.compile(pattern).sub, replacement))
+
+    @functools.lru_cache(maxsize=None)
+    def normalize(value):
+        for step in steps:
+            value = step(value)
+        return value
+
+    return normalize
+
+
+def normalize_column(series, normalize):
+    """Applies `normalize` once per distinct value of `series`
+
+    The cleaned values are broadcast back to the rows through the
+    factorized codes. Missing values are kept as they are.
+    """
+    codes, uniques = pd.factorize(series)
+    cleaned = np.array([normalize(value) for value in uniques] + [np.nan],
+                       dtype=object)
+    return pd.Series(cleaned[codes], index=series.index, name=series.name)
+
+
+normalize_artist = compile_rules(ARTIST_RULES)
+normalize_song = compile_rules(SONG_RULES)
+
+
+@instrument.stage
+def lowercase(df):
+    df['song'] = normalize_column(df['song'], str.lower)
+    df['artist'] = normalize_column(df['artist'], str.lower)
     return df
 
 
+@instrument.stage
+def clean_artist(df):
+    df['artist'] = normalize_column(df['artist'], normalize_artist)
+    return df
+
+
+@instrument.stage
+def clean_songs(df):
+    df['song'] = normalize_column(df['song'], normalize_song)
+    return df
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+@instrument.stage
 def clean_musics_with_multiple_artists(df):
-    def selector_filter_by_song(df, song):
-        return df['song'] == row.song
-
-    def selector_filter_by_artist(df, artist):
-        return df['artists_list'].apply(lambda x: artist in x)
-    
-    df['artists_list'] = df['artist'].apply(lambda x: x.split(' & '))
-
-    for group_name, df_group in df.groupby('song'):
-        for index, row in df_group.iterrows():
-            row_artists = row.artists_list
-            selector = functools.reduce(operator.or_, [selector_filter_by_artist(df_group, ra) for ra in row_artists])
-            
-            selected_artists = df_group['artists_list'][selector]
-            longest_artists_list = max(selected_artists.tolist(), key=lambda x: len(x))
-            final_artist_str = ' & '.join(sorted(longest_artists_list))
-
-            df_selector = selector[selector].index
-            df.loc[df_selector, 'artist'] = final_artist_str
+    """Uses the same artists string for every play of a song
+
+    Plays of a song that share at least one artist are linked, and
+    each connected group of plays gets the sorted artists of its
+    longest artists list (the first one, on ties). E.g. 'dua lipa'
+    and 'dua lipa & dababy' both become 'dababy & dua lipa'.
+
+    The work is done on the distinct (song, artist) pairs: an
+    inverted index from (song, single artist) to pairs drives a
+    union-find, and the results are broadcast back to the rows.
+    """
+    df['artists_list'] = df['artist'].str.split(' & ')
+
+    codes = df.groupby(['song', 'artist'], sort=False).ngroup().to_numpy()
+    # - rows with a missing song or artist (code -1) are kept as is
+    uniques, first_rows = np.unique(codes, return_index=True)
+    first_rows = first_rows[uniques >= 0]
+    songs = df['song'].to_numpy()[first_rows]
+    artists_lists = df['artists_list'].to_numpy()[first_rows]
+
+    # - link the pairs of a song that share an artist
+    parent = list(range(len(first_rows)))
+    index = {}
+    for pair, (song, artists) in enumerate(zip(songs, artists_lists)):
+        for artist in artists:
+            other = index.setdefault((song, artist), pair)
+            root, other_root = _find(parent, pair), _find(parent, other)
+            if root != other_root:
+                parent[max(root, other_root)] = min(root, other_root)
+
+    # - pick the first longest artists list of each group
+    longest = {}
+    for pair, artists in enumerate(artists_lists):
+        root = _find(parent, pair)
+        if root not in longest or len(artists) > len(longest[root]):
+            longest[root] = artists
+
+    final_artists = np.array([
+        ' & '.join(sorted(longest[_find(parent, pair)]))
+        for pair in range(len(first_rows))
+    ], dtype=object)
+    valid = codes >= 0
+    df.loc[valid, 'artist'] = final_artists[codes[valid]]
 
     return df
 
 
+@instrument.stage
 def additional_manual_fixes(df):
     sel = (df['song'] == 'dilema') & (df['artist'] == 'kelly roland & nelly')
     df['song'][sel] = 'dilemma'
@@ -135,34 +224,91 @@ def additional_manual_fixes(df):
     return df
 
 
-def parse_radio_df(radio, in_dir, debug=False):
-    print(f' - Parsing {radio}')
+def radio_paths(radio, in_dir):
+    """Lists the csv files of a radio, in chronological order"""
     paths = glob.glob(in_dir + f'{radio}_*.csv')
-    frames = []
-    for path in paths:
-        filename = os.path.splitext(os.path.basename(path))[0]
-        day, month, year = date_from_filename(filename)
+    return sorted(
+        paths,
+        key=lambda path: date_from_filename(os.path.basename(path))[::-1])
+
+
+def parse_file(radio, path):
+    filename = os.path.splitext(os.path.basename(path))[0]
+    day, month, year = date_from_filename(filename)
 
-        df = pd.read_csv(path, delimiter='|', names=['time', 'song', 'artist'])
-        df['date'] = f'{year}-{month:02d}-{day:02d}'
-        df['radio'] = radio
-        frames.append(df)
+    df = pd.read_csv(path, delimiter='|', names=['time', 'song', 'artist'])
+    df['date'] = f'{year}-{month:02d}-{day:02d}'
+    df['radio'] = radio
+    return df
+
+
+@instrument.stage
+def parse_radio_df(radio, in_dir, debug=False):
+    print(f' - Parsing {radio}')
+    paths = radio_paths(radio, in_dir)
+    frames = [parse_file(radio, path) for path in paths]
 
     df = pd.concat(frames)
     if debug:
+        filename = os.path.splitext(os.path.basename(paths[-1]))[0]
         df.sort_values(['song']).to_csv(filename + '_debug_sort_song.csv', index=False, sep='|')
         df.sort_values(['artist']).to_csv(filename + '_debug_sort_artist.csv', index=False, sep='|')
 
     return df
 
 
-def clean(df):
-    print(' - lowercasing')
+def parse_normalized_file(radio, path):
+    return normalize(parse_file(radio, path), verbose=False)
+
+
+@instrument.stage
+def parse_normalized(in_dir, workers=None):
+    """Parses and normalizes the files of every radio in a process pool
+
+    Normalizing is done value by value, so normalizing each file on
+    its own gives the same rows as normalizing them all at once. The
+    files are concatenated in the same order as the serial path.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    tasks = [(radio, path) for radio in RADIOS
+             for path in radio_paths(radio, in_dir)]
+    print(f' - Parsing {len(tasks)} files with {workers or "all"} workers')
+    with ProcessPoolExecutor(workers) as pool:
+        frames = list(
+            pool.map(parse_normalized_file, *zip(*tasks), chunksize=4))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def normalize(df, verbose=True):
+    """Cleans each row on its own: everything but the cross-row
+    normalization of songs with multiple artists"""
+    if verbose:
+        print(' - lowercasing')
     df = lowercase(df)
-    print(' - cleaning songs')
+    if verbose:
+        print(' - cleaning songs')
     df = clean_songs(df)
-    print(' - cleaning artists')
+    if verbose:
+        print(' - cleaning artists')
     df = clean_artist(df)
+
+    return df
+
+
+def clean(df, mapping_path=None):
+    df = normalize(df)
+    return clean_normalized(df, mapping_path)
+
+
+def clean_normalized(df, mapping_path=None):
+    """The cross-row steps of clean, on normalized rows. With a
+    `mapping_path`, near-duplicate spellings are merged first (see
+    dedupe.py)"""
+    if mapping_path is not None:
+        print(' - merging near-duplicate spellings')
+        df, _ = dedupe.deduplicate(df, mapping_path)
     print(' - normalizing songs with multiple artists')
     df = clean_musics_with_multiple_artists(df)
 
@@ -174,17 +320,80 @@ def main():
 
     parser = argparse.ArgumentParser(description='')
     parser.add_argument('-i', '--input', type=str, default='./data/')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='only parse and clean the files that changed since the last run')
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=None,
+        help='cache of the incremental mode (default: {input}/.cache/)')
+    parser.add_argument(
+        '--format',
+        choices=['parquet', 'csv', 'both'],
+        default='parquet',
+        help='parquet writes the columnar store data/all_data/, '
+        'csv writes data/all_data.csv')
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='parse and normalize the files in this many processes '
+        '(0: one per cpu)')
+    parser.add_argument(
+        '--dedupe',
+        nargs='?',
+        const=dedupe.MAPPING_PATH,
+        default=None,
+        metavar='MAPPING',
+        help='merge near-duplicate artists and songs, adding the new '
+        f'merges to the mapping file (default: {dedupe.MAPPING_PATH})')
+    instrument.add_arguments(parser)
     args = parser.parse_args()
 
-    print('Parsing each radio...')
-    df = [parse_radio_df(radio_name, args.input) for radio_name in RADIOS]
-    df = pd.concat(df, ignore_index=True)
+    instrument.start_from_args(args)
 
-    print('Cleaning dataframe...')
-    df = clean(df)
-    df = additional_manual_fixes(df)
+    if args.incremental:
+        from radio_repeat import ingest
+
+        cache_dir = args.cache_dir or os.path.join(args.input, '.cache')
+        df, touched = ingest.incremental_clean(
+            args.input, cache_dir, mapping_path=args.dedupe)
+    elif args.workers != 1:
+        print('Parsing and normalizing each file...')
+        df = parse_normalized(args.input, args.workers or None)
+
+        print('Cleaning dataframe...')
+        df = clean_normalized(df, args.dedupe)
+        touched = None
+    else:
+        print('Parsing each radio...')
+        df = [parse_radio_df(radio_name, args.input) for radio_name in RADIOS]
+        df = pd.concat(df, ignore_index=True)
 
-    df.to_csv('data/all_data.csv', index=False, sep='|')
+        print('Cleaning dataframe...')
+        df = clean(df, args.dedupe)
+        touched = None
+
+    if touched is not None:
+        sel = df['song'].isin(touched)
+    df = additional_manual_fixes(df)
+    if touched is not None:
+        # - the fixed songs are touched too
+        touched = touched | set(df.loc[sel, 'song'])
+
+    if args.format in ['parquet', 'both']:
+        from radio_repeat.store import write_store
+        write_store(df, 'data/all_data/')
+    if args.format in ['csv', 'both']:
+        df.to_csv('data/all_data.csv', index=False, sep='|')
+
+    print('Counting plays per radio, song, date and hour...')
+    from radio_repeat.cube import refresh_cube
+    refresh_cube(add_datetime(df[TEXT_COLUMNS].copy()), touched)
+    instrument.finish_from_args(args)
 
 
 if __name__ == '__main__':
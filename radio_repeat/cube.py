@@ -0,0 +1,198 @@
+"""Aggregate plays per radio, song, artist, date and hour
+
+The cube is built by clean_data.py from the cleaned dataset and saved
+as `data/cube.parquet`, sorted by date. Queries for any date range
+and radios read it instead of the plays: a date range is a slice of
+the sorted dates, and the song and artist columns are categoricals.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+CUBE_PATH = './data/cube.parquet'
+KEY = ['date', 'radio', 'hour', 'song', 'artist']
+
+
+def build_cube(df):
+    """Counts the plays of a load_dataset frame per KEY
+
+    Plays with a missing song or artist are kept, so the cube also
+    knows the dates and hours without any other plays.
+    """
+    plays = pd.DataFrame({
+        'date': df['date'],
+        'radio': df['radio'],
+        'hour': df['datetime'].dt.hour.astype(np.int8),
+        'song': df['song'],
+        'artist': df['artist'],
+        'time': df['time'],
+    })
+    cube = plays.groupby(KEY, dropna=False)['time'].count()
+    cube = cube.astype(np.int32).rename('plays').reset_index()
+    return _categorize(cube)
+
+
+def update_cube(cube, df, songs):
+    """Recounts the plays of `songs` in the cleaned dataset `df`
+
+    The rows of the other songs are kept as they are, unless most of
+    the plays are of `songs` and rebuilding is cheaper. Raises
+    ValueError when the plays per radio and date of the updated cube
+    do not match `df`, e.g. when the cube is from another dataset.
+    """
+    songs = list(songs)
+    touched = df['song'].isin(songs)
+    if touched.mean() > 0.5:
+        return build_cube(df)
+
+    kept = cube[~cube['song'].isin(songs)]
+    recounted = build_cube(df[touched])
+
+    columns = {}
+    for column in cube.columns:
+        if column in ['song', 'artist']:
+            columns[column] = union_categoricals(
+                [kept[column], recounted[column]], ignore_order=True)
+        else:
+            columns[column] = np.concatenate(
+                [kept[column].to_numpy(), recounted[column].to_numpy()])
+    cube = pd.DataFrame(columns)
+    cube = cube.sort_values('date', kind='stable', ignore_index=True)
+
+    expected = df.groupby(['radio', 'date'])['time'].count()
+    totals = cube.groupby(['radio', 'date'])['plays'].sum()
+    if not totals[totals > 0].sort_index().equals(
+            expected[expected > 0].sort_index().astype(totals.dtype)):
+        raise ValueError('The cube does not match the dataset')
+    return cube
+
+
+def refresh_cube(df, touched=None, path=CUBE_PATH):
+    """Writes the cube of the cleaned dataset `df` to `path`
+
+    With the set of `touched` songs of an incremental run, the cube of
+    the last run is updated instead of being built again.
+    """
+    cube = None
+    if touched is not None and os.path.exists(path):
+        try:
+            cube = update_cube(read_cube(path), df, touched)
+        except ValueError:
+            cube = None
+    if cube is None:
+        cube = build_cube(df)
+    write_cube(cube, path)
+
+
+def write_cube(cube, path=CUBE_PATH):
+    cube.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def read_cube(path=CUBE_PATH):
+    return _categorize(pd.read_parquet(path))
+
+
+def _categorize(cube):
+    for column in ['song', 'artist']:
+        cube[column] = cube[column].astype('category')
+    return cube
+
+
+class Cube:
+    """Queries over the plays of a cube
+
+    Every query takes an (inclusive) date range `start`-`end` and a
+    list of `radios`, all optional.
+    """
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.dates = cube['date'].to_numpy()
+
+    @classmethod
+    def load(cls, path=CUBE_PATH):
+        return cls(read_cube(path))
+
+    def select(self, start=None, end=None, radios=None):
+        """Returns the rows of the cube in the date range and radios"""
+        first, last = 0, len(self.dates)
+        if start is not None:
+            day = np.datetime64(pd.Timestamp(start).normalize())
+            first = np.searchsorted(self.dates, day, side='left')
+        if end is not None:
+            day = np.datetime64(pd.Timestamp(end).normalize())
+            last = np.searchsorted(self.dates, day, side='right')
+
+        rows = self.cube.iloc[first:last]
+        if radios is not None:
+            rows = rows[rows['radio'].isin(radios)]
+        return rows
+
+    def count_days(self, start=None, end=None, radios=None):
+        """Number of dates with plays, see analysis.count_days"""
+        return len(self.select(start, end, radios)['date'].unique())
+
+    def histograms(self, start=None, end=None, radios=None):
+        """Repetition histograms, see analysis.repetition_histograms"""
+        from radio_repeat.analysis import daily_histograms
+
+        rows = self.select(start, end, radios)
+        rows = rows[rows['song'].notna() & rows['artist'].notna()]
+        daily = rows.groupby(['radio', 'song', 'artist', 'date'],
+                             observed=True)['plays'].sum()
+        return daily_histograms(daily.astype(np.int64))
+
+    def top_songs(self, n=10, start=None, end=None, radios=None):
+        """Returns the `n` most played (song, artist)"""
+        rows = self.select(start, end, radios)
+        plays = rows.groupby(['song', 'artist'], observed=True)['plays'].sum()
+        top = plays.sort_values(ascending=False, kind='stable')[:n]
+        return top.reset_index()
+
+    def hourly_plays(self, start=None, end=None, radios=None):
+        """Returns the plays per hour of the day (rows) and radio"""
+        rows = self.select(start, end, radios)
+        return rows.pivot_table(
+            index='hour', columns='radio', values='plays', aggfunc='sum',
+            fill_value=0)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Queries the cube')
+    parser.add_argument('-i', '--input', type=str, default=CUBE_PATH)
+    parser.add_argument('--start', type=str, default=None)
+    parser.add_argument('--end', type=str, default=None)
+    parser.add_argument('--radios', nargs='+', default=None)
+    parser.add_argument(
+        '--top', type=int, default=10, help='number of top songs to show')
+    args = parser.parse_args()
+
+    from radio_repeat import analysis
+
+    cube = Cube.load(args.input)
+    histograms = cube.histograms(args.start, args.end, args.radios)
+    days = cube.count_days(args.start, args.end, args.radios)
+    radios = args.radios or analysis.RADIOS
+
+    print('\n\nDaily Stats\n')
+    for radio in radios:
+        avg = analysis.avg_daily_radio_repetitions(None, radio, histograms,
+                                                   days)
+        print(f'{radio}: plays musics an avg of {avg:.1f} times per day')
+
+    print('\n\nWeek Stats\n')
+    for radio in radios:
+        avg = analysis.avg_week_radio_repetitions(None, radio, histograms)
+        print(f'{radio}: plays musics an avg of {avg:.1f} days per week')
+
+    print('\n\nTop songs\n')
+    print(cube.top_songs(args.top, args.start, args.end, args.radios))
+
+
+if __name__ == '__main__':
+    main()
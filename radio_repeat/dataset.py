@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from radio_repeat import instrument
+
+DATA_PATH = './data/all_data.csv'
+STORE_PATH = './data/all_data/'
+TEXT_COLUMNS = ['time', 'song', 'artist', 'date', 'radio']
+
+
+def time_to_minutes(times):
+    """Converts an array of 'HH:MM' strings to minutes since midnight
+
+    Missing times are np.iinfo(np.int64).min, which is NaT as a
+    timedelta64.
+    """
+    offsets = pd.to_timedelta(pd.Index(times, dtype=object) + ':00')
+    minutes = offsets.asi8 // pd.Timedelta(minutes=1).value
+    minutes[offsets.isna()] = np.iinfo(np.int64).min
+    return minutes
+
+
+def minutes_to_time(minutes):
+    """Converts an array of minutes since midnight to 'HH:MM' strings"""
+    codes, uniques = pd.factorize(minutes)
+    times = np.array([f'{m // 60:02d}:{m % 60:02d}' for m in uniques] +
+                     [np.nan],
+                     dtype=object)
+    return times[codes]
+
+
+def add_datetime(df):
+    """Adds the `datetime` column and converts `date` to datetime64
+
+    Instead of parsing a '{date} {time}' string per row, the distinct
+    dates and times are parsed once and the timestamps are built
+    from the day start plus an integer minute offset. A missing date
+    or time gives a NaT `datetime`.
+    """
+    date_codes, dates = pd.factorize(df['date'])
+    time_codes, times = pd.factorize(df['time'])
+
+    # - the missing values have the code -1, the NaT at the end
+    days = np.append(
+        pd.to_datetime(dates).to_numpy(dtype='datetime64[ns]'),
+        np.datetime64('NaT', 'ns'))
+    minutes = np.append(
+        time_to_minutes(times).astype('timedelta64[m]'),
+        np.timedelta64('NaT', 'm'))
+
+    df['datetime'] = days[date_codes] + minutes[time_codes]
+    df['date'] = days[date_codes]
+    return df
+
+
+@instrument.stage
+def load_dataset(path=None, start=None, end=None, radios=None,
+                 columns=None):
+    """Loads the cleaned dataset written by clean_data.py
+
+    `path` is either the columnar store directory or the csv file. By
+    default, the store is used when it exists.
+
+    Returns a pd.DataFrame with the text columns as str, `date` and
+    `datetime` as datetime64. If given, `start` and `end` restrict
+    the (inclusive) range of dates, `radios` the radios and `columns`
+    the columns that are loaded.
+    """
+    if path is None:
+        path = STORE_PATH if os.path.isdir(STORE_PATH) else DATA_PATH
+    if os.path.isdir(path):
+        from radio_repeat.store import read_store
+        return read_store(path, columns, start, end, radios)
+
+    dtypes = {column: str for column in TEXT_COLUMNS}
+    df = pd.read_csv(path, delimiter='|', dtype=dtypes, usecols=columns)
+    return _prepare(df, start, end, radios)
+
+
+def iter_dataset(path=None, start=None, end=None, radios=None,
+                 columns=None, chunksize=1 << 18):
+    """Same as load_dataset, as frames of up to `chunksize` plays
+
+    The frames follow the order of the plays in the file or store,
+    which clean_data.py writes by radio and then by date.
+    """
+    if path is None:
+        path = STORE_PATH if os.path.isdir(STORE_PATH) else DATA_PATH
+    if os.path.isdir(path):
+        from radio_repeat.store import iter_store
+        yield from iter_store(path, columns, start, end, radios, chunksize)
+        return
+
+    dtypes = {column: str for column in TEXT_COLUMNS}
+    chunks = pd.read_csv(path, delimiter='|', dtype=dtypes, usecols=columns,
+                         chunksize=chunksize)
+    for df in chunks:
+        df = _prepare(df, start, end, radios)
+        if len(df):
+            yield df
+
+
+def _prepare(df, start, end, radios):
+    if 'date' in df and 'time' in df:
+        df = add_datetime(df)
+
+    if start is not None:
+        df = df[df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df['date'] <= pd.Timestamp(end)]
+    if radios is not None:
+        df = df[df['radio'].isin(radios)]
+
+    return df
@@ -0,0 +1,357 @@
+"""Finds near-duplicate spellings of artists and songs
+
+The cleaning rules of clean_data.py fix the spelling variants that
+were found by hand. This module proposes the others: the distinct
+normalized artists, and the distinct songs of each artist, are
+compared with their similar-looking neighbours only, and the close
+ones are merged into the most played spelling.
+
+Candidates come from a blocking index on the MinHash signatures of
+the character trigrams (locality sensitive hashing): only values in
+the same bucket of some band are compared, which keeps the number of
+comparisons close to the number of similar pairs instead of
+quadratic. Candidates with an estimated trigram Jaccard similarity
+from about BLOCK_SIMILARITY are then scored with an edit similarity
+(difflib), and kept from MIN_SCORE.
+
+The merges are written to a mapping file to be reviewed. Setting the
+canonical name of a row to its variant rejects the merge, and the
+rows already in the file are kept as they are on the next runs. When
+a later run merges a canonical spelling into another one, the older
+variants follow it there.
+
+    python dedupe.py
+    python clean_data.py --dedupe
+"""
+import difflib
+import os
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MAPPING_PATH = './data/dedupe.csv'
+MAPPING_COLUMNS = ['kind', 'artist', 'variant', 'canonical', 'score', 'plays']
+BLOCK_SIMILARITY = 0.5
+BANDS = 20
+ROWS = 3
+PRIME = (1 << 31) - 1
+ESTIMATE_MARGIN = 0.1
+MIX = np.uint64(0x9E3779B97F4A7C15)
+MIN_SCORE = 0.9
+MIN_LENGTH = 4
+NUMBERS = re.compile(r'\d+')
+
+
+def ngrams(value, n=3):
+    """Character n-grams of `value`, padded with a space"""
+    value = f' {value} '
+    return {value[i:i + n] for i in range(len(value) - n + 1)}
+
+
+def minhash_signatures(grams, n_hashes, seed=0):
+    """MinHash signatures of the sets of `grams`, an (n, n_hashes)
+    array
+
+    Each distinct gram is hashed with crc32 and then with `n_hashes`
+    random linear hashes, so the signatures do not change from a run
+    to the next.
+    """
+    ids = {}
+    sizes = np.array([len(x) for x in grams], dtype=np.int64)
+    gram_ids = np.array(
+        [ids.setdefault(g, len(ids)) for x in grams for g in x],
+        dtype=np.int64)
+    gram_hashes = np.array([zlib.crc32(g.encode()) for g in ids],
+                           dtype=np.uint64)
+
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, PRIME, n_hashes, dtype=np.uint64)
+    b = rng.integers(0, PRIME, n_hashes, dtype=np.uint64)
+    # - values are below 2**32 and PRIME below 2**31, so no overflow
+    hashes = (gram_hashes[:, None] % PRIME * a + b) % PRIME
+
+    # - the grams of each value are contiguous
+    signatures = np.full((len(grams), n_hashes), PRIME, dtype=np.uint64)
+    offsets = np.cumsum(sizes) - sizes
+    some = sizes > 0
+    if some.any():
+        signatures[some] = np.minimum.reduceat(
+            hashes[gram_ids], offsets[some], axis=0)
+    return signatures
+
+
+def candidate_pairs(values, groups=None, threshold=BLOCK_SIMILARITY,
+                    bands=BANDS, rows=ROWS):
+    """Pairs of `values` whose trigram Jaccard similarity is at least
+    `threshold`, and of the same group if `groups` are given
+
+    Candidates come from a MinHash index in `bands` bands of `rows`
+    hashes: two values are candidates when all the hashes of a band
+    are the same, which is likely for similar values and rare for the
+    others. Their similarity is then estimated from the signatures, so
+    a few pairs just below or above `threshold` may be on the wrong
+    side. Returns a list of (i, j) positions with i < j.
+    """
+    grams = [ngrams(value) for value in values]
+    signatures = minhash_signatures(grams, bands * rows)
+    group_ids = np.zeros(len(values), dtype=np.int64)
+    if groups is not None:
+        group_ids = pd.factorize(pd.Index(groups))[0].astype(np.int64)
+
+    # - the group, band and hashes of each bucket mixed in a 64 bits key
+    keys = []
+    for band in range(bands):
+        key = group_ids.astype(np.uint64) * MIX + np.uint64(band)
+        for column in range(band * rows, (band + 1) * rows):
+            key = key * MIX + signatures[:, column]
+        keys.append(key)
+    keys = np.concatenate(keys)
+    members = np.tile(np.arange(len(values)), bands)
+
+    # - the pairs of values in the buckets of more than one value,
+    #   generated for all the buckets of the same size at once
+    order = np.argsort(keys, kind='stable')
+    keys, members = keys[order], members[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    found = [np.empty(0, dtype=np.int64)]
+    for size in np.unique(sizes[sizes > 1]):
+        buckets = members[starts[sizes == size][:, None] + np.arange(size)]
+        first, second = np.triu_indices(size, 1)
+        i, j = buckets[:, first].ravel(), buckets[:, second].ravel()
+        found.append(np.minimum(i, j) * len(values) + np.maximum(i, j))
+    found = np.unique(np.concatenate(found))
+    i, j = found // len(values), found % len(values)
+    # - in case of a collision of keys
+    same_group = group_ids[i] == group_ids[j]
+    i, j = i[same_group], j[same_group]
+
+    # - the share of equal hashes estimates the Jaccard similarity,
+    #   the margin keeps the pairs just above `threshold`
+    chunk = 1 << 16
+    estimate = np.concatenate([
+        (signatures[i[k:k + chunk]] == signatures[j[k:k + chunk]]).mean(1)
+        for k in range(0, len(i), chunk)
+    ] + [np.empty(0)])
+    sel = estimate >= threshold - ESTIMATE_MARGIN
+    return list(zip(i[sel].tolist(), j[sel].tolist()))
+
+
+def similar(a, b, min_score=0.0):
+    """Edit similarity of two spellings, or 0 when they can not be the
+    same name (too short, or with different numbers) or when it is
+    surely below `min_score`"""
+    if min(len(a), len(b)) < MIN_LENGTH:
+        return 0.0
+    if NUMBERS.findall(a) != NUMBERS.findall(b):
+        return 0.0
+    matcher = difflib.SequenceMatcher(None, a, b)
+    # - upper bounds of the ratio, much faster to compute
+    if matcher.real_quick_ratio() < min_score:
+        return 0.0
+    if matcher.quick_ratio() < min_score:
+        return 0.0
+    return matcher.ratio()
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def merge_spellings(values, plays, groups=None, min_score=MIN_SCORE):
+    """Clusters the near-duplicate `values`, within each of the
+    `groups` if given
+
+    Returns a pd.DataFrame with a row per value that is not the
+    canonical spelling of its cluster: its `group`, the `variant`, the
+    `canonical` spelling (the most played one, the first one on ties),
+    the best `score` of the variant and its `plays`.
+    """
+    values = list(values)
+    groups = [None] * len(values) if groups is None else list(groups)
+    parent = list(range(len(values)))
+    scores = {}
+    for i, j in candidate_pairs(values, groups):
+        score = similar(values[i], values[j], min_score)
+        if score < min_score:
+            continue
+        root, other_root = _find(parent, i), _find(parent, j)
+        if root != other_root:
+            parent[max(root, other_root)] = min(root, other_root)
+        scores[i] = max(scores.get(i, 0), score)
+        scores[j] = max(scores.get(j, 0), score)
+
+    canonical = {}
+    for i in sorted(scores):
+        root = _find(parent, i)
+        if root not in canonical or plays[i] > plays[canonical[root]]:
+            canonical[root] = i
+
+    rows = [(groups[i], values[i], values[canonical[_find(parent, i)]],
+             round(scores[i], 3), plays[i]) for i in sorted(scores)
+            if i != canonical[_find(parent, i)]]
+    return pd.DataFrame(
+        rows, columns=['group', 'variant', 'canonical', 'score', 'plays'])
+
+
+def propose(df, min_score=MIN_SCORE):
+    """Proposes the merges of the artists, and then of the songs of
+    each artist, of a frame of normalized plays
+
+    Returns a pd.DataFrame with the MAPPING_COLUMNS.
+    """
+    df = df[df['song'].notna() & df['artist'].notna()]
+
+    artists = df.groupby('artist').size()
+    merged_artists = merge_spellings(
+        artists.index, artists.to_numpy(), min_score=min_score)
+    merged_artists['kind'] = 'artist'
+    merged_artists['group'] = ''
+
+    df = apply_mapping(df[['song', 'artist']].copy(), merged_artists)
+    songs = df.groupby(['artist', 'song']).size()
+    merged_songs = merge_spellings(
+        songs.index.get_level_values('song'),
+        songs.to_numpy(),
+        groups=songs.index.get_level_values('artist'),
+        min_score=min_score)
+    merged_songs['kind'] = 'song'
+
+    mapping = pd.concat([merged_artists, merged_songs], ignore_index=True)
+    return mapping.rename(columns={'group': 'artist'})[MAPPING_COLUMNS]
+
+
+def read_mapping(path=MAPPING_PATH):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=MAPPING_COLUMNS)
+    return pd.read_csv(path, sep='|', dtype=str, keep_default_na=False)
+
+
+def update_mapping(proposals, path=MAPPING_PATH):
+    """Adds the new `proposals` to the mapping file
+
+    The rows already in the file, maybe edited by hand, are kept as
+    they are. Returns the updated mapping.
+    """
+    mapping = read_mapping(path)
+    key = ['kind', 'artist', 'variant']
+    known = pd.MultiIndex.from_frame(mapping[key].astype(str))
+    new = proposals[~pd.MultiIndex.from_frame(
+        proposals[key].astype(str)).isin(known)]
+
+    mapping = pd.concat([mapping, new.astype(str)], ignore_index=True)
+    mapping = mapping.sort_values(key, ignore_index=True)
+    mapping.to_csv(path, sep='|', index=False)
+    return mapping
+
+
+def apply_mapping(df, mapping):
+    """Renames the variants of `mapping` to their canonical spelling,
+    the artists first and then the songs of each artist
+
+    A canonical spelling that is itself a variant of a later merge is
+    followed, e.g. a -> b and b -> c renames a to c. Returns `df`, with
+    the `song` and `artist` columns replaced.
+    """
+    mapping = mapping[mapping['variant'] != mapping['canonical']]
+
+    artists = mapping[mapping['kind'] == 'artist']
+    if len(artists):
+        renames = _resolve(dict(zip(artists['variant'],
+                                    artists['canonical'])))
+        df['artist'] = _rename(df['artist'], renames)
+
+    songs = mapping[mapping['kind'] == 'song']
+    if len(songs):
+        # - '|' separates the fields of the files, so no name has it
+        resolved = _resolve(
+            dict(zip(songs['artist'] + '|' + songs['variant'],
+                     songs['artist'] + '|' + songs['canonical'])))
+        renames = {
+            pair: canonical.split('|', 1)[1]
+            for pair, canonical in resolved.items()
+        }
+        pairs = df['artist'] + '|' + df['song']
+        renamed = _rename(pairs, renames)
+        df['song'] = renamed.where(pairs.notna() & (renamed != pairs),
+                                   df['song'])
+    return df
+
+
+def deduplicate(df, path=MAPPING_PATH, min_score=MIN_SCORE):
+    """Adds the merges proposed for `df` to the mapping file and
+    applies the file to `df`
+
+    Returns a tuple (df, renamed) where `renamed` is the set of songs
+    of the renamed rows, with their old and new names.
+    """
+    mapping = update_mapping(propose(df, min_score), path)
+    before = df[['song', 'artist']].copy()
+    df = apply_mapping(df, mapping)
+
+    changed = ((df['song'] != before['song']) |
+               (df['artist'] != before['artist'])) & before['song'].notna()
+    renamed = set(before.loc[changed, 'song']) | set(df.loc[changed, 'song'])
+    return df, renamed
+
+
+def _resolve(renames):
+    """Follows the chains of `renames` to their last value
+
+    The values of a cycle, which can only come from edits by hand, are
+    all renamed to the smallest of them.
+    """
+    resolved = {}
+    for value in renames:
+        chain = [value]
+        while chain[-1] in renames and renames[chain[-1]] not in chain:
+            chain.append(renames[chain[-1]])
+        if chain[-1] in renames:
+            resolved[value] = min(chain[chain.index(renames[chain[-1]]):])
+        else:
+            resolved[value] = chain[-1]
+    return resolved
+
+
+def _rename(series, renames):
+    """Replaces the values of `series` in `renames`, once per distinct
+    value"""
+    codes, uniques = pd.factorize(series)
+    renamed = np.array([renames.get(value, value) for value in uniques] +
+                       [np.nan],
+                       dtype=object)
+    return pd.Series(renamed[codes], index=series.index, name=series.name)
+
+
+def main():
+    import argparse
+
+    from radio_repeat.dataset import load_dataset
+
+    parser = argparse.ArgumentParser(
+        description='Proposes merges of near-duplicate artists and songs')
+    parser.add_argument(
+        '-i',
+        '--input',
+        type=str,
+        default=None,
+        help='store or csv file (default: the dataset)')
+    parser.add_argument('-o', '--output', type=str, default=MAPPING_PATH)
+    parser.add_argument('--min-score', type=float, default=MIN_SCORE)
+    args = parser.parse_args()
+
+    df = load_dataset(args.input, columns=['song', 'artist'])
+    proposals = propose(df, args.min_score)
+    before = len(read_mapping(args.output))
+    mapping = update_mapping(proposals, args.output)
+    print(mapping.to_string(index=False))
+    print(f'{len(mapping) - before} new merges written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Extraction of the plays from the pages of the radio websites
+
+A page is described by a spec: the (tag, classes) of the element
+holding each play, of each of its fields and, optionally, of the
+container of the plays.
+Plays can be extracted with one of these backends:
+
+- 'bs4': BeautifulSoup with html.parser, the reference implementation
+- 'lxml': lxml.html with XPath (optional dependency)
+- 'regex': targeted regular expressions for the spec's class names
+
+'bs4' is the default. The faster backends are opt-in, and fall back
+to 'bs4' when a page does not have the structure they expect: a play
+without one of its fields and, for 'regex', a non-empty page without
+any play element, a field that holds a nested element of its own tag
+(e.g. a <span> in a <span>) or unquoted class attributes. A page
+with an empty container has no plays. 'lxml' also
+falls back when lxml is not installed. 'bs4' leaves out the plays
+without one of their fields.
+"""
+import functools
+import html as html_lib
+import re
+
+import bs4
+
+try:
+    import lxml.html
+except ImportError:  # pragma: no cover
+    lxml = None
+
+
+def make_spec(item, fields, container=None):
+    """Builds a spec from (tag, class or classes) pairs
+
+    `fields` is a list of (tag, classes) pairs, in the order of the
+    values of the extracted rows. `container` is the element that
+    holds the plays, empty on the pages without plays.
+    """
+
+    def classes(names):
+        return (names, ) if isinstance(names, str) else tuple(names)
+
+    return {
+        'item': (item[0], classes(item[1])),
+        'fields': tuple((tag, classes(names)) for tag, names in fields),
+        'container': (None if container is None else
+                      (container[0], classes(container[1]))),
+    }
+
+
+def extract_bs4(html, spec):
+    tag, classes = spec['item']
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+
+    rows = []
+    for item in soup.find_all(tag, {'class': list(classes)}):
+        fields = [
+            item.find(field_tag, {'class': list(field_classes)})
+            for field_tag, field_classes in spec['fields']
+        ]
+        # - e.g. a jingle without an artist, it is not a play
+        if None not in fields:
+            rows.append(tuple(field.text for field in fields))
+    return rows
+
+
+def _xpath_class(tag, classes):
+    tests = [
+        f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+        for name in classes
+    ]
+    return f"{tag}[{' or '.join(tests)}]"
+
+
+def extract_lxml(html, spec):
+    if lxml is None:
+        raise ImportError('the lxml backend needs the lxml package')
+
+    if not html.strip():
+        return []
+    document = lxml.html.document_fromstring(html)
+    fields = [
+        './/' + _xpath_class(tag, classes) for tag, classes in spec['fields']
+    ]
+
+    rows = []
+    for item in document.xpath('//' + _xpath_class(*spec['item'])):
+        row = []
+        for field in fields:
+            matches = item.xpath(field)
+            if not matches:
+                raise StructureError(f'missing {field!r} in play')
+            row.append(matches[0].text_content())
+        rows.append(tuple(row))
+    return rows
+
+
+def _open_tag(tag, classes):
+    names = '|'.join(re.escape(name) for name in classes)
+    return (rf'<{tag}\b[^>]*?\bclass\s*=\s*(["\'])(?:[^"\']*\s)?(?:{names})'
+            rf'(?:\s[^"\']*)?\1[^>]*>')
+
+
+_TAG = re.compile(r'<[^>]*>')
+_UNQUOTED_CLASS = re.compile(r'\bclass\s*=\s*[^"\'\s>]', re.I)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile(item, fields):
+    return (
+        re.compile(_open_tag(*item), re.I),
+        [(
+            re.compile(
+                _open_tag(tag, classes) + rf'(.*?)</{tag}\s*>', re.I | re.S),
+            re.compile(rf'<{tag}\b', re.I),
+        ) for tag, classes in fields],
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_empty(container):
+    tag, _ = container
+    return re.compile(_open_tag(*container) + rf'\s*</{tag}\s*>', re.I)
+
+
+class StructureError(ValueError):
+    pass
+
+
+def extract_regex(html, spec):
+    """Finds each play element and searches its fields up to the start
+    of the next play element
+
+    Raises StructureError on the markup that the regular expressions
+    may read wrong, see the module docstring.
+    """
+    if _UNQUOTED_CLASS.search(html):
+        raise StructureError('unquoted class attribute')
+    item_re, field_res = _compile(spec['item'], spec['fields'])
+    starts = [m.start() for m in item_re.finditer(html)] + [len(html)]
+    if len(starts) == 1 and html.strip():
+        if (spec.get('container') is not None and
+                _compile_empty(spec['container']).search(html)):
+            return []
+        # - either a page without plays or a markup change
+        raise StructureError('no play element')
+
+    rows = []
+    for start, end in zip(starts[:-1], starts[1:]):
+        row = []
+        for field_re, nested_re in field_res:
+            match = field_re.search(html, start, end)
+            if match is None:
+                raise StructureError(
+                    f'missing {field_re.pattern!r} in play at {start}')
+            text = match.group(2)
+            if nested_re.search(text):
+                raise StructureError(f'nested element in play at {start}')
+            row.append(html_lib.unescape(_TAG.sub('', text)))
+        rows.append(tuple(row))
+    return rows
+
+
+BACKENDS = {
+    'bs4': extract_bs4,
+    'lxml': extract_lxml,
+    'regex': extract_regex,
+}
+DEFAULT_BACKEND = 'bs4'
+
+
+def extract_rows(html, spec, backend=DEFAULT_BACKEND):
+    """Extracts the plays of a page as a list of tuples of field texts"""
+    try:
+        return BACKENDS[backend](html, spec)
+    except (StructureError, ImportError):
+        return extract_bs4(html, spec)
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds before a request is given up and retried
+TIMEOUT = (10, 30)
+
+
+class RateLimiter:
+    """Spaces the requests to each host by at least `interval` seconds"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, url):
+        if self.interval <= 0:
+            return
+
+        host = urlsplit(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(pool_size):
+    """Creates a requests.Session that keeps up to `pool_size`
+    connections open per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch(session, request, limiter, retries=2, backoff=1.0,
+          timeout=TIMEOUT):
+    """Sends a request, retrying on connection errors, timeouts and 5xx
+    answers. A `timeout` in `request` overrides the default one"""
+    request = {'timeout': timeout, **request}
+    for attempt in range(retries + 1):
+        limiter.wait(request['url'])
+        try:
+            response = session.request(**request)
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response.text
+            error = requests.HTTPError(
+                f'{response.status_code} for {response.url}',
+                response=response)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt < retries:
+            time.sleep(backoff * 2**attempt)
+
+    raise error
+
+
+def iter_fetch(plan, workers=8, interval=0.0, retries=2, session=None,
+               timeout=TIMEOUT):
+    """Fetches the requests in `plan` concurrently
+
+    `plan` is a list of keyword arguments for requests.Session.request
+    (method, url, data, params...). Yields the response texts in the
+    same order as `plan`, as soon as each one and all the previous
+    ones are available. A session created here is closed at the end.
+    """
+    own_session = session is None
+    if own_session:
+        session = make_session(workers)
+    limiter = RateLimiter(interval)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(
+                lambda request: fetch(session, request, limiter, retries,
+                                      timeout=timeout), plan)
+    finally:
+        if own_session:
+            session.close()
+
+
+def fetch_all(plan, workers=8, interval=0.0, retries=2, session=None,
+              timeout=TIMEOUT):
+    """Same as iter_fetch, but returns a list with all the texts"""
+    return list(iter_fetch(plan, workers, interval, retries, session,
+                           timeout))
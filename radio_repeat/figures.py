@@ -0,0 +1,189 @@
+"""Pie charts of many date windows, drawn again only when they change
+
+Each figure is keyed on a hash of the slices it shows (see
+analysis.daily_repetitions_pie_data), which are cheap to aggregate
+compared to drawing. The keys of the figures of an output folder are
+kept in its `.figures.json`: a figure whose file exists with the same
+key is not drawn again. The figures are drawn with the
+non-interactive Agg backend, in a process pool with `workers` > 1.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from radio_repeat import instrument
+from radio_repeat.analysis import (RADIOS, daily_repetitions_pie_data,
+                                   repetition_histograms, select_radio,
+                                   week_repetitions_pie_data)
+from radio_repeat.dataset import TEXT_COLUMNS, load_dataset
+
+MANIFEST = '.figures.json'
+# - bump it when the drawing changes, to draw every figure again
+RENDER_VERSION = 1
+
+
+def figure_key(kind, data):
+    """Hash of the slices of a figure, a {radio: pd.Series}"""
+    slices = [[radio, [str(label) for label in counts.index],
+               counts.to_numpy(dtype=float).round(12).tolist()]
+              for radio, counts in data.items()]
+    payload = json.dumps([RENDER_VERSION, kind, slices])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def pie_jobs(df, out_dir, radios=None, suffix='', histograms=None):
+    """Lists the (kind, data, path) figures of the pie reports of `df`
+
+    The radios without plays are left out of the figures.
+    """
+    if histograms is None:
+        histograms = repetition_histograms(df)
+    jobs = [
+        ('daily', daily_repetitions_pie_data(df, histograms, radios=radios),
+         os.path.join(out_dir, f'daily_repetitions{suffix}.png')),
+        ('week', week_repetitions_pie_data(df, histograms, radios),
+         os.path.join(out_dir, f'weekly_repetitions{suffix}.png')),
+    ]
+    return [(kind, {radio: counts
+                    for radio, counts in data.items() if len(counts)}, path)
+            for kind, data, path in jobs]
+
+
+def date_windows(start, end, days=7):
+    """Splits the dates from `start` to `end` in windows of `days`
+    days, a list of (first, last) pd.Timestamps"""
+    end = pd.Timestamp(end)
+    return [(first, min(first + pd.Timedelta(days=days - 1), end))
+            for first in pd.date_range(start, end, freq=f'{days}D')]
+
+
+def window_jobs(df, out_dir, windows, radios=None, per_radio=False):
+    """Lists the pie figures of each window of dates of `df`, and of
+    each radio with `per_radio`
+
+    The files are named after the window, e.g.
+    `daily_repetitions_2020-08-10_2020-08-16.png`.
+    """
+    jobs = []
+    for first, last in windows:
+        plays = df[(df['date'] >= first) & (df['date'] <= last)]
+        if plays.empty:
+            continue
+        suffix = f'_{first:%Y-%m-%d}_{last:%Y-%m-%d}'
+        if not per_radio:
+            jobs += pie_jobs(plays, out_dir, radios, suffix)
+            continue
+        for radio in radios or RADIOS:
+            radio_plays = select_radio(plays, radio)
+            if len(radio_plays):
+                jobs += pie_jobs(radio_plays, out_dir, [radio],
+                                 f'{suffix}_{radio}')
+    return jobs
+
+
+@instrument.stage
+def render(jobs, workers=1, force=False):
+    """Draws the figures of `jobs` whose data changed since they were
+    last drawn, or all of them with `force`
+
+    `workers` is the number of processes that draw the figures (None
+    or 0: one per cpu). Returns the paths of the figures drawn.
+    """
+    manifests, keys, todo = {}, {}, []
+    for kind, data, path in jobs:
+        out_dir = os.path.dirname(path) or '.'
+        if out_dir not in manifests:
+            manifests[out_dir] = read_manifest(out_dir)
+        key = figure_key(kind, data)
+        name = os.path.basename(path)
+        if (not force and manifests[out_dir].get(name) == key and
+                os.path.exists(path)):
+            continue
+        keys[path] = key
+        todo.append((kind, data, path))
+
+    print(f' - drawing {len(todo)} of {len(jobs)} figures')
+    if workers == 1 or len(todo) < 2:
+        for job in todo:
+            _draw(job)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(workers or None) as pool:
+            list(pool.map(_draw, todo))
+
+    for path, key in keys.items():
+        out_dir = os.path.dirname(path) or '.'
+        manifests[out_dir][os.path.basename(path)] = key
+    for out_dir in {os.path.dirname(path) or '.' for path in keys}:
+        write_manifest(out_dir, manifests[out_dir])
+    return [path for _, _, path in todo]
+
+
+def read_manifest(out_dir):
+    path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _draw(job):
+    import matplotlib
+    matplotlib.use('Agg')
+    from radio_repeat.analysis import draw_pies
+
+    kind, data, path = job
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    draw_pies(kind, data, path)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Pie charts of the repetitions of each window of dates')
+    parser.add_argument('-i', '--input', type=str, default=None)
+    parser.add_argument('--start', type=str, default='2020-08-10')
+    parser.add_argument('--end', type=str, default='2020-08-16')
+    parser.add_argument(
+        '--days', type=int, default=7, help='days of each window')
+    parser.add_argument('--radios', nargs='+', choices=RADIOS, default=None)
+    parser.add_argument(
+        '--per-radio', action='store_true', help='a figure per radio')
+    parser.add_argument('-o', '--out', type=str, default='./figures/')
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        help='draw the figures in this many processes (0: one per cpu)')
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='draw the figures again even if their data did not change')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrument.start_from_args(args)
+    df = load_dataset(args.input, args.start, args.end, args.radios,
+                      columns=TEXT_COLUMNS)
+    windows = date_windows(args.start, args.end, args.days)
+    jobs = window_jobs(df, args.out, windows, args.radios, args.per_radio)
+    drawn = render(jobs, args.workers, args.force)
+    for path in drawn:
+        print(f'Wrote {path}')
+    instrument.finish_from_args(args)
+
+
+if __name__ == '__main__':
+    main()
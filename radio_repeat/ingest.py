@@ -0,0 +1,211 @@
+"""Incremental cleaning of the scraped csv files
+
+Each input file is fingerprinted (mtime, size and sha1) and its
+normalized rows are cached. On a new run, only the new or changed
+files are parsed and normalized again, and the normalization of
+songs with multiple artists is only recomputed for the songs that
+appear in them. The other songs reuse the artists of the last run.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import pandas as pd
+
+from radio_repeat import clean_data
+from radio_repeat import dedupe
+
+MANIFEST = 'manifest.json'
+ARTISTS = 'artists.pkl'
+
+
+def rules_fingerprint():
+    """Identifies the normalization rules, to invalidate the cache
+    when they change
+
+    The rule tables are hashed with the source of their functions and
+    of the steps that apply them. Bump clean_data.NORMALIZE_VERSION
+    for changes that the source does not show, e.g. a new unidecode.
+    """
+
+    def describe(rule):
+        if not callable(rule):
+            return rule
+        try:
+            return inspect.getsource(rule)
+        except (OSError, TypeError):
+            # - builtins such as str.strip have no source
+            return rule.__qualname__
+
+    steps = [
+        clean_data.parse_file, clean_data.normalize, clean_data.lowercase,
+        clean_data.clean_songs, clean_data.clean_artist,
+        clean_data.compile_rules, clean_data.normalize_column
+    ]
+    rules = [clean_data.NORMALIZE_VERSION] + [
+        describe(rule) for rule in clean_data.ARTIST_RULES +
+        clean_data.SONG_RULES + steps
+    ]
+    return hashlib.sha1(json.dumps(rules).encode()).hexdigest()
+
+
+def file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def file_unchanged(path, entry):
+    """Checks a file against its manifest entry
+
+    The sha1 is only computed when the mtime or size differ. If the
+    contents are the same, the entry is updated with the new stat.
+    """
+    if entry is None:
+        return False
+
+    stat = os.stat(path)
+    if stat.st_mtime_ns == entry['mtime'] and stat.st_size == entry['size']:
+        return True
+    if stat.st_size == entry['size'] and file_sha1(path) == entry['sha1']:
+        entry['mtime'] = stat.st_mtime_ns
+        return True
+    return False
+
+
+def load_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'rules': None, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def cache_file(cache_dir, path, sha1):
+    name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(cache_dir, f'{name}_{sha1}.pkl')
+
+
+def load_normalized(in_dir, cache_dir, verbose=True):
+    """Returns the normalized rows of all the input files
+
+    Returns a tuple (df, touched, manifest, obsolete): `touched` is the
+    set of songs of the files that were added, changed or removed
+    since the last run, and `obsolete` lists the cache files to remove
+    once the new manifest is saved.
+    """
+    manifest = load_manifest(cache_dir)
+    rules = rules_fingerprint()
+    if manifest['rules'] != rules:
+        manifest = {'rules': rules, 'files': {}}
+    entries = manifest['files']
+
+    frames = []
+    touched = set()
+    seen = set()
+    obsolete = []
+    for radio in clean_data.RADIOS:
+        for path in clean_data.radio_paths(radio, in_dir):
+            seen.add(path)
+            entry = entries.get(path)
+            if file_unchanged(path, entry):
+                frames.append(pd.read_pickle(entry['file']))
+                continue
+
+            if verbose:
+                print(f' - Cleaning {path}')
+            if entry is not None and os.path.exists(entry['file']):
+                touched.update(pd.read_pickle(entry['file'])['song'])
+                obsolete.append(entry['file'])
+            df = clean_data.normalize(
+                clean_data.parse_file(radio, path), verbose=False)
+            touched.update(df['song'])
+
+            stat = os.stat(path)
+            sha1 = file_sha1(path)
+            entries[path] = {
+                'mtime': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha1': sha1,
+                'file': cache_file(cache_dir, path, sha1),
+            }
+            df.to_pickle(entries[path]['file'])
+            frames.append(df)
+
+    for path in set(entries) - seen:
+        entry = entries.pop(path)
+        if os.path.exists(entry['file']):
+            touched.update(pd.read_pickle(entry['file'])['song'])
+            obsolete.append(entry['file'])
+
+    df = pd.concat(frames, ignore_index=True)
+    return df, touched, manifest, obsolete
+
+
+def incremental_clean(in_dir, cache_dir, verbose=True, mapping_path=None):
+    """Same as parsing all the files and running clean_data.clean,
+    reusing the work of the last run for the files that did not
+    change. With a `mapping_path`, the near-duplicate spellings are
+    merged as in clean_data.py --dedupe
+
+    Returns a tuple (df, touched) where `touched` is the set of songs
+    whose rows may differ from the last run, or None if everything
+    was recomputed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    df, touched, manifest, obsolete = load_normalized(
+        in_dir, cache_dir, verbose)
+    if mapping_path is not None:
+        df, renamed = dedupe.deduplicate(df, mapping_path)
+        # - the renamed songs are not in the cache under their new name
+        touched |= renamed
+
+    artists_path = os.path.join(cache_dir, ARTISTS)
+    unified = None
+    if os.path.exists(artists_path):
+        sel = df['song'].isin(touched)
+        previous = pd.read_pickle(artists_path)
+        unified = df[~sel].merge(
+            previous, on=['song', 'artist'], how='left')['unified']
+        if (unified.isna() & df.loc[~sel, 'artist'].notna().to_numpy()).any():
+            # - the cache does not match the files, start over
+            unified = None
+
+    if unified is None:
+        touched = None
+        df = clean_data.clean_musics_with_multiple_artists(df)
+    else:
+        if verbose:
+            print(f' - normalizing {len(touched)} songs with multiple artists')
+        touched_df = clean_data.clean_musics_with_multiple_artists(
+            df[sel].copy())
+
+        df['artists_list'] = df['artist'].str.split(' & ')
+        df.loc[~sel, 'artist'] = unified.to_numpy()
+        df.loc[sel, 'artist'] = touched_df['artist']
+
+    # - the unified artist of each normalized (song, artist) pair
+    normalized_artist = df['artists_list'].str.join(' & ')
+    artists = pd.DataFrame({
+        'song': df['song'],
+        'artist': normalized_artist,
+        'unified': df['artist'],
+    }).drop_duplicates(['song', 'artist'])
+    artists.to_pickle(artists_path)
+
+    save_manifest(cache_dir, manifest)
+    for path in obsolete:
+        if os.path.exists(path):
+            os.remove(path)
+
+    return df, touched
@@ -0,0 +1,214 @@
+"""Timing and memory of the pipeline stages
+
+The stages are decorated with `stage`. While no run is started, the
+decorated functions only check a module global and call through, so
+the decorators can stay on. After `start()`, each call to a stage
+records its wall time, the rows of the frames in and out, the peak
+RSS of the process at its end and how much the stage raised it, and
+optionally a cProfile of it. `finish()` writes them all as a json run
+report.
+
+The peak RSS of the process is only reset before each stage with
+`reset_peak` (Linux only), to measure the peak of each stage on its
+own: it also resets it for any other code that reads it.
+
+    instrument.start(profile_dir='profiles/')
+    ...
+    instrument.finish('report.json')
+"""
+import cProfile
+import datetime
+import functools
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+_run = None
+
+
+class Run:
+    """Stage records of a run"""
+
+    def __init__(self, profile_dir=None, reset_peak=False):
+        self.started = datetime.datetime.now()
+        self.clock = time.perf_counter()
+        self.profile_dir = profile_dir
+        self.reset_peak = reset_peak
+        self.profiling = False
+        self.depth = 0
+        self.stages = []
+        # - with `reset_peak` the stages reset the peak RSS of the
+        #   process, so the peak of the enclosing stage so far is
+        #   carried over
+        self.carry = 0
+        if profile_dir is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def call(self, name, func, args, kwargs):
+        record = {
+            'stage': name,
+            'depth': self.depth,
+            'rows_in': _rows(args, kwargs),
+        }
+        self.stages.append(record)
+
+        # - cProfile can not nest, inner stages are in the outer profile
+        profiler = None
+        if self.profile_dir is not None and not self.profiling:
+            profiler = cProfile.Profile()
+            self.profiling = True
+
+        baseline = _peak_rss_mb()
+        carry = max(self.carry, baseline)
+        if self.reset_peak:
+            _reset_peak_rss()
+        self.carry = 0
+        self.depth += 1
+        start = time.perf_counter()
+        try:
+            if profiler is None:
+                result = func(*args, **kwargs)
+            else:
+                result = profiler.runcall(func, *args, **kwargs)
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            self.depth -= 1
+            if profiler is not None:
+                self.profiling = False
+                record['profile'] = os.path.join(
+                    self.profile_dir, f'{len(self.stages):03d}_{name}.prof')
+                profiler.dump_stats(record['profile'])
+            record['peak_rss_mb'] = max(self.carry, _peak_rss_mb())
+            record['peak_rss_delta_mb'] = round(
+                max(record['peak_rss_mb'] - baseline, 0), 1)
+            self.carry = max(carry, record['peak_rss_mb'])
+        record['rows_out'] = _rows([result], {})
+        return result
+
+    def report(self):
+        return {
+            'argv': sys.argv,
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self.clock, 6),
+            'peak_rss_mb': max(self.carry, _peak_rss_mb()),
+            'stages': self.stages,
+        }
+
+
+def stage(func=None, *, name=None):
+    """Decorates a pipeline stage, named `name` or after the function"""
+    if func is None:
+        return functools.partial(stage, name=name)
+    name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _run is None:
+            return func(*args, **kwargs)
+        return _run.call(name, func, args, kwargs)
+
+    return wrapper
+
+
+def start(profile_dir=None, reset_peak=False):
+    """Starts recording the stages, profiling each of the outermost
+    ones to `{profile_dir}/{n}_{stage}.prof` if given"""
+    global _run
+    _run = Run(profile_dir, reset_peak)
+    return _run
+
+
+def finish(path=None):
+    """Stops recording and returns the run report, also written as
+    json to `path` if given"""
+    global _run
+    if _run is None:
+        return None
+    report, _run = _run.report(), None
+    if path is not None:
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+def add_arguments(parser):
+    """Adds the --report and --profile options to a script"""
+    parser.add_argument(
+        '--report',
+        type=str,
+        default=None,
+        help='write the time, rows and peak memory of each stage as json')
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default=None,
+        metavar='DIR',
+        help='write a cProfile of each stage to DIR')
+    parser.add_argument(
+        '--reset-peak',
+        action='store_true',
+        help='reset the peak memory of the process before each stage '
+        '(Linux), to report the peak of each stage on its own')
+
+
+def start_from_args(args):
+    if args.report is not None or args.profile is not None:
+        start(args.profile, args.reset_peak)
+
+
+def finish_from_args(args):
+    report = finish(args.report)
+    if report is not None:
+        print_report(report)
+        if args.report is not None:
+            print(f'Run report written to {args.report}')
+
+
+def print_report(report):
+    for record in report['stages']:
+        indent = '  ' * record['depth']
+        rows = record['rows_out']
+        if rows is None:
+            rows = record['rows_in'] if record['rows_in'] is not None else ''
+        print(f"{indent}{record['stage']:<{40 - len(indent)}} "
+              f"{record['seconds']:9.3f}s {rows:>10} rows "
+              f"{record['peak_rss_mb']:8.1f} MB "
+              f"(+{record['peak_rss_delta_mb']:.1f})")
+    print(f"Total: {report['seconds']:.3f}s, "
+          f"peak RSS {report['peak_rss_mb']:.1f} MB")
+
+
+def _rows(args, kwargs):
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return len(value)
+    return None
+
+
+def _reset_peak_rss():
+    """Resets the peak RSS of the process, where Linux allows it
+
+    Elsewhere the peaks are those of the whole process so far.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # - bytes on macOS, kB elsewhere
+    return round(maxrss / (1 << 20 if sys.platform == 'darwin' else 1024), 1)
@@ -0,0 +1,188 @@
+"""Detects overlaps while the plays arrive, see analysis.overlaps
+
+The plays are pushed in time order. A play lasts until the next play
+on the same radio, so the detector only keeps the open play of each
+radio and, for each song on air, its last play and current group of
+overlapping plays. A play joins the group of its song when the last
+play of the song is still on air (or ended at that same minute), which
+is when analysis.overlaps puts them in the same group.
+
+A song is forgotten once its last play ended before the current
+minute, except for the number of groups it had, which numbers its
+next ones as analysis.overlaps does. These counters are a dict of ints
+that grows with the songs ever played, the catalog, and not with the
+plays: a few hundred bytes per song. The overlaps found are kept
+until overlaps(drain=True) hands over the ones that can no longer
+grow.
+"""
+import numpy as np
+import pandas as pd
+
+from radio_repeat.analysis import OVERLAP_COLUMNS
+
+
+class _Play:
+    __slots__ = ['key', 'end']
+
+    def __init__(self, key):
+        self.key = key
+        self.end = None
+
+
+class _Song:
+    __slots__ = ['last', 'group']
+
+    def __init__(self):
+        self.last = None
+        self.group = None
+
+
+class OverlapDetector:
+    """Groups the plays of the same song that overlap, one at a time"""
+
+    def __init__(self):
+        self.now = None
+        self.on_air = {}
+        self.songs = {}
+        # - the number of groups of each song ever played
+        self.groups = {}
+        self.ended = []
+        self.found = []
+
+    def push(self, radio, song, artist, datetime, date, time):
+        """Adds a play, later than or at the same time as the previous
+
+        Returns the overlap the play joins, as a dict with the columns
+        of analysis.overlaps, or None.
+        """
+        if pd.isna(datetime):
+            raise ValueError('The plays need a time')
+        if self.now is not None and datetime < self.now:
+            raise ValueError(
+                f'The plays are not in time order: {datetime} after '
+                f'{self.now}')
+        if self.now is None or datetime > self.now:
+            self._forget_ended()
+        self.now = datetime
+        if pd.isna(song) or pd.isna(artist):
+            return None
+
+        key = (song, artist)
+        if radio in self.on_air:
+            self.on_air[radio].end = datetime
+            self.ended.append(self.on_air[radio])
+        play = self.on_air[radio] = _Play(key)
+
+        state = self.songs.setdefault(key, _Song())
+        last = state.last
+        state.last = play
+        if last is None or (last.end is not None and datetime > last.end):
+            merged = self.groups.get(key, 0)
+            self.groups[key] = merged + 1
+            state.group = {
+                'merged': merged,
+                'date': date,
+                'song': song,
+                'artist': artist,
+                'radios': [radio],
+                'times': [time],
+                'closed': False,
+            }
+            return None
+
+        group = state.group
+        group['radios'].append(radio)
+        group['times'].append(time)
+        if len(group['radios']) == 2:
+            self.found.append(group)
+        return _row(group)
+
+    def _forget_ended(self):
+        """Drops the songs whose last play ended before the current
+        minute: no later play can join their group"""
+        for play in self.ended:
+            state = self.songs.get(play.key)
+            if state is not None and state.last is play:
+                state.group['closed'] = True
+                del self.songs[play.key]
+        self.ended = []
+
+    def push_frame(self, df):
+        """Adds the plays of a load_dataset frame, in time order
+
+        Returns the list of overlaps joined by the plays.
+        """
+        df = df.sort_values('datetime', kind='stable')
+        events = []
+        for play in zip(df['radio'], df['song'], df['artist'],
+                        df['datetime'], df['date'], df['time']):
+            event = self.push(*play)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def overlaps(self, drain=False):
+        """Returns the overlaps found so far, as analysis.overlaps
+
+        With `drain`, only the overlaps that can no longer grow are
+        returned, and they are forgotten: the next calls return the
+        ones found after them.
+        """
+        if drain:
+            groups = [group for group in self.found if group['closed']]
+            self.found = [
+                group for group in self.found if not group['closed']
+            ]
+        else:
+            groups = self.found
+        if not groups:
+            return pd.DataFrame(columns=OVERLAP_COLUMNS)
+
+        df = pd.DataFrame([_row(group) for group in groups],
+                          columns=OVERLAP_COLUMNS)
+        df = df.sort_values(['song', 'artist', 'merged'], ignore_index=True)
+        df['merged'] = df['merged'].astype(np.int64)
+        df['radios_count'] = df['radios_count'].astype(np.int64)
+        return df
+
+
+def _row(group):
+    return {
+        'merged': group['merged'],
+        'date': group['date'],
+        'song': group['song'],
+        'artist': group['artist'],
+        'radios': ' | '.join(group['radios']),
+        'radios_count': len(group['radios']),
+        'times': ' | '.join(group['times']),
+    }
+
+
+def main():
+    import argparse
+
+    from radio_repeat.dataset import load_dataset
+
+    parser = argparse.ArgumentParser(
+        description='Replays the plays in time order, printing the '
+        'overlaps as they happen')
+    parser.add_argument('-i', '--input', type=str, default=None)
+    parser.add_argument('--start', type=str, default=None)
+    parser.add_argument('--end', type=str, default=None)
+    args = parser.parse_args()
+
+    df = load_dataset(args.input, start=args.start, end=args.end)
+    detector = OverlapDetector()
+    found = 0
+    for _, day in df.groupby('date', sort=True):
+        for event in detector.push_frame(day):
+            print(f"{event['date']:%Y-%m-%d} "
+                  f"{event['times'].split(' | ')[-1]} "
+                  f"{event['song']} - {event['artist']}: {event['radios']}")
+        # - the overlaps of the past days are not kept
+        found += len(detector.overlaps(drain=True))
+    print(f'Found: {found + len(detector.overlaps())}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""On-disk cache of the pages fetched by the scrapers
+
+The raw pages are kept as `{cache_dir}/{station}/{date}/{slot}.html`,
+with a `checkpoint.json` per day that records when each slot was
+fetched. A page is final once it was fetched after the end of its
+day; the pages of a day that was still going on are fetched again on
+the next run. The cached pages can be parsed again without the
+network (see scraper.replay).
+"""
+import json
+import os
+from datetime import datetime
+from datetime import timedelta
+
+CHECKPOINT = 'checkpoint.json'
+
+
+def slot_key(slot):
+    """File name of the page of a slot: None, an hour or a tuple"""
+    if slot is None:
+        return 'day'
+    if isinstance(slot, tuple):
+        return '_'.join(f'{part:02d}' for part in slot)
+    return f'{slot:02d}'
+
+
+def day_end(date):
+    return datetime(date.year, date.month, date.day) + timedelta(days=1)
+
+
+class PageCache:
+    """Cached pages and checkpoints of a station"""
+
+    def __init__(self, cache_dir, station_name):
+        self.root = os.path.join(cache_dir, station_name)
+        self.checkpoints = {}
+
+    def day_dir(self, date):
+        return os.path.join(self.root, f'{date:%Y-%m-%d}')
+
+    def page_path(self, date, slot):
+        return os.path.join(self.day_dir(date), slot_key(slot) + '.html')
+
+    def checkpoint(self, date):
+        """Returns the {slot key: fetch time} of the pages of a day"""
+        key = f'{date:%Y-%m-%d}'
+        if key not in self.checkpoints:
+            path = os.path.join(self.day_dir(date), CHECKPOINT)
+            checkpoint = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    checkpoint = json.load(f)
+            self.checkpoints[key] = checkpoint
+        return self.checkpoints[key]
+
+    def fresh(self, date, slot):
+        """Checks if the page of a slot is cached and final"""
+        fetched = self.checkpoint(date).get(slot_key(slot))
+        if fetched is None or not os.path.exists(self.page_path(date, slot)):
+            return False
+        return datetime.fromisoformat(fetched) >= day_end(date)
+
+    def read(self, date, slot):
+        with open(self.page_path(date, slot), encoding='utf-8') as f:
+            return f.read()
+
+    def write(self, date, slot, page, fetched=None):
+        """Saves a page, and then the checkpoint of its day"""
+        os.makedirs(self.day_dir(date), exist_ok=True)
+        _write_atomic(self.page_path(date, slot), page)
+
+        checkpoint = self.checkpoint(date)
+        checkpoint[slot_key(slot)] = (fetched or datetime.now()).isoformat(
+            timespec='seconds')
+        _write_atomic(
+            os.path.join(self.day_dir(date), CHECKPOINT),
+            json.dumps(checkpoint, indent=1, sort_keys=True))
+
+    def dates(self):
+        """Lists the dates with cached pages"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            datetime.strptime(name, '%Y-%m-%d')
+            for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, CHECKPOINT)))
+
+
+def _write_atomic(path, text):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,212 @@
+"""Compact play log, for analyses over years of plays
+
+The plays are kept as integer arrays instead of columns of python
+strings:
+
+- minute: int32, minutes since 1970-01-01 00:00
+- radio, song, artist: int32 ids into the sorted `radios`, `songs`
+  and `artists` dictionaries, -1 when missing
+
+A log is saved as a directory with a .npy file per array and the
+dictionaries in `dictionaries.json`, and is loaded back memory-mapped,
+so only the pages that an analysis touches are read.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from radio_repeat.dataset import minutes_to_time
+
+ARRAYS = ['minute', 'radio', 'song', 'artist']
+DICTIONARIES = 'dictionaries.json'
+MISSING_MINUTE = np.iinfo(np.int32).min
+MINUTES_PER_DAY = 24 * 60
+
+
+class PlayLog:
+    """Plays as int32 arrays of minutes and dictionary ids"""
+
+    def __init__(self, minute, radio, song, artist, radios, songs, artists):
+        self.minute = minute
+        self.radio = radio
+        self.song = song
+        self.artist = artist
+        self.radios = radios
+        self.songs = songs
+        self.artists = artists
+
+    def __len__(self):
+        return len(self.minute)
+
+    def take(self, rows):
+        """Returns a log with the plays selected by `rows`, a mask or
+        an array of indices. The dictionaries are shared."""
+        return PlayLog(self.minute[rows], self.radio[rows], self.song[rows],
+                       self.artist[rows], self.radios, self.songs,
+                       self.artists)
+
+    def radio_mask(self, radio):
+        """Selects the plays of the radio named `radio`"""
+        if radio not in self.radios:
+            return np.zeros(len(self), dtype=bool)
+        return self.radio == self.radios.index(radio)
+
+    def days(self):
+        """Days since 1970-01-01 of each play"""
+        return self.minute // MINUTES_PER_DAY
+
+    def pair_ids(self):
+        """Ids of the (song, artist) pairs, ordered like the strings
+
+        Plays with a missing song or artist get -1.
+        """
+        pairs = self.song.astype(np.int64) * len(self.artists) + self.artist
+        return np.where((self.song >= 0) & (self.artist >= 0), pairs, -1)
+
+    def timestamps(self):
+        """Minutes as int64, with the missing ones first in order"""
+        minutes = self.minute.astype(np.int64)
+        minutes[self.minute == MISSING_MINUTE] = np.iinfo(np.int64).min
+        return minutes
+
+    def to_frame(self):
+        """Materializes the log as a load_dataset-like pd.DataFrame"""
+        missing = self.minute == MISSING_MINUTE
+        datetimes = (np.datetime64(0, 'm') +
+                     self.minute.astype('timedelta64[m]')).astype(
+                         'datetime64[ns]')
+        datetimes[missing] = np.datetime64('NaT')
+        times = minutes_to_time(self.minute % MINUTES_PER_DAY)
+        times[missing] = np.nan
+
+        return pd.DataFrame({
+            'time': times,
+            'song': _decode(self.song, self.songs),
+            'artist': _decode(self.artist, self.artists),
+            'date': datetimes.astype('datetime64[D]').astype('datetime64[ns]'),
+            'radio': _decode(self.radio, self.radios),
+            'datetime': datetimes,
+        })
+
+    def iter_frames(self, chunksize=1 << 18, start=None, end=None):
+        """Yields the plays as to_frame frames of up to `chunksize`
+        plays, in the order of the log, only keeping the (inclusive)
+        date range `start`-`end`"""
+        for first in range(0, len(self), chunksize):
+            chunk = self.take(slice(first, first + chunksize))
+            selected = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                selected &= chunk.minute >= _day_minutes(start)
+            if end is not None:
+                selected &= chunk.minute < _day_minutes(end) + MINUTES_PER_DAY
+            if selected.any():
+                yield chunk.take(selected).to_frame()
+
+    @classmethod
+    def from_frame(cls, df):
+        """Encodes a load_dataset pd.DataFrame"""
+        datetimes = df['datetime'].to_numpy().astype('datetime64[m]')
+        minute = datetimes.astype(np.int64)
+        minute[np.isnat(datetimes)] = MISSING_MINUTE
+
+        radio, radios = _encode(df['radio'])
+        song, songs = _encode(df['song'])
+        artist, artists = _encode(df['artist'])
+        return cls(minute.astype(np.int32), radio, song, artist, radios,
+                   songs, artists)
+
+    @classmethod
+    def from_store(cls, root, start=None, end=None, radios=None):
+        """Reads a log from the columnar store, see store.read_store
+
+        The dictionary encoded columns of the store are used as they
+        are, without converting them to python strings.
+        """
+        from radio_repeat.store import read_table
+
+        table = read_table(root, ARRAYS, start, end, radios)
+        table = table.set_column(
+            table.schema.get_field_index('radio'), 'radio',
+            table.column('radio').dictionary_encode())
+        table = table.unify_dictionaries()
+
+        minute = table.column('minute').to_numpy().astype(np.int32)
+        columns = [
+            _sorted_ids(table.column(column).combine_chunks())
+            for column in ['radio', 'song', 'artist']
+        ]
+        (radio, radios), (song, songs), (artist, artists) = columns
+        return cls(minute, radio, song, artist, radios, songs, artists)
+
+    def save(self, path):
+        """Writes the log to the directory `path`"""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, DICTIONARIES), 'w') as f:
+            json.dump(
+                {
+                    'radios': self.radios,
+                    'songs': self.songs,
+                    'artists': self.artists
+                }, f)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Reads a log written by `save`, memory-mapping the arrays"""
+        arrays = [
+            np.load(os.path.join(path, f'{name}.npy'),
+                    mmap_mode='r' if mmap else None) for name in ARRAYS
+        ]
+        with open(os.path.join(path, DICTIONARIES)) as f:
+            dictionaries = json.load(f)
+        return cls(*arrays, dictionaries['radios'], dictionaries['songs'],
+                   dictionaries['artists'])
+
+
+def _day_minutes(date):
+    day = pd.Timestamp(date).normalize()
+    return (day - pd.Timestamp(0)) // pd.Timedelta(minutes=1)
+
+
+def _encode(values):
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), list(uniques)
+
+
+def _decode(codes, dictionary):
+    strings = np.array(list(dictionary) + [np.nan], dtype=object)
+    return strings[codes]
+
+
+def _sorted_ids(array):
+    """Converts a pyarrow DictionaryArray to ids into its sorted
+    dictionary"""
+    dictionary = np.array(array.dictionary.to_pylist(), dtype=object)
+    order = np.argsort(dictionary, kind='stable')
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+
+    indices = array.indices.fill_null(-1).to_numpy()
+    ids = np.where(indices >= 0, rank[np.maximum(indices, 0)], -1)
+    return ids.astype(np.int32), list(dictionary[order])
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Builds a play log from the columnar store')
+    parser.add_argument('-i', '--input', type=str, default='./data/all_data/')
+    parser.add_argument('-o', '--output', type=str, default='./data/playlog/')
+    args = parser.parse_args()
+
+    log = PlayLog.from_store(args.input)
+    log.save(args.output)
+    print(f'Wrote {len(log)} plays to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
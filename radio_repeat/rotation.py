@@ -0,0 +1,192 @@
+"""Gaps between the plays of a song on a radio, and rotation cycles
+
+The plays are sorted once by (radio, song and artist, time), so the
+gaps between consecutive plays of each song on each radio are a
+single np.diff. Their percentiles are read from a second sort of the
+gaps by (group, gap), at the offsets of each group, with the same
+linear interpolation as np.percentile.
+
+A song is on a regular rotation when it has at least MIN_GAPS gaps
+and their interquartile range is within MAX_SPREAD of the median gap,
+its cycle.
+"""
+import numpy as np
+import pandas as pd
+
+from radio_repeat import instrument
+from radio_repeat.dataset import TEXT_COLUMNS, load_dataset
+from radio_repeat.playlog import PlayLog
+
+PERCENTILES = [10, 25, 50, 75, 90]
+MIN_GAPS = 3
+MAX_SPREAD = 0.25
+NAT = np.iinfo(np.int64).min
+
+
+def play_groups(radio_ids, key_ids, minutes):
+    """Sorts the plays by (radio, key, minute)
+
+    Returns a tuple (order, group, gaps) where `order` sorts the
+    plays, `group` holds the (radio, key) group id of each sorted play
+    and `gaps` the minutes since the previous play of its group, or -1
+    for the first play of a group.
+    """
+    order = np.lexsort((minutes, key_ids, radio_ids))
+    radio_ids, key_ids, minutes = (radio_ids[order], key_ids[order],
+                                   minutes[order])
+
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = ((radio_ids[1:] != radio_ids[:-1]) |
+                     (key_ids[1:] != key_ids[:-1]))
+    group = np.cumsum(new_group) - 1
+
+    gaps = np.full(len(order), -1, dtype=np.int64)
+    gaps[1:] = np.diff(minutes)
+    gaps[new_group] = -1
+    return order, group, gaps
+
+
+def group_percentiles(group, values, n_groups, percentiles):
+    """Percentiles of `values` within each group
+
+    Returns a float array of shape (n_groups, len(percentiles)), NaN
+    for the groups without values.
+    """
+    order = np.lexsort((values, group))
+    values = values[order].astype(np.float64)
+    counts = np.bincount(group, minlength=n_groups)
+    offsets = np.cumsum(counts) - counts
+
+    result = np.full((n_groups, len(percentiles)), np.nan)
+    has = counts > 0
+    for i, q in enumerate(percentiles):
+        position = offsets[has] + q / 100 * (counts[has] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[has, i] = values[low] + (values[high] - values[low]) * (
+            position - low)
+    return result
+
+
+@instrument.stage
+def rotation(plays, percentiles=PERCENTILES, min_gaps=MIN_GAPS,
+             max_spread=MAX_SPREAD):
+    """Computes the gaps between consecutive plays of each song on
+    each radio
+
+    `plays` is either a load_dataset pd.DataFrame or a PlayLog.
+    Returns a pd.DataFrame with a row per (radio, song, artist): the
+    number of `plays`, the `mean_gap` and the `p{q}` percentiles of
+    the gaps, in minutes, their `spread` (interquartile range over
+    median), and `rotation`, True for the songs on a regular cycle of
+    `p50` minutes.
+    """
+    radio_ids, key_ids, minutes, names = _encode(plays)
+    order, group, gaps = play_groups(radio_ids, key_ids, minutes)
+    n_groups = group[-1] + 1 if len(group) else 0
+
+    first = np.flatnonzero(gaps == -1)
+    has_gap = gaps >= 0
+    n_gaps = np.bincount(group[has_gap], minlength=n_groups)
+    total = np.bincount(group[has_gap], weights=gaps[has_gap],
+                        minlength=n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_gap = total / n_gaps
+
+    quantiles = sorted(set(percentiles) | {25, 50, 75})
+    values = group_percentiles(group[has_gap], gaps[has_gap], n_groups,
+                               quantiles)
+    p25, p50, p75 = (values[:, quantiles.index(q)] for q in [25, 50, 75])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        spread = (p75 - p25) / p50
+
+    radio, song, artist = names(radio_ids[order][first],
+                                key_ids[order][first])
+    df = pd.DataFrame({
+        'radio': radio,
+        'song': song,
+        'artist': artist,
+        'plays': n_gaps + 1,
+        'mean_gap': mean_gap,
+    })
+    for q in percentiles:
+        df[f'p{q}'] = values[:, quantiles.index(q)]
+    df['spread'] = spread
+    df['rotation'] = (n_gaps >= min_gaps) & (spread <= max_spread)
+    return df
+
+
+def _encode(plays):
+    """Integer radio, (song, artist) and minute arrays of the plays
+    with all of them, and a function that decodes the names of
+    (radio, key) ids"""
+    if isinstance(plays, PlayLog):
+        radio_ids = plays.radio.astype(np.int64)
+        key_ids = plays.pair_ids()
+        minutes = plays.timestamps()
+        radios = np.array(plays.radios, dtype=object)
+        songs = np.array(plays.songs, dtype=object)
+        artists = np.array(plays.artists, dtype=object)
+        n_artists = len(plays.artists)
+    else:
+        radio_ids, radios = pd.factorize(plays['radio'])
+        song_ids, songs = pd.factorize(plays['song'])
+        artist_ids, artists = pd.factorize(plays['artist'])
+        n_artists = len(artists)
+        key_ids = np.where((song_ids >= 0) & (artist_ids >= 0),
+                           song_ids.astype(np.int64) * n_artists + artist_ids,
+                           -1)
+        minutes = plays['datetime'].to_numpy().astype(
+            'datetime64[m]').view(np.int64)
+        radios, songs, artists = (np.asarray(values, dtype=object)
+                                  for values in [radios, songs, artists])
+
+    known = (radio_ids >= 0) & (key_ids >= 0) & (minutes != NAT)
+
+    def names(radio_ids, key_ids):
+        return (radios[radio_ids], songs[key_ids // n_artists],
+                artists[key_ids % n_artists])
+
+    return radio_ids[known], key_ids[known], minutes[known], names
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Gaps between the plays of each song, and the songs '
+        'on a regular rotation')
+    parser.add_argument('-i', '--input', type=str, default=None)
+    parser.add_argument('--start', type=str, default=None)
+    parser.add_argument('--end', type=str, default=None)
+    parser.add_argument('--radios', nargs='+', default=None)
+    parser.add_argument('--min-gaps', type=int, default=MIN_GAPS)
+    parser.add_argument(
+        '--max-spread',
+        type=float,
+        default=MAX_SPREAD,
+        help='largest interquartile range of the gaps, over their median')
+    parser.add_argument(
+        '--all', action='store_true', help='show every song, not only the '
+        'ones on a regular rotation')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrument.start_from_args(args)
+    df = load_dataset(args.input, args.start, args.end, args.radios,
+                      columns=TEXT_COLUMNS)
+    gaps = rotation(df, min_gaps=args.min_gaps, max_spread=args.max_spread)
+    if not args.all:
+        gaps = gaps[gaps['rotation']]
+
+    pd.set_option('display.max_rows', 500)
+    pd.set_option('display.width', 200)
+    for radio, radio_gaps in gaps.groupby('radio'):
+        print(f'\n{radio}: {len(radio_gaps)} songs\n')
+        print(radio_gaps.drop(columns=['radio', 'rotation']).sort_values(
+            'plays', ascending=False).round(1).to_string(index=False))
+    instrument.finish_from_args(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""Keeps the day files of the four stations up to date
+
+A long running loop polls each station at its own interval. A poll
+only requests the pages that can hold plays newer than the last play
+stored in each day file, up to the current time, and adds the new
+plays to the day files, in time order. The stored plays are the only
+state: a day whose file is missing or stops early (the scheduler was
+down, a poll failed) is simply fetched from where it stops on the
+next poll, for as long as the website still offers that day.
+
+With a page cache (see pagecache.py), the pages fetched after the end
+of their day are final and are not requested again.
+"""
+import bisect
+import glob
+import os
+import time
+from datetime import datetime
+from datetime import timedelta
+
+from radio_repeat import scraper
+from radio_repeat.fetch import iter_fetch
+from radio_repeat.pagecache import PageCache
+from radio_repeat.scrape_cidadefm import CidadeFM
+from radio_repeat.scrape_comercial import Comercial
+from radio_repeat.scrape_megafm import MegaFM
+from radio_repeat.scrape_rfm import RFM
+
+STATIONS = [RFM, MegaFM, CidadeFM, Comercial]
+
+# seconds between the polls of each station
+INTERVALS = {
+    'rfm': 30 * 60,
+    'megafm': 30 * 60,
+    'cidadefm': 30 * 60,
+    # - a single page per day, with all its plays
+    'comercial': 60 * 60,
+}
+
+
+def minutes(time):
+    """Minutes of the day of a 'HH:MM' play time"""
+    hour, minute = time.split(':')[:2]
+    return int(hour) * 60 + int(minute)
+
+
+def stored_plays(station, out_dir, date):
+    path = scraper.output_path(out_dir, station, date)
+    if not os.path.exists(path):
+        return []
+    return scraper.read_rows(path)
+
+
+def last_stored_date(station, out_dir):
+    """Returns the date of the newest day file of a station, or None"""
+    dates = []
+    for path in glob.glob(os.path.join(out_dir, f'{station.name}_*.csv')):
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            dates.append(datetime.strptime(name[len(station.name) + 1:],
+                                           '%d_%m_%Y'))
+        except ValueError:
+            continue
+    return max(dates, default=None)
+
+
+def poll_plan(station, out_dir, now, cache=None):
+    """Lists the (day_key, date, slot) pages that can hold plays
+    that are not stored
+
+    For each day offered by the website, these are the slots that
+    already started and that either end after its last stored play,
+    or have no stored play at all: a hole left by a failed or empty
+    page. The pages that are final in `cache` are left out, so a slot
+    that is really empty is only requested until its day is over.
+    """
+    now_minutes = now.hour * 60 + now.minute
+    plan = []
+    for day_key, date in station.days(now):
+        played = sorted(
+            minutes(row[0]) for row in stored_plays(station, out_dir, date))
+        last = played[-1] if played else -1
+        for slot in station.slots:
+            start, end = station.slot_range(slot)
+            if end <= last and _any_between(played, start, end):
+                continue
+            if date.date() == now.date() and start > now_minutes:
+                continue
+            if cache is not None and cache.fresh(date, slot):
+                continue
+            plan.append((day_key, date, slot))
+    return plan
+
+
+def _any_between(values, start, end):
+    """Checks if the sorted `values` have one in [start, end)"""
+    i = bisect.bisect_left(values, start)
+    return i < len(values) and values[i] < end
+
+
+def poll(station, out_dir, now=None, workers=4, interval=1.0, retries=2,
+         cache_dir=None):
+    """Fetches the new plays of a station and appends them to its day
+    files. Returns the number of new plays"""
+    now = now or datetime.now()
+    cache = None if cache_dir is None else PageCache(cache_dir, station.name)
+
+    offered = min(date for _, date in station.days(now)).date()
+    last_date = last_stored_date(station, out_dir)
+    if last_date is not None and last_date.date() < offered - timedelta(1):
+        print(f' - {station.name}: the plays after {last_date:%Y-%m-%d} '
+              f'and before {offered:%Y-%m-%d} are no longer offered')
+
+    plan = poll_plan(station, out_dir, now, cache)
+    pages = iter_fetch([station.request(day_key, slot)
+                        for day_key, _, slot in plan],
+                       workers=workers,
+                       interval=interval,
+                       retries=retries)
+
+    added = 0
+    day_rows, current = [], None
+    for (_, date, slot), page in zip(plan, pages):
+        if current is not None and date != current:
+            added += append_plays(station, out_dir, current, day_rows)
+            day_rows = []
+        current = date
+
+        if cache is not None:
+            cache.write(date, slot, page, fetched=now)
+        day_rows.extend(station.extract(page, slot))
+
+    if current is not None:
+        added += append_plays(station, out_dir, current, day_rows)
+    print(f' - {station.name}: {len(plan)} pages, {added} new plays')
+    return added
+
+
+def append_plays(station, out_dir, date, rows):
+    """Adds the plays of `rows` that are not stored yet to the file of
+    their day. Returns the number of new plays
+
+    The new plays are appended when they are not older than the last
+    stored one. Otherwise they fill a hole, and the file is written
+    again in time order.
+    """
+    path = scraper.output_path(out_dir, station, date)
+    stored = stored_plays(station, out_dir, date)
+    known = set(stored)
+    new = [row for row in dict.fromkeys(station.finalize(rows))
+           if row not in known]
+    if not new:
+        return 0
+
+    last = max((minutes(row[0]) for row in stored), default=-1)
+    if min(minutes(row[0]) for row in new) >= last:
+        scraper.write_rows(path, new, 'a')
+    else:
+        plays = sorted(stored + new, key=lambda row: minutes(row[0]))
+        scraper.write_rows(path + '.tmp', plays)
+        os.replace(path + '.tmp', path)
+    return len(new)
+
+
+def run(stations, out_dir, intervals=INTERVALS, once=False, cache_dir=None,
+        workers=4, interval=1.0, retries=2, sleep=time.sleep):
+    """Polls each station whenever its interval is over. With `once`,
+    polls every station a single time"""
+    due = {station.name: time.monotonic() for station in stations}
+    while True:
+        for station in stations:
+            if due[station.name] > time.monotonic():
+                continue
+            due[station.name] = time.monotonic() + intervals[station.name]
+            try:
+                poll(station, out_dir, workers=workers, interval=interval,
+                     retries=retries, cache_dir=cache_dir)
+            except Exception as e:
+                # - network, parsing or disk errors: the missed plays
+                #   are fetched on the next poll
+                print(f' - {station.name}: poll failed, '
+                      f'{type(e).__name__}: {e}')
+
+        if once:
+            return
+        sleep(max(min(due.values()) - time.monotonic(), 0))
+
+
+def main():
+    import argparse
+
+    names = [station.name for station in STATIONS]
+    parser = argparse.ArgumentParser(
+        description='Polls the stations and appends the new plays to the '
+        'day files')
+    parser.add_argument('-o', '--out', type=str, default='./data/')
+    parser.add_argument(
+        '--stations', nargs='+', choices=names, default=names)
+    parser.add_argument(
+        '--every',
+        type=float,
+        default=None,
+        help='minutes between the polls of every station '
+        '(default: per station, see INTERVALS)')
+    parser.add_argument(
+        '--once', action='store_true', help='poll each station once and exit')
+    parser.add_argument('-w', '--workers', type=int, default=4)
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=1.0,
+        help='minimum seconds between requests to the station')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument(
+        '--cache',
+        type=str,
+        default=None,
+        help='cache of the fetched pages (default: {out}/.pages/)')
+    parser.add_argument(
+        '--no-cache', action='store_true', help='do not cache the pages')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache or os.path.join(args.out, '.pages')
+
+    intervals = dict(INTERVALS)
+    if args.every is not None:
+        intervals = {name: args.every * 60 for name in names}
+
+    stations = [station() for station in STATIONS
+                if station.name in args.stations]
+    run(stations, args.out, intervals, args.once, cache_dir, args.workers,
+        args.interval, args.retries)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,70 +1,45 @@
-import os
-import requests
-import time
-import bs4
-import csv
-from datetime import datetime
-from datetime import timedelta
+from radio_repeat import extractors
+from radio_repeat import scraper
 
 
 ENDPOINT = 'https://cidade.iol.pt/passou'
 
 
-def day_to_nums(day):
-    if day == 'hoje':
-        today = datetime.today()
-        return today.day, today.month, today.year
-    elif day == 'ontem':
-        yesterday = datetime.today() - timedelta(days=1)
-        return yesterday.day, yesterday.month, yesterday.year
+class CidadeFM(scraper.Station):
+    name = 'cidadefm'
+    endpoint = ENDPOINT
+    slots = range(0, 24)
+    spec = extractors.make_spec(('li', 'gereral-item'), [
+        ('div', 'passou-musica-hora'),
+        ('span', ['top8songname', 'passou-musica-title']),
+        ('span', ['top8artistname', 'passou-musica-artista']),
+    ],
+                                container=('ul', 'passou-list'))
 
+    def days(self, today):
+        return list(zip(['hoje', 'ontem'],
+                        scraper.relative_days(today, [0, 1])))
 
-def scrape(out_dir):
-    AVAILABLE_DAYS = ['hoje', 'ontem']
-    HOURS = range(0, 24)
+    def request(self, day_key, hour):
+        return {
+            'method': 'GET',
+            'url': self.endpoint,
+            'params': {'d': day_key, 'h': hour}
+        }
 
-    all_songs = []
-    dates = []
-    for day_str in AVAILABLE_DAYS:
-        print(f'Scraping: day {day_str}')
-        day, month, year = day_to_nums(day_str)
-        dates.append(f'{day:02d}_{month:02d}_{year:02d}')
+    def slot_range(self, hour):
+        return hour * 60, (hour + 1) * 60
 
-        day_songs = []
-        for hour in HOURS:
-            print(f'- Hour: {hour}')
-            response = requests.get(url=ENDPOINT, params={'d': day_str, 'h': hour})
-            html = bs4.BeautifulSoup(response.text, 'html.parser')
-            music_info_lis = html.findAll('li', {'class': 'gereral-item'})
+    def finalize(self, rows):
+        return sorted(rows, key=lambda x: x[0])
 
-            for mi_li in music_info_lis:
-                time = mi_li.find('div', {'class': 'passou-musica-hora'}).text
-                artist = mi_li.find('span', {'class': ['top8artistname', 'passou-musica-artista']}).text
-                song = mi_li.find('span', {'class': ['top8songname', 'passou-musica-title']}).text
 
-                day_songs.append((time, song, artist))
-                print((time, song, artist))
-
-        all_songs.append(sorted(day_songs, key=lambda x: x[0]))
-
-    print('Writing to csv files')
-    for date_idx, date in enumerate(dates):
-        filename = os.path.join(out_dir, f'cidadefm_{date}.csv')
-        with open(filename, 'w') as csvfile:
-            writer = csv.writer(csvfile, delimiter='|', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerows(all_songs[date_idx])
+def scrape(out_dir, endpoint=ENDPOINT, workers=8, interval=0.1):
+    return scraper.scrape(CidadeFM(endpoint), out_dir, workers, interval)
 
 
 def main():
-    import argparse
-
-    parser = argparse.ArgumentParser(description='')
-    parser.add_argument('-o', '--out', type=str, default='./data/')
-    args = parser.parse_args()
-
-    os.makedirs(args.out, exist_ok=True)
-
-    scraper = scrape(args.out)
+    scraper.main(CidadeFM())
 
 
 if __name__ == '__main__':
@@ -1,37 +1,36 @@
-import os
-import requests
-import time
-import bs4
-import csv
-from datetime import datetime
-from datetime import timedelta
 import re
 
+from radio_repeat import extractors
+from radio_repeat import scraper
 
-ENDPOINT = 'https://radiocomercial.iol.pt/passou'
-
-
-def scrape(out_dir):
-    AVAILABLE_DAYS = [datetime.today() - timedelta(days=d) for d in range(7) ]
-
-    all_songs = []
-    dates = []
-    for date in AVAILABLE_DAYS:
-        print(f'Scraping: day {date}')
-        day, month, year = date.day, date.month, date.year
-        dates.append(f'{day:02d}_{month:02d}_{year:02d}')
-
-        day_songs = []
 
-        response = requests.post(url=ENDPOINT, data={'radio': 'comercial', 'day': f'{year:02d}-{month:02d}-{day:02d}', 'when': ''})
-        html = bs4.BeautifulSoup(response.text, 'html.parser')
-        music_info_divs = html.findAll('div', {'class': 'song'})
+ENDPOINT = 'https://radiocomercial.iol.pt/passou'
 
-        for mi_div in music_info_divs:
-            time = mi_div.find('div', {'class': 'timePlayed'}).text
-            artist = mi_div.find('div', {'class': 'songArtist'}).text
-            song = mi_div.find('div', {'class': 'songTitle'}).text
 
+class Comercial(scraper.Station):
+    name = 'comercial'
+    endpoint = ENDPOINT
+    spec = extractors.make_spec(('div', 'song'), [
+        ('div', 'timePlayed'),
+        ('div', 'songTitle'),
+        ('div', 'songArtist'),
+    ],
+                                container=('div', 'songs'))
+
+    def days(self, today):
+        dates = scraper.relative_days(today, range(7))
+        return [(f'{d.year:02d}-{d.month:02d}-{d.day:02d}', d) for d in dates]
+
+    def request(self, day_key, slot):
+        return {
+            'method': 'POST',
+            'url': self.endpoint,
+            'data': {'radio': 'comercial', 'day': day_key, 'when': ''}
+        }
+
+    def extract(self, html, slot):
+        rows = []
+        for time, song, artist in super().extract(html, slot):
             song = re.sub(r'\s+', ' ', song)
             artist = re.sub(r'\s+', ' ', artist)
             time = re.sub(r'\s+', ' ', time)
@@ -44,28 +43,16 @@ def scrape(out_dir):
             if 'liner daytime' in artist.lower():
                 continue
 
-            day_songs.append((time, song, artist))
+            rows.append((time, song, artist))
+        return rows
 
-        all_songs.append(day_songs)
 
-    print('Writing to csv files')
-    for date_idx, date in enumerate(dates):
-        filename = os.path.join(out_dir, f'comercial_{date}.csv')
-        with open(filename, 'w') as csvfile:
-            writer = csv.writer(csvfile, delimiter='|', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            writer.writerows(all_songs[date_idx])
+def scrape(out_dir, endpoint=ENDPOINT, workers=8, interval=0.1):
+    return scraper.scrape(Comercial(endpoint), out_dir, workers, interval)
 
 
 def main():
-    import argparse
-
-    parser = argparse.ArgumentParser(description='')
-    parser.add_argument('-o', '--out', type=str, default='./data/')
-    args = parser.parse_args()
-
-    os.makedirs(args.out, exist_ok=True)
-
-    scraper = scrape(args.out)
+    scraper.main(Comercial())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,227 @@
+import os
+import csv
+from datetime import datetime
+from datetime import timedelta
+
+from radio_repeat import extractors
+from radio_repeat.fetch import iter_fetch
+from radio_repeat.pagecache import PageCache, slot_key
+
+
+class Station:
+    """Adapter for the website of a radio station
+
+    Defines which pages to request (a request plan of days and slots)
+    and how to extract the plays from each page. The scraping itself
+    (concurrency, retries, output) is done by `scrape`.
+    """
+    name = None
+    endpoint = None
+    # slots requested for each day, e.g. the hours of the day
+    slots = [None]
+    # extractors spec of the plays in a page, see extractors.make_spec
+    spec = None
+    backend = extractors.DEFAULT_BACKEND
+
+    def __init__(self, endpoint=None, backend=None):
+        if endpoint is not None:
+            self.endpoint = endpoint
+        if backend is not None:
+            self.backend = backend
+
+    def days(self, today):
+        """Returns the list of (day_key, date) offered by the website"""
+        raise NotImplementedError
+
+    def request(self, day_key, slot):
+        """Returns the keyword arguments for requests.Session.request"""
+        raise NotImplementedError
+
+    def slot_range(self, slot):
+        """Returns the (start, end) minutes of the day whose plays are
+        in the page of a slot"""
+        return 0, 24 * 60
+
+    def extract(self, html, slot):
+        """Returns the list of (time, song, artist) plays in a page"""
+        return extractors.extract_rows(html, self.spec, self.backend)
+
+    def finalize(self, rows):
+        """Post-processes the plays of a day before they are written"""
+        return rows
+
+
+def relative_days(today, days_ago):
+    """Returns the dates `days_ago` days before `today`"""
+    return [today - timedelta(days=d) for d in days_ago]
+
+
+def date_str(date):
+    return f'{date.day:02d}_{date.month:02d}_{date.year:02d}'
+
+
+def output_path(out_dir, station, date):
+    return os.path.join(out_dir, f'{station.name}_{date_str(date)}.csv')
+
+
+def write_rows(filename, rows, mode='w'):
+    with open(filename, mode) as csvfile:
+        writer = csv.writer(
+            csvfile, delimiter='|', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerows(rows)
+
+
+def read_rows(filename):
+    with open(filename) as csvfile:
+        return [tuple(row) for row in csv.reader(csvfile, delimiter='|')]
+
+
+def make_plan(station, today):
+    """Lists the (day_key, date, slot) pages to request"""
+    return [(day_key, date, slot) for day_key, date in station.days(today)
+            for slot in station.slots]
+
+
+def scrape_plan(station, plan, out_dir, workers=8, interval=0.1, retries=2,
+                cache_dir=None):
+    """Fetches the pages of `plan` and writes a csv file per day
+
+    The plays of each page are appended to `{file}.partial` as soon as
+    the page (and the ones before it) arrive, so a failure only loses
+    the pages still in flight. Once all the pages of a day are in, its
+    rows are finalized and the day file replaces the partial one.
+
+    With a `cache_dir`, the pages are also saved there as they arrive
+    (see pagecache.py), and only the pages that are not cached or not
+    final yet are fetched.
+    """
+    cache = None if cache_dir is None else PageCache(cache_dir, station.name)
+    missing = [
+        i for i, (_, date, slot) in enumerate(plan)
+        if cache is None or not cache.fresh(date, slot)
+    ]
+    if cache is not None:
+        print(f' - {len(plan) - len(missing)} pages from the cache')
+    fetched = iter_fetch(
+        [station.request(plan[i][0], plan[i][2]) for i in missing],
+        workers=workers,
+        interval=interval,
+        retries=retries)
+
+    def pages():
+        missing_set = set(missing)
+        for i, (_, date, slot) in enumerate(plan):
+            if i not in missing_set:
+                yield cache.read(date, slot)
+                continue
+            page = next(fetched)
+            if cache is not None:
+                cache.write(date, slot, page)
+            yield page
+
+    return write_days(station, plan, pages(), out_dir)
+
+
+def replay(station, out_dir, cache_dir, dates=None):
+    """Extracts the plays of the cached pages again, without fetching
+    anything, and writes a csv file per day
+
+    By default, all the cached days are replayed.
+    """
+    cache = PageCache(cache_dir, station.name)
+    plan = []
+    for date in cache.dates() if dates is None else dates:
+        cached = cache.checkpoint(date)
+        slots = [slot for slot in station.slots if slot_key(slot) in cached]
+        if len(slots) < len(station.slots):
+            print(f' - {len(station.slots) - len(slots)} pages of '
+                  f'{date:%Y-%m-%d} are not in the cache')
+        plan += [(None, date, slot) for slot in slots]
+
+    pages = (cache.read(date, slot) for _, date, slot in plan)
+    return write_days(station, plan, pages, out_dir)
+
+
+def write_days(station, plan, pages, out_dir):
+    """Extracts the plays of the `pages` of `plan`, and writes them
+    to a csv file per day"""
+    written = []
+    day_rows, current = [], None
+    for (_, date, slot), page in zip(plan, pages):
+        if current is not None and date != current:
+            written.append(_finish_day(station, out_dir, current, day_rows))
+            day_rows = []
+        current = date
+
+        rows = station.extract(page, slot)
+        write_rows(output_path(out_dir, station, date) + '.partial', rows,
+                   'w' if not day_rows else 'a')
+        day_rows.extend(rows)
+
+    if current is not None:
+        written.append(_finish_day(station, out_dir, current, day_rows))
+    return written
+
+
+def _finish_day(station, out_dir, date, rows):
+    filename = output_path(out_dir, station, date)
+    print(f'Writing {filename}')
+    write_rows(filename + '.tmp', station.finalize(rows))
+    os.replace(filename + '.tmp', filename)
+    if os.path.exists(filename + '.partial'):
+        os.remove(filename + '.partial')
+    return filename
+
+
+def scrape(station, out_dir, workers=8, interval=0.1, retries=2,
+           cache_dir=None):
+    """Scrapes all the days offered by the website of `station`"""
+    plan = make_plan(station, datetime.today())
+    print(f'Scraping {station.name}: {len(plan)} pages with {workers} workers')
+    return scrape_plan(station, plan, out_dir, workers, interval, retries,
+                       cache_dir)
+
+
+def main(station):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f'Scrapes {station.name}')
+    parser.add_argument('-o', '--out', type=str, default='./data/')
+    parser.add_argument('-w', '--workers', type=int, default=8)
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.1,
+        help='minimum seconds between requests to the station')
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument(
+        '--backend',
+        choices=sorted(extractors.BACKENDS),
+        default=station.backend,
+        help='html extraction backend')
+    parser.add_argument(
+        '--cache',
+        type=str,
+        default=None,
+        help='cache of the fetched pages (default: {out}/.pages/)')
+    parser.add_argument(
+        '--no-cache', action='store_true', help='do not cache the pages')
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='extract the plays of the cached pages again, offline')
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = args.cache or os.path.join(args.out, '.pages')
+
+    station.backend = args.backend
+    if args.replay:
+        if cache_dir is None:
+            parser.error('--replay needs the cache')
+        replay(station, args.out, cache_dir)
+    else:
+        scrape(station, args.out, args.workers, args.interval, args.retries,
+               cache_dir)
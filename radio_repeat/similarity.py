@@ -0,0 +1,194 @@
+"""How similar the playlists of the radios are
+
+The plays are counted into a sparse matrix with a row per radio (or
+per radio and day) and a column per (song, artist), kept as
+coordinate arrays of the non-zero counts. The similarity of two rows
+only needs the columns they share, so the rows are compared by
+joining the entries of each column with each other, within each day
+for the daily rows: the work grows with the plays and the radios
+that share a song, not with the size of the dense matrix.
+
+Two similarities are computed for each pair of rows a, b of counts:
+
+- jaccard: the weighted Jaccard index, sum(min(a, b)) / sum(max(a, b))
+- cosine: a.b / (|a| |b|)
+"""
+import numpy as np
+import pandas as pd
+
+from radio_repeat import instrument
+from radio_repeat.dataset import TEXT_COLUMNS, load_dataset
+from radio_repeat.playlog import PlayLog
+
+
+def count_matrix(rows, cols):
+    """Counts the (row, col) pairs of int arrays
+
+    Returns the coordinates and values of the non-zero counts, a tuple
+    (rows, cols, counts) sorted by column and then row.
+    """
+    n_rows = rows.max() + 1 if len(rows) else 0
+    keys, counts = np.unique(cols.astype(np.int64) * n_rows + rows,
+                             return_counts=True)
+    return keys % n_rows, keys // n_rows, counts
+
+
+def row_products(rows, cols, counts, blocks=None):
+    """Compares the rows of a sparse count matrix that share columns
+
+    `rows`, `cols` and `counts` are sorted by column and then row, as
+    returned by count_matrix. With `blocks`, an array that maps each
+    row to a block (e.g. a day), only the rows of the same block are
+    compared.
+
+    Returns a tuple (a, b, dot, minimum, shared) with a row per pair of
+    rows a < b that share a column: the sum of the products and of the
+    minimums of their counts, and the number of shared columns.
+    """
+    if blocks is not None:
+        order = np.lexsort((rows, cols, blocks[rows]))
+        rows, cols, counts = rows[order], cols[order], counts[order]
+        block = blocks[rows]
+        new = np.ones(len(cols), dtype=bool)
+        new[1:] = (cols[1:] != cols[:-1]) | (block[1:] != block[:-1])
+    else:
+        new = np.ones(len(cols), dtype=bool)
+        new[1:] = cols[1:] != cols[:-1]
+    starts = np.flatnonzero(new)
+    sizes = np.diff(np.append(starts, len(cols)))
+
+    # - the pairs of entries of each column, one group size at a time
+    left, right = [], []
+    for size in np.unique(sizes[sizes > 1]):
+        first = starts[sizes == size]
+        i, j = np.triu_indices(size, k=1)
+        left.append((first[:, None] + i).ravel())
+        right.append((first[:, None] + j).ravel())
+    if not left:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty, empty
+    left, right = np.concatenate(left), np.concatenate(right)
+
+    n_rows = rows.max() + 1
+    pairs, inverse = np.unique(rows[left] * n_rows + rows[right],
+                               return_inverse=True)
+    dot = np.bincount(inverse, weights=counts[left] * counts[right])
+    minimum = np.bincount(inverse,
+                          weights=np.minimum(counts[left], counts[right]))
+    shared = np.bincount(inverse)
+    return (pairs // n_rows, pairs % n_rows, dot.astype(np.int64),
+            minimum.astype(np.int64), shared)
+
+
+@instrument.stage
+def similarity(plays, by_day=False):
+    """Computes the similarity of the playlists of each pair of radios
+
+    `plays` is either a load_dataset pd.DataFrame or a PlayLog. Returns
+    a pd.DataFrame with a row per pair of radios that share a song
+    (and per day, with a `date` column first, when `by_day`): the
+    `jaccard` and `cosine` similarities of their play counts, the
+    number of `shared` songs and the songs played by each radio.
+    """
+    radio_ids, key_ids, days, radios = _encode(plays)
+    if by_day:
+        day_ids, day_values = pd.factorize(days, sort=True)
+        row_ids = day_ids * len(radios) + radio_ids
+        blocks = np.arange(len(day_values) * len(radios)) // len(radios)
+    else:
+        row_ids = radio_ids
+        blocks = None
+
+    rows, cols, counts = count_matrix(row_ids, key_ids)
+    a, b, dot, minimum, shared = row_products(rows, cols, counts, blocks)
+
+    n_rows = rows.max() + 1 if len(rows) else 0
+    totals = np.bincount(rows, weights=counts, minlength=n_rows)
+    norms = np.sqrt(np.bincount(rows, weights=counts**2, minlength=n_rows))
+    songs = np.bincount(rows, minlength=n_rows)
+
+    radios = np.asarray(radios, dtype=object)
+    df = pd.DataFrame({
+        'radio_a': radios[a % len(radios)],
+        'radio_b': radios[b % len(radios)],
+        'jaccard': minimum / (totals[a] + totals[b] - minimum),
+        'cosine': dot / (norms[a] * norms[b]),
+        'shared': shared,
+        'songs_a': songs[a],
+        'songs_b': songs[b],
+    })
+    if by_day:
+        df.insert(0, 'date',
+                  pd.to_datetime(day_values[a // len(radios)], unit='D'))
+    return df
+
+
+def similarity_matrix(pairs, column='jaccard', radios=None):
+    """Arranges a similarity column of `similarity` as a square
+    radio x radio pd.DataFrame, with 1 on the diagonal"""
+    radios = sorted(set(pairs['radio_a']) | set(pairs['radio_b'])
+                    if radios is None else radios)
+    matrix = pd.DataFrame(0.0, index=radios, columns=radios)
+    for a, b, value in pairs[['radio_a', 'radio_b', column]].itertuples(
+            index=False):
+        if a in matrix.index and b in matrix.index:
+            matrix.loc[a, b] = matrix.loc[b, a] = value
+    for radio in radios:
+        matrix.loc[radio, radio] = 1.0
+    return matrix
+
+
+def _encode(plays):
+    """Integer radio, (song, artist) and day arrays of the plays with
+    all of them, and the radio names"""
+    if isinstance(plays, PlayLog):
+        radio_ids = plays.radio.astype(np.int64)
+        key_ids = plays.pair_ids()
+        days = plays.days().astype(np.int64)
+        known = plays.minute != np.iinfo(np.int32).min
+        radios = plays.radios
+    else:
+        radio_ids, radios = pd.factorize(plays['radio'])
+        key_ids = plays.groupby(['song', 'artist'],
+                                sort=False).ngroup().to_numpy()
+        days = plays['date'].to_numpy().astype('datetime64[D]').view(
+            np.int64)
+        known = plays['date'].notna().to_numpy()
+        radios = list(radios)
+
+    known &= (radio_ids >= 0) & (key_ids >= 0)
+    return radio_ids[known], key_ids[known], days[known], radios
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Similarity of the playlists of the radios')
+    parser.add_argument('-i', '--input', type=str, default=None)
+    parser.add_argument('--start', type=str, default=None)
+    parser.add_argument('--end', type=str, default=None)
+    parser.add_argument('--radios', nargs='+', default=None)
+    parser.add_argument(
+        '--by-day', action='store_true', help='compare the radios each day')
+    instrument.add_arguments(parser)
+    args = parser.parse_args()
+
+    instrument.start_from_args(args)
+    df = load_dataset(args.input, args.start, args.end, args.radios,
+                      columns=TEXT_COLUMNS)
+    pairs = similarity(df, by_day=args.by_day)
+
+    pd.set_option('display.max_rows', 500)
+    pd.set_option('display.width', 200)
+    if args.by_day:
+        print(pairs.round(3).to_string(index=False))
+    else:
+        for column in ['jaccard', 'cosine']:
+            print(f'\n{column}\n')
+            print(similarity_matrix(pairs, column, args.radios).round(3))
+    instrument.finish_from_args(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Columnar storage of the cleaned dataset
+
+The plays are stored as a parquet dataset partitioned by radio and
+month, e.g. `{root}/radio=rfm/month=2020-08/part-0.parquet`, with
+the columns:
+
+- minute: int32, minutes since 1970-01-01 00:00, sorted
+- song, artist: dictionary encoded strings
+- artists_list: list of strings
+
+Readers can load only some of the columns, dates and radios. Date
+ranges skip the other months, and the row groups outside the range
+within a month.
+
+Monthly rather than daily partitions keep the files large enough to
+be read efficiently: a radio plays ~400 songs a day.
+"""
+import ast
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from radio_repeat.dataset import add_datetime, minutes_to_time
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('radio', pa.string()), ('month', pa.string())]),
+    flavor='hive')
+COLUMNS = ['time', 'song', 'artist', 'date', 'radio', 'artists_list']
+MINUTE = np.timedelta64(1, 'm')
+
+
+def to_table(df):
+    """Converts a cleaned dataset frame to a pyarrow Table"""
+    plays = add_datetime(df[['date', 'time']].copy())
+    minutes = (plays['datetime'].to_numpy() - np.datetime64(0, 'm')) // MINUTE
+
+    artists_list = df['artists_list']
+    if len(artists_list) and isinstance(artists_list.iloc[0], str):
+        # - read back from a csv file, as the repr of a list
+        codes, uniques = pd.factorize(artists_list)
+        lists = [ast.literal_eval(value) for value in uniques] + [None]
+        artists_list = [lists[code] for code in codes]
+
+    return pa.table({
+        'minute': pa.array(minutes, type=pa.int32()),
+        'song': pa.array(df['song'], type=pa.string()).dictionary_encode(),
+        'artist': pa.array(df['artist'], type=pa.string()).dictionary_encode(),
+        'artists_list': pa.array(artists_list, type=pa.list_(pa.string())),
+        'radio': pa.array(df['radio'], type=pa.string()),
+        'month': pa.array(
+            plays['date'].dt.strftime('%Y-%m'), type=pa.string()),
+    })
+
+
+def write_store(df, root):
+    """Writes the cleaned dataset `df` to the directory `root`
+
+    The whole dataset is written to a temporary directory that then
+    replaces `root`, so readers never see a partial dataset.
+    """
+    tmp_root = root.rstrip('/') + '.tmp'
+    if os.path.exists(tmp_root):
+        shutil.rmtree(tmp_root)
+
+    # - a partition per radio and month, with the plays in time order
+    table = to_table(df).sort_by([('radio', 'ascending'),
+                                  ('minute', 'ascending')])
+    ds.write_dataset(
+        table,
+        tmp_root,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template='part-{i}.parquet',
+        max_partitions=1 << 20)
+
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.replace(tmp_root, root)
+
+
+def filter_expression(start=None, end=None, radios=None):
+    """Selects the plays of the (inclusive) date range `start`-`end`
+    and of the `radios`"""
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start).normalize()
+        expr = _and(expr, ds.field('month') >= start.strftime('%Y-%m'))
+        expr = _and(expr, ds.field('minute') >= _minutes(start))
+    if end is not None:
+        end = pd.Timestamp(end).normalize()
+        expr = _and(expr, ds.field('month') <= end.strftime('%Y-%m'))
+        expr = _and(expr,
+                    ds.field('minute') < _minutes(end + pd.Timedelta(days=1)))
+    if radios is not None:
+        expr = _and(expr, ds.field('radio').isin(list(radios)))
+    return expr
+
+
+def read_table(root, columns, start=None, end=None, radios=None):
+    """Reads the stored `columns` as a pyarrow Table
+
+    Only the plays of the (inclusive) date range `start`-`end` and of
+    the `radios` are read.
+    """
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    return dataset.to_table(
+        columns=columns, filter=filter_expression(start, end, radios))
+
+
+def read_store(root, columns=None, start=None, end=None, radios=None):
+    """Reads the plays stored in `root`
+
+    Returns a pd.DataFrame like dataset.load_dataset, with only the
+    given `columns` (plus `datetime` when `time` or `date` are
+    requested), and only the plays of the (inclusive) date range
+    `start`-`end` and of the `radios`.
+    """
+    columns = COLUMNS if columns is None else list(columns)
+    table = read_table(root, _stored_columns(columns), start, end, radios)
+    return to_frame(table, columns)
+
+
+def iter_store(root, columns=None, start=None, end=None, radios=None,
+               chunksize=1 << 18):
+    """Same as read_store, as frames of up to `chunksize` plays
+
+    The frames follow the order of the store: by radio, then by time.
+    """
+    columns = COLUMNS if columns is None else list(columns)
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    batches = dataset.to_batches(
+        columns=_stored_columns(columns),
+        filter=filter_expression(start, end, radios),
+        batch_size=chunksize)
+    for batch in batches:
+        if batch.num_rows:
+            yield to_frame(pa.Table.from_batches([batch]), columns)
+
+
+def _stored_columns(columns):
+    read = [c for c in ['song', 'artist', 'artists_list', 'radio']
+            if c in columns]
+    if any(c in columns for c in ['time', 'date', 'datetime']):
+        read.append('minute')
+    return read
+
+
+def to_frame(table, columns):
+    """Converts a Table read from the store to a load_dataset frame
+    with the given `columns`"""
+    timestamps = 'minute' in table.column_names
+
+    data = {}
+    for column in ['song', 'artist', 'radio']:
+        if column in table.column_names:
+            # - through a categorical, to convert each string only once
+            values = table.column(column).to_pandas()
+            data[column] = np.asarray(values, dtype=object)
+    if 'artists_list' in table.column_names:
+        data['artists_list'] = table.column('artists_list').to_pandas()
+
+    if timestamps:
+        minutes = table.column('minute').to_numpy().astype('timedelta64[m]')
+        datetimes = (np.datetime64(0, 'm') + minutes).astype('datetime64[ns]')
+        data['datetime'] = datetimes
+        if 'date' in columns:
+            data['date'] = datetimes.astype('datetime64[D]').astype(
+                'datetime64[ns]')
+        if 'time' in columns:
+            data['time'] = minutes_to_time(
+                minutes.astype(np.int64) % (24 * 60))
+
+    if timestamps and 'datetime' not in columns:
+        columns = columns + ['datetime']
+    return pd.DataFrame({c: data[c] for c in columns if c in data})
+
+
+def _and(expr, other):
+    return other if expr is None else expr & other
+
+
+def _minutes(timestamp):
+    return int((timestamp - pd.Timestamp(0)) // pd.Timedelta(minutes=1))
+
@@ -0,0 +1,153 @@
+"""Repetition statistics of datasets that do not fit in memory
+
+The plays are read in chunks (see dataset.iter_dataset) and folded
+into the histograms of analysis.repetition_histograms. Between
+chunks, only the histograms, the number of days each (radio, song,
+artist) was played, and the counts of the last (radio, date) of the
+stream, which may continue in the next chunk, are kept.
+"""
+import collections
+import os
+
+import pandas as pd
+
+from radio_repeat.dataset import iter_dataset
+from radio_repeat.playlog import DICTIONARIES, PlayLog
+
+KEY = ['radio', 'date', 'song', 'artist']
+HISTOGRAM_COLUMNS = ['radio', 'period', 'repetitions', 'occurrences']
+
+
+class RepetitionCounter:
+    """Accumulates the repetition histograms of a stream of plays
+
+    The plays of each (radio, date) must be contiguous in the stream,
+    as in the dataset written by clean_data.py.
+    """
+
+    def __init__(self):
+        # (radio, plays of a song in a day) -> occurrences
+        self.daily = collections.Counter()
+        # (radio, song, artist) -> days with plays
+        self.days = collections.Counter()
+        self.dates = set()
+        self.finished = set()
+        self.pending = None
+
+    def add(self, df):
+        """Adds a frame of plays"""
+        if not len(df):
+            return
+        self.dates.update(df['date'].unique())
+
+        counts = df.groupby(KEY, sort=False)['time'].count()
+        if self.pending is not None:
+            counts = pd.concat([self.pending, counts])
+            counts = counts.groupby(level=KEY, sort=False).sum()
+
+        # - the last (radio, date) may continue in the next frame
+        radio, date = df['radio'].iloc[-1], df['date'].iloc[-1]
+        last = ((counts.index.get_level_values('radio') == radio) &
+                (counts.index.get_level_values('date') == date))
+        self.pending = counts[last]
+        self._fold(counts[~last])
+
+    def _fold(self, counts):
+        if not len(counts):
+            return
+
+        radios = counts.index.get_level_values('radio')
+        days = set(zip(radios, counts.index.get_level_values('date')))
+        repeated = days & self.finished
+        if repeated:
+            radio, date = min(repeated)
+            raise ValueError(
+                f'The plays of {radio} on {date:%Y-%m-%d} are not contiguous')
+        self.finished |= days
+
+        self.daily.update(counts.groupby([radios, counts.to_numpy()]).size()
+                          .to_dict())
+        self.days.update(
+            counts.groupby(level=['radio', 'song', 'artist']).size().to_dict())
+
+    def histograms(self):
+        """Returns the histograms of all the plays, in the format of
+        analysis.repetition_histograms
+
+        Call once all the plays were added.
+        """
+        if self.pending is not None:
+            self._fold(self.pending)
+            self.pending = None
+
+        week = collections.Counter(
+            (radio, days) for (radio, _, _), days in self.days.items())
+
+        frames = []
+        for period, counter in [('daily', self.daily), ('week', week)]:
+            if not counter:
+                continue
+            hist = pd.Series(counter, name='occurrences').sort_index()
+            hist.index.names = ['radio', 'repetitions']
+            hist = hist.reset_index()
+            hist.insert(1, 'period', period)
+            frames.append(hist)
+
+        if not frames:
+            return pd.DataFrame(columns=HISTOGRAM_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+def streaming_histograms(chunks):
+    """Computes the repetition histograms of an iterable of frames
+
+    Returns a tuple (histograms, days) with the histograms of
+    analysis.repetition_histograms and the number of dates with plays.
+    """
+    counter = RepetitionCounter()
+    for df in chunks:
+        counter.add(df)
+    return counter.histograms(), len(counter.dates)
+
+
+def iter_input(path=None, start=None, end=None, chunksize=1 << 18):
+    """Reads a play log directory, the store or the csv file in chunks"""
+    columns = ['time', 'song', 'artist', 'date', 'radio']
+    if path is not None and os.path.exists(os.path.join(path, DICTIONARIES)):
+        return PlayLog.load(path).iter_frames(chunksize, start, end)
+    return iter_dataset(path, start, end, columns=columns,
+                        chunksize=chunksize)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Repetition stats, reading the plays in chunks')
+    parser.add_argument(
+        '-i',
+        '--input',
+        type=str,
+        default=None,
+        help='play log, store or csv file (default: the dataset)')
+    parser.add_argument('--start', type=str, default=None)
+    parser.add_argument('--end', type=str, default=None)
+    parser.add_argument(
+        '--chunksize', type=int, default=1 << 18, help='plays per chunk')
+    parser.add_argument(
+        '--pies', action='store_true', help='also save the pie charts')
+    args = parser.parse_args()
+
+    from radio_repeat import analysis
+
+    histograms, days = streaming_histograms(
+        iter_input(args.input, args.start, args.end, args.chunksize))
+    analysis.daily_repetitions_stats(None, histograms, days)
+    analysis.week_repetitions_stats(None, histograms)
+    if args.pies:
+        analysis.daily_repetitions_pie(None, histograms, days)
+        analysis.week_repetitions_pie(None, histograms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Plays indexed by time, to find what a radio played at a given time
+
+A play lasts until the next play on the same radio, as in
+analysis.overlaps. The plays after the last one of a radio are not
+known, so it is only on air until the end of its day. The plays of
+each radio are kept as sorted arrays of starts and ends, so finding
+the play on air at a time is a binary search, and many times are
+searched at once with np.searchsorted.
+"""
+import numpy as np
+import pandas as pd
+
+from radio_repeat.analysis import OPEN_END, play_intervals
+from radio_repeat.dataset import load_dataset
+from radio_repeat.playlog import PlayLog
+
+NAT = np.iinfo(np.int64).min
+DAY = 24 * 60 * 60 * 10**9
+
+
+class Timeline:
+    """Sorted play intervals of each radio
+
+    `plays` is a load_dataset frame or a PlayLog. The queries return
+    positions into `plays` or frames of the selected plays.
+    """
+
+    def __init__(self, plays):
+        self.plays = plays
+        if isinstance(plays, PlayLog):
+            radios = np.array(plays.radios, dtype=object)
+            radio_ids = plays.radio
+            minutes = plays.timestamps()
+            start = np.where(minutes == NAT, NAT, minutes * 60 * 10**9)
+        else:
+            radio_ids, radios = pd.factorize(plays['radio'])
+            start = plays['datetime'].to_numpy().astype(
+                'datetime64[ns]').view(np.int64)
+
+        # - plays without a time or a radio are not on the timeline
+        known = np.flatnonzero((start != NAT) & (radio_ids >= 0))
+        radio_ids, start = radio_ids[known], start[known]
+        end = play_intervals(radio_ids, start)
+        last = end == OPEN_END
+        end[last] = (start[last] // DAY + 1) * DAY
+
+        order = np.lexsort((start, radio_ids))
+        self.index = {}
+        for radio_id, radio in enumerate(radios):
+            rows = order[radio_ids[order] == radio_id]
+            self.index[radio] = (start[rows], end[rows], known[rows])
+
+    def locate(self, radios, times):
+        """Finds the plays on air on `radios` at `times`
+
+        `radios` and `times` are broadcast against each other, e.g. a
+        single radio with many times. Returns an array with the
+        position in `plays` of each play, or -1 when the radio was not
+        playing anything known.
+        """
+        radios, times = np.broadcast_arrays(
+            np.asarray(radios, dtype=object), _to_ns(times))
+        radios, times = radios.ravel(), times.ravel()
+
+        positions = np.full(len(times), -1, dtype=np.int64)
+        for radio in set(radios):
+            if radio not in self.index:
+                continue
+            starts, ends, rows = self.index[radio]
+            sel = np.flatnonzero(radios == radio)
+            i = np.searchsorted(starts, times[sel], side='right') - 1
+            found = i >= 0
+            found[found] = times[sel][found] < ends[i[found]]
+            positions[sel[found]] = rows[i[found]]
+        return positions
+
+    def now_playing(self, time, radios=None):
+        """Returns the plays on air at `time` on each of the `radios`
+        (by default, all)"""
+        radios = sorted(self.index) if radios is None else list(radios)
+        positions = self.locate(radios, [time] * len(radios))
+        return self.take(positions[positions >= 0])
+
+    def between(self, start, end, radios=None):
+        """Returns the plays on air at some point between `start` and
+        `end` (inclusive), by radio and time"""
+        start, end = _to_ns(start)[0], _to_ns(end)[0]
+        radios = sorted(self.index) if radios is None else list(radios)
+
+        positions = []
+        for radio in radios:
+            if radio not in self.index:
+                continue
+            starts, ends, rows = self.index[radio]
+            first = max(np.searchsorted(starts, start, side='right') - 1, 0)
+            last = np.searchsorted(starts, end, side='right')
+            on_air = ends[first:last] > start
+            positions.append(rows[first:last][on_air])
+
+        if not positions:
+            return self.take(np.array([], dtype=np.int64))
+        return self.take(np.concatenate(positions))
+
+    def take(self, positions):
+        """Returns the plays at `positions` as a frame"""
+        if isinstance(self.plays, PlayLog):
+            return self.plays.take(positions).to_frame()
+        return self.plays.iloc[positions]
+
+
+def _to_ns(times):
+    times = pd.to_datetime(np.atleast_1d(np.asarray(times, dtype=object)))
+    return np.asarray(times, dtype='datetime64[ns]').view(np.int64)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Shows what the radios played at a time')
+    parser.add_argument('time', type=str, help="e.g. '2020-08-12 10:30'")
+    parser.add_argument(
+        '--until',
+        type=str,
+        default=None,
+        help='show all the plays from `time` until this time')
+    parser.add_argument('--radios', nargs='+', default=None)
+    parser.add_argument('-i', '--input', type=str, default=None)
+    args = parser.parse_args()
+
+    # - the play on air at `time` may have started the day before
+    start = pd.Timestamp(args.time) - pd.Timedelta(days=1)
+    end = pd.Timestamp(args.until or args.time)
+    df = load_dataset(args.input, start=start, end=end, radios=args.radios)
+
+    timeline = Timeline(df)
+    if args.until is None:
+        plays = timeline.now_playing(args.time, args.radios)
+    else:
+        plays = timeline.between(args.time, args.until, args.radios)
+    print(plays[['radio', 'date', 'time', 'song', 'artist']].to_string(
+        index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves the recorded pages in tests/fixtures
+
+    A request to /{station} with hour `h` (form field `hora` or query
+    parameter `h`) is answered with fixtures/{station}_{h}.html, then
+    fixtures/{station}.html, or fixtures/empty.html when there is no
+    such recording. Hours in `server.fail_hours` get a 500 answer.
+    """
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.respond(url.path, parse_qs(url.query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        fields = parse_qs(self.rfile.read(length).decode())
+        self.respond(urlsplit(self.path).path, fields)
+
+    def respond(self, path, fields):
+        self.server.requests.append((path, fields))
+        # - answer out of order, as a real server under load would
+        time.sleep(random.uniform(0, 0.005))
+
+        hour = (fields.get('hora') or fields.get('h') or [''])[0]
+        station = path.strip('/')
+        if hour in self.server.fail_hours:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        for name in [f'{station}_{hour}.html', f'{station}.html', 'empty.html']:
+            name = os.path.join(FIXTURES_DIR, name)
+            if os.path.exists(name):
+                break
+        with open(name, 'rb') as f:
+            body = f.read()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+@pytest.fixture
+def stand_in_server():
+    """Local HTTP stand-in for the radio websites. Yields the server,
+    with its base url in `server.url`"""
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.requests = []
+    server.fail_hours = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,130 @@
+import os
+
+import radio_repeat.clean_data as rcd
+from radio_repeat import ingest
+import pandas as pd
+
+
+def test_clean_musics_with_multiple_artists():
+    df = pd.DataFrame({
+        'song': ['S1', 'S1', 'S1', 'S2', 'S2'],
+        'artist': ['b', 'a & b', 'c', 'a', 'c & d'],
+    })
+    df = rcd.clean_musics_with_multiple_artists(df)
+
+    assert df['artist'].tolist() == ['a & b', 'a & b', 'c', 'a', 'c & d']
+    assert df['artists_list'].tolist() == [['b'], ['a', 'b'], ['c'], ['a'],
+                                           ['c', 'd']]
+
+
+def test_clean_musics_with_multiple_artists_keeps_first_longest():
+    df = pd.DataFrame({
+        'song': ['S1', 'S1', 'S1'],
+        'artist': ['b & a', 'a', 'a & c'],
+    })
+    df = rcd.clean_musics_with_multiple_artists(df)
+
+    assert df['artist'].tolist() == ['a & b'] * 3
+
+
+def test_clean_artist_and_songs():
+    df = pd.DataFrame({
+        'song': ['Wonderfull (Remix)', 'wonderful', None],
+        'artist': ['Nial Horan ft. Anne-Marie', 'anne marie & niall horan',
+                   'R.E.M.'],
+    })
+    df = rcd.clean_artist(rcd.clean_songs(rcd.lowercase(df)))
+
+    assert df['song'].tolist()[:2] == ['wonderful', 'wonderful']
+    assert df['song'].isna().tolist() == [False, False, True]
+    assert df['artist'].tolist() == [
+        'anne marie & niall horan', 'anne marie & niall horan', 'rem'
+    ]
+
+
+def test_compile_rules():
+    normalize = rcd.compile_rules([(r'\s+', ' '), str.strip, ('a', 'b')])
+    assert normalize('  a   a ') == 'b b'
+
+
+def _write_day(in_dir, radio, day, rows):
+    with open(os.path.join(in_dir, f'{radio}_{day:02d}_08_2020.csv'),
+              'w') as f:
+        f.write('\n'.join('|'.join(row) for row in rows) + '\n')
+
+
+def _full_clean(in_dir):
+    df = pd.concat([
+        rcd.parse_radio_df(radio, in_dir)
+        for radio in rcd.RADIOS if rcd.radio_paths(radio, in_dir)
+    ],
+                   ignore_index=True)
+    return rcd.clean(df)
+
+
+def test_incremental_clean(tmp_path):
+    in_dir = str(tmp_path) + '/'
+    cache_dir = str(tmp_path / 'cache')
+    _write_day(in_dir, 'rfm', 10, [('00:01', 'Dakiti', 'Bad Bunny'),
+                                   ('00:04', 'Grow', 'Frances')])
+    _write_day(in_dir, 'megafm', 10, [('00:02', 'Dakiti', 'Jhay Cortez')])
+
+    df, touched = ingest.incremental_clean(in_dir, cache_dir, verbose=False)
+    assert df.equals(_full_clean(in_dir))
+    assert touched is None
+
+    # - a new file links both credits of 'dakiti'
+    _write_day(in_dir, 'rfm', 11,
+               [('00:01', 'Dakiti', 'Bad Bunny feat. Jhay Cortez')])
+    df, touched = ingest.incremental_clean(in_dir, cache_dir, verbose=False)
+    assert df.equals(_full_clean(in_dir))
+    assert touched == {'dakiti'}
+    assert set(df['artist']) == {'bad bunny & jhay cortez', 'frances'}
+
+    # - and removing it splits them again
+    os.remove(os.path.join(in_dir, 'rfm_11_08_2020.csv'))
+    df, touched = ingest.incremental_clean(in_dir, cache_dir, verbose=False)
+    assert df.equals(_full_clean(in_dir))
+    assert set(df['artist']) == {'bad bunny', 'jhay cortez', 'frances'}
+
+
+def test_parse_normalized_matches_serial(tmp_path):
+    in_dir = str(tmp_path) + '/'
+    _write_day(in_dir, 'rfm', 10, [('00:01', 'Dakiti', 'Bad Bunny'),
+                                   ('00:04', 'Grow', 'Frances')])
+    _write_day(in_dir, 'rfm', 11,
+               [('00:01', 'Dakiti', 'Bad Bunny feat. Jhay Cortez')])
+    _write_day(in_dir, 'megafm', 10, [('00:02', 'Dakiti!', 'Jhay Cortez')])
+
+    df = rcd.clean_musics_with_multiple_artists(
+        rcd.parse_normalized(in_dir, workers=2))
+    expected = _full_clean(in_dir)
+    assert df.equals(expected)
+    assert df.to_csv(sep='|') == expected.to_csv(sep='|')
+
+
+def test_rules_fingerprint(monkeypatch):
+    fingerprint = ingest.rules_fingerprint()
+
+    # - a rule function changed under the same name
+    def sort_artists(artist):
+        return ' & '.join(sorted(artist.split(' & '), reverse=True))
+
+    rules = [sort_artists if rule is rcd.sort_artists else rule
+             for rule in rcd.ARTIST_RULES]
+    monkeypatch.setattr(rcd, 'ARTIST_RULES', rules)
+    assert ingest.rules_fingerprint() != fingerprint
+    monkeypatch.undo()
+
+    # - a step that applies the rules changed
+    def lowercase(df):
+        return df
+
+    monkeypatch.setattr(rcd, 'lowercase', lowercase)
+    assert ingest.rules_fingerprint() != fingerprint
+    monkeypatch.undo()
+
+    monkeypatch.setattr(rcd, 'NORMALIZE_VERSION', rcd.NORMALIZE_VERSION + 1)
+    assert ingest.rules_fingerprint() != fingerprint
+    monkeypatch.undo()
+    assert ingest.rules_fingerprint() == fingerprint
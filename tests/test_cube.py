@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+import radio_repeat.analysis as rra
+from radio_repeat.cube import Cube, build_cube, read_cube, update_cube, write_cube
+from radio_repeat.dataset import add_datetime
+
+
+def _plays():
+    df = pd.DataFrame({
+        'date': ['2020-08-10', '2020-08-10', '2020-08-10', '2020-08-11',
+                 '2020-08-11', '2020-08-10', '2020-08-12', '2020-08-12'],
+        'song': ['s1', 's1', 's2', 's1', 's3', 's1', 's2', None],
+        'artist': ['a1', 'a1', 'a2', 'a1', 'a2', 'a1', 'a2', 'a1'],
+        'radio': ['rfm'] * 5 + ['comercial'] * 3,
+        'time': ['00:01', '09:02', '09:03', '00:04', '00:05', '00:01',
+                 '23:10', '23:50']
+    })
+    return add_datetime(df)
+
+
+def _sorted(cube):
+    cube = cube.astype({'song': object, 'artist': object})
+    return cube.sort_values(['date', 'radio', 'hour', 'song',
+                             'artist']).reset_index(drop=True)
+
+
+def test_cube_queries(tmp_path):
+    df = _plays()
+    write_cube(build_cube(df), str(tmp_path / 'cube.parquet'))
+    cube = Cube.load(str(tmp_path / 'cube.parquet'))
+
+    for start, end, radios in [(None, None, None),
+                               ('2020-08-11', '2020-08-12', None),
+                               ('2020-08-10', '2020-08-10', ['rfm'])]:
+        sel = df['date'].between(start or '2000-01-01', end or '2100-01-01')
+        if radios is not None:
+            sel &= df['radio'].isin(radios)
+        pd.testing.assert_frame_equal(
+            cube.histograms(start, end, radios),
+            rra.repetition_histograms(df[sel]))
+        assert cube.count_days(start, end, radios) == rra.count_days(df[sel])
+
+    top = cube.top_songs(2)
+    assert top.values.tolist() == [['s1', 'a1', 4], ['s2', 'a2', 2]]
+    hours = cube.hourly_plays(radios=['comercial'])
+    assert hours['comercial'].to_dict() == {0: 1, 23: 2}
+
+
+def test_update_cube():
+    # - mostly plays of another song, so that the cube is updated
+    df = _plays()
+    other = df.assign(song='s9', artist='a9')
+    df = pd.concat([df, other, other], ignore_index=True)
+    cube = build_cube(df)
+
+    df.loc[df['song'] == 's2', 'artist'] = 'a2 & a3'
+    df = pd.concat([df, _plays()[:1]], ignore_index=True)
+    updated = update_cube(cube, df, {'s1', 's2'})
+    pd.testing.assert_frame_equal(_sorted(updated), _sorted(build_cube(df)))
+
+    with pytest.raises(ValueError):
+        update_cube(cube, _plays()[:3], {'s2'})
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from radio_repeat import dedupe
+from radio_repeat import ingest
+import radio_repeat.clean_data as rcd
+from tests.test_clean_data import _write_day
+
+
+def _plays(rows):
+    """A frame with a play per (song, artist, plays) row"""
+    return pd.DataFrame([(song, artist) for song, artist, plays in rows
+                         for _ in range(plays)],
+                        columns=['song', 'artist'])
+
+
+def test_candidate_pairs():
+    values = ['niall horan', 'nial horan', 'ellie goulding', 'elie goulding',
+              'the weeknd', 'dua lipa']
+    assert sorted(dedupe.candidate_pairs(values)) == [(0, 1), (2, 3)]
+
+    groups = ['a', 'b', 'c', 'c', 'd', 'e']
+    assert dedupe.candidate_pairs(values, groups) == [(2, 3)]
+
+
+def test_similar_needs_the_same_numbers():
+    assert dedupe.similar('wonderfull', 'wonderful') > 0.9
+    assert dedupe.similar('love song 1', 'love song 2') == 0
+    assert dedupe.similar('ily', 'lily') == 0
+
+
+def test_propose():
+    df = _plays([
+        ('dilemma', 'kelly rowland & nelly', 3),
+        ('dilema', 'kelly roland & nelly', 1),
+        ('wonderful', 'anne marie & niall horan', 2),
+        ('wonderfull', 'anne marie & nial horan', 1),
+        ('lovesong 1', 'band', 1),
+        ('lovesong 2', 'band', 1),
+        ('deamons', 'other band', 1),
+        (None, 'other band', 1),
+    ])
+    proposals = dedupe.propose(df)
+
+    assert proposals[['kind', 'artist', 'variant', 'canonical']].values.tolist(
+    ) == [
+        ['artist', '', 'anne marie & nial horan', 'anne marie & niall horan'],
+        ['artist', '', 'kelly roland & nelly', 'kelly rowland & nelly'],
+        ['song', 'anne marie & niall horan', 'wonderfull', 'wonderful'],
+        ['song', 'kelly rowland & nelly', 'dilema', 'dilemma'],
+    ]
+    assert proposals['plays'].tolist() == [1, 1, 1, 1]
+
+
+def test_update_and_apply_mapping(tmp_path):
+    path = str(tmp_path / 'dedupe.csv')
+    df = _plays([('dilemma', 'kelly rowland & nelly', 3),
+                 ('dilema', 'kelly roland & nelly', 1),
+                 ('ellie goulding', 'x', 1),
+                 ('love me like you do', 'elie goulding', 2)])
+    mapping = dedupe.update_mapping(dedupe.propose(df), path)
+    assert len(mapping) == 2
+
+    # - reject the merge of the artists, it is kept on the next runs
+    mapping.loc[mapping['kind'] == 'artist', 'canonical'] = \
+        'kelly roland & nelly'
+    mapping.to_csv(path, sep='|', index=False)
+    mapping = dedupe.update_mapping(dedupe.propose(df), path)
+    assert len(mapping) == 2
+
+    df.loc[len(df)] = ['dilema', np.nan]
+    df = dedupe.apply_mapping(df, mapping)
+    assert df['artist'].tolist()[:4] == ['kelly rowland & nelly'] * 3 + [
+        'kelly roland & nelly'
+    ]
+    # - the songs are only renamed for their artist
+    assert df['song'].tolist()[:4] == ['dilemma'] * 3 + ['dilema']
+    assert df['song'].tolist()[-1] == 'dilema'
+    assert df['artist'].isna().tolist()[-1]
+
+
+def test_clean_with_mapping(tmp_path):
+    in_dir = str(tmp_path) + '/'
+    path = str(tmp_path / 'dedupe.csv')
+    _write_day(in_dir, 'rfm', 10, [('00:01', 'Dilemma', 'Kelly Rowland'),
+                                   ('00:04', 'Dilemma', 'Kelly Rowland')])
+    _write_day(in_dir, 'megafm', 10, [('00:02', 'Dilema', 'Kelly Roland')])
+
+    df = rcd.clean(
+        rcd.parse_normalized(in_dir, workers=1), mapping_path=path)
+    assert set(zip(df['song'], df['artist'])) == {('dilemma', 'kelly rowland')}
+
+    df, touched = ingest.incremental_clean(
+        in_dir, str(tmp_path / 'cache'), verbose=False, mapping_path=path)
+    assert set(zip(df['song'], df['artist'])) == {('dilemma', 'kelly rowland')}
+    assert df.equals(rcd.clean_normalized(
+        rcd.normalize(pd.concat([
+            rcd.parse_radio_df(radio, in_dir)
+            for radio in ['rfm', 'megafm']
+        ], ignore_index=True)), path))
+
+
+def test_mapping_follows_later_merges(tmp_path):
+    path = str(tmp_path / 'dedupe.csv')
+    df = _plays([('beautiful', 'christina aguilera', 10),
+                 ('beautiful', 'christina aguillera', 2)])
+    df, _ = dedupe.deduplicate(df, path)
+    assert df['artist'].value_counts().to_dict() == {
+        'christina aguilera': 12
+    }
+
+    # - a later run merges the old canonical into a more played one
+    df = _plays([('beautiful', 'christina aguilera', 10),
+                 ('beautiful', 'christina aguillera', 2),
+                 ('beautiful', 'christina aguilerra', 50)])
+    df, _ = dedupe.deduplicate(df, path)
+    assert df['artist'].value_counts().to_dict() == {
+        'christina aguilerra': 62
+    }
+
+
+def test_mapping_chains_and_cycles():
+    mapping = pd.DataFrame({
+        'kind': ['artist', 'artist', 'song', 'song'],
+        'artist': ['', '', 'c', 'c'],
+        'variant': ['a', 'b', 'dilema', 'dillemma'],
+        'canonical': ['b', 'a', 'dillemma', 'dilemma'],
+    })
+    df = dedupe.apply_mapping(
+        _plays([('s', 'a', 1), ('s', 'b', 1), ('dilema', 'c', 1)]), mapping)
+    # - the values of a cycle end as one of them
+    assert df['artist'].tolist() == ['a', 'a', 'c']
+    assert df['song'].tolist() == ['s', 's', 'dilemma']
@@ -0,0 +1,119 @@
+import glob
+import os
+
+import pytest
+
+from radio_repeat import extractors
+from radio_repeat.scrape_cidadefm import CidadeFM
+from radio_repeat.scrape_comercial import Comercial
+from radio_repeat.scrape_megafm import MegaFM
+from radio_repeat.scrape_rfm import RFM
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+STATIONS = [RFM, MegaFM, CidadeFM, Comercial]
+
+
+def _fixture_pages():
+    for station in STATIONS:
+        paths = glob.glob(os.path.join(FIXTURES_DIR, f'{station.name}*.html'))
+        for path in sorted(paths):
+            with open(path) as f:
+                yield station, f.read()
+
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+needs_lxml = pytest.mark.skipif(lxml is None,
+                                reason='the lxml extra is not installed')
+
+
+@pytest.mark.parametrize(
+    'backend', [pytest.param('lxml', marks=needs_lxml), 'regex'])
+def test_backends_match_bs4(backend):
+    for station, page in _fixture_pages():
+        expected = extractors.extract_bs4(page, station.spec)
+        assert expected
+        assert extractors.BACKENDS[backend](page, station.spec) == expected
+
+
+def test_regex_backend_handles_markup():
+    spec = extractors.make_spec(('div', 'musicInfo'), [
+        ('div', 'musicInfoTime'),
+        ('div', ['musicInfoName', 'title']),
+    ])
+    page = ('<div class="musicInfo x"><div class="musicInfoTime">00:01</div>'
+            '<div class=\'title big\'>Sim <b>N&atilde;o</b></div></div>'
+            '<div class="musicInfoTimeline"></div>')
+
+    assert extractors.extract_regex(page, spec) == [('00:01', 'Sim Não')]
+    assert extractors.extract_regex(page, spec) == extractors.extract_bs4(
+        page, spec)
+
+
+def test_regex_backend_falls_back_to_bs4():
+    spec = extractors.make_spec(('div', 'song'), [('div', 'songTitle')])
+    # - unquoted attributes are not understood by the regex backend
+    page = ('<div class="song"><div class=songTitle>A</div></div>'
+            '<div class="song"><div class="songTitle">B</div></div>')
+
+    with pytest.raises(extractors.StructureError):
+        extractors.extract_regex(page, spec)
+    assert extractors.extract_rows(page, spec, 'regex') == [('A', ), ('B', )]
+
+
+@pytest.mark.parametrize('page', [
+    # - unquoted class of the play element
+    '<div class=musicInfo><span class="a">A</span>'
+    '<span class="b">B</span></div>',
+    # - nested element in a field
+    '<div class="musicInfo"><span class="a">A</span>'
+    '<span class="b">Hey <span>Jude</span></span></div>',
+])
+def test_regex_backend_falls_back_on_unexpected_markup(page):
+    spec = extractors.make_spec(('div', 'musicInfo'), [('span', 'a'),
+                                                       ('span', 'b')])
+    with pytest.raises(extractors.StructureError):
+        extractors.extract_regex(page, spec)
+    assert extractors.extract_rows(page, spec,
+                                   'regex') == extractors.extract_bs4(
+                                       page, spec)
+
+
+@pytest.mark.parametrize(
+    'backend', ['bs4', pytest.param('lxml', marks=needs_lxml), 'regex'])
+def test_plays_without_a_field_are_left_out(backend):
+    spec = extractors.make_spec(('div', 'song'), [('div', 'songTitle'),
+                                                  ('div', 'songArtist')])
+    page = ('<div class="song"><div class="songTitle">A</div></div>'
+            '<div class="song"><div class="songTitle">B</div>'
+            '<div class="songArtist">C</div></div>')
+
+    if backend != 'bs4':
+        with pytest.raises(extractors.StructureError):
+            extractors.BACKENDS[backend](page, spec)
+    assert extractors.extract_rows(page, spec, backend) == [('B', 'C')]
+
+
+def test_lxml_backend_falls_back_without_lxml(monkeypatch):
+    monkeypatch.setattr(extractors, 'lxml', None)
+    for station, page in _fixture_pages():
+        with pytest.raises(ImportError):
+            extractors.extract_lxml(page, station.spec)
+        assert extractors.extract_rows(
+            page, station.spec, 'lxml') == extractors.extract_bs4(
+                page, station.spec)
+
+
+@pytest.mark.parametrize('station', STATIONS)
+def test_regex_backend_reads_an_empty_list(station):
+    tag, classes = station.spec['container']
+    page = f'<{tag} class="{classes[0]}">\n</{tag}>'
+    assert extractors.extract_regex(page, station.spec) == []
+
+    # - a list without the expected play elements is a markup change
+    page = f'<{tag} class="{classes[0]}"><p>A</p></{tag}>'
+    with pytest.raises(extractors.StructureError):
+        extractors.extract_regex(page, station.spec)
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+
+from radio_repeat import figures
+from radio_repeat.dataset import add_datetime
+
+
+def _plays():
+    rows = []
+    for day in ['2020-08-10', '2020-08-11', '2020-08-12']:
+        for radio in ['rfm', 'megafm']:
+            rows += [(day, 'S1', 'A1', radio, '10:00'),
+                     (day, 'S1', 'A1', radio, '12:00'),
+                     (day, 'S2', 'A2', radio, '11:00')]
+    df = pd.DataFrame(rows, columns=['date', 'song', 'artist', 'radio',
+                                     'time'])
+    return add_datetime(df)
+
+
+def test_date_windows():
+    windows = figures.date_windows('2020-08-10', '2020-08-16', days=3)
+    assert [(f'{first:%d}', f'{last:%d}') for first, last in windows] == [
+        ('10', '12'), ('13', '15'), ('16', '16')
+    ]
+
+
+def test_window_jobs():
+    df = _plays()
+    windows = figures.date_windows('2020-08-10', '2020-08-13', days=2)
+    jobs = figures.window_jobs(df, 'out', windows, per_radio=True)
+    assert [os.path.basename(path) for _, _, path in jobs] == [
+        f'{kind}_repetitions_2020-08-1{day}_2020-08-1{day + 1}_{radio}.png'
+        for day in [0, 2] for radio in ['megafm', 'rfm']
+        for kind in ['daily', 'weekly']
+    ]
+    for _, data, path in jobs:
+        assert list(data) == [path[:-len('.png')].rsplit('_', 1)[1]]
+
+
+def test_render_skips_the_unchanged_figures(tmp_path):
+    df = _plays()
+    windows = figures.date_windows('2020-08-10', '2020-08-11', days=1)
+
+    jobs = figures.window_jobs(df, str(tmp_path), windows)
+    assert len(figures.render(jobs)) == 4
+    assert figures.render(jobs) == []
+    mtimes = {path: os.path.getmtime(path) for _, _, path in jobs}
+
+    # - only the window whose plays changed is drawn again
+    df = pd.concat([df, add_datetime(pd.DataFrame({
+        'date': ['2020-08-11'],
+        'song': ['S3'],
+        'artist': ['A3'],
+        'radio': ['rfm'],
+        'time': ['13:00'],
+    }))], ignore_index=True)
+    jobs = figures.window_jobs(df, str(tmp_path), windows)
+    drawn = figures.render(jobs)
+    assert sorted(os.path.basename(path) for path in drawn) == [
+        'daily_repetitions_2020-08-11_2020-08-11.png',
+        'weekly_repetitions_2020-08-11_2020-08-11.png',
+    ]
+    assert all(os.path.getmtime(path) == mtime
+               for path, mtime in mtimes.items() if path not in drawn)
+
+    # - a missing file is drawn again, and everything with `force`
+    os.remove(jobs[0][2])
+    assert figures.render(jobs) == [jobs[0][2]]
+    assert len(figures.render(jobs, force=True)) == 4
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pandas as pd
+
+from radio_repeat import instrument
+import radio_repeat.clean_data as rcd
+
+
+@instrument.stage
+def double(df):
+    return pd.concat([df, df])
+
+
+@instrument.stage(name='outer')
+def outer(df):
+    return double(double(df))
+
+
+def test_stage_does_nothing_when_not_started():
+    df = pd.DataFrame({'a': [1, 2]})
+    assert instrument._run is None
+    assert len(double(df)) == 4
+    assert double.__name__ == 'double'
+    assert instrument.finish() is None
+
+
+def test_run_report(tmp_path):
+    df = pd.DataFrame({'a': [1, 2]})
+    instrument.start(profile_dir=str(tmp_path / 'profiles'))
+    outer(df)
+    report = instrument.finish(str(tmp_path / 'report.json'))
+
+    assert instrument._run is None
+    with open(tmp_path / 'report.json') as f:
+        assert json.load(f) == report
+
+    stages = report['stages']
+    assert [(s['stage'], s['depth'], s['rows_in'], s['rows_out'])
+            for s in stages] == [('outer', 0, 2, 8), ('double', 1, 2, 4),
+                                 ('double', 1, 4, 8)]
+    assert stages[0]['seconds'] >= stages[1]['seconds']
+    assert stages[0]['peak_rss_mb'] >= max(s['peak_rss_mb']
+                                           for s in stages[1:])
+    assert report['peak_rss_mb'] >= stages[0]['peak_rss_mb']
+    assert all(s['peak_rss_delta_mb'] >= 0 for s in stages)
+
+    # - only the outer stage is profiled, with the inner ones in it
+    assert os.path.exists(stages[0]['profile'])
+    assert 'profile' not in stages[1]
+
+
+def test_peak_is_only_reset_on_request(monkeypatch):
+    resets = []
+    monkeypatch.setattr(instrument, '_reset_peak_rss',
+                        lambda: resets.append(True))
+    df = pd.DataFrame({'a': [1, 2]})
+
+    instrument.start()
+    outer(df)
+    instrument.finish()
+    assert resets == []
+
+    instrument.start(reset_peak=True)
+    outer(df)
+    report = instrument.finish()
+    assert len(resets) == len(report['stages']) == 3
+
+
+def test_clean_stages_are_recorded():
+    df = pd.DataFrame({
+        'song': ['Wonderfull', 'wonderful'],
+        'artist': ['Nial Horan', 'niall horan & anne marie'],
+    })
+    instrument.start()
+    df = rcd.clean(df)
+    report = instrument.finish()
+
+    assert [s['stage'] for s in report['stages']] == [
+        'lowercase', 'clean_songs', 'clean_artist',
+        'clean_musics_with_multiple_artists'
+    ]
+    assert df['artist'].tolist() == ['anne marie & niall horan'] * 2
@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+import radio_repeat.analysis as rra
+from radio_repeat.dataset import add_datetime
+from radio_repeat.live import OverlapDetector
+
+
+def _plays():
+    # - S2 overlaps on three radios through the middle play, S3 on
+    #   two, and rfm repeats S1 right after it ends
+    df = pd.DataFrame({
+        'date': ['2020-08-10'] * 9 + ['2020-08-11'] * 3,
+        'song': ['S1', 'S2', 'S3', 'S4', 'S2', 'S5', 'S3', 'S2', 'S5',
+                 'S1', 'S1', None],
+        'artist': ['A1', 'A2', 'A3', 'A4', 'A2', 'A5', 'A3', 'A2', 'A5',
+                   'A1', 'A1', 'A1'],
+        'radio': ['rfm', 'rfm', 'rfm', 'comercial', 'comercial',
+                  'comercial', 'megafm', 'megafm', 'megafm', 'rfm', 'rfm',
+                  'rfm'],
+        'time': ['15:38', '15:42', '15:46', '15:37', '15:41', '15:45',
+                 '15:41', '15:37', '15:35', '10:00', '10:03', '10:01']
+    })
+    return add_datetime(df)
+
+
+def test_live_overlaps_match_batch():
+    df = _plays()
+    detector = OverlapDetector()
+    detector.push_frame(df)
+
+    pd.testing.assert_frame_equal(detector.overlaps(), rra.overlaps(df))
+
+
+def test_live_overlaps_in_micro_batches():
+    df = _plays().sort_values('datetime', kind='stable')
+    detector = OverlapDetector()
+    events = []
+    for first in range(0, len(df), 5):
+        events += detector.push_frame(df[first:first + 5])
+
+    assert [event['radios'] for event in events] == [
+        'megafm | comercial', 'megafm | comercial | rfm', 'megafm | rfm',
+        'rfm | rfm'
+    ]
+    pd.testing.assert_frame_equal(detector.overlaps(), rra.overlaps(df))
+
+
+def test_live_rejects_late_plays():
+    df = _plays()
+    detector = OverlapDetector()
+    detector.push_frame(df[df['date'] == '2020-08-11'])
+    with pytest.raises(ValueError):
+        detector.push_frame(df[df['date'] == '2020-08-10'])
+
+
+def test_live_forgets_the_songs_off_air():
+    df = _plays().sort_values('datetime', kind='stable')
+    detector = OverlapDetector()
+    drained = []
+    for first in range(0, len(df), 3):
+        detector.push_frame(df[first:first + 3])
+        drained.append(detector.overlaps(drain=True))
+    drained.append(detector.overlaps())
+
+    # - only the songs whose last play is still on air are kept
+    assert sorted(detector.songs) == [('S1', 'A1'), ('S5', 'A5')]
+    assert all(not group['closed'] for group in detector.found)
+
+    # - the drained overlaps add up to the batch ones
+    drained = pd.concat([frame for frame in drained if len(frame)])
+    pd.testing.assert_frame_equal(
+        drained.sort_values(['song', 'artist', 'merged'], ignore_index=True),
+        rra.overlaps(df))
@@ -0,0 +1,41 @@
+import pandas as pd
+
+import radio_repeat.analysis as rra
+from radio_repeat.dataset import add_datetime
+from radio_repeat.playlog import PlayLog
+
+
+def _plays():
+    df = pd.DataFrame({
+        'date': ['2020-08-10', '2020-08-10', '2020-08-10', '2020-08-10',
+                 '2020-08-11', '2020-08-11'],
+        'song': ['S1', 'S2', 'S1', 'S3', 'S1', None],
+        'artist': ['A1', 'A1', 'A1', 'A2', 'A1', 'A2'],
+        'radio': ['rfm', 'rfm', 'comercial', 'comercial', 'rfm', 'rfm'],
+        'time': ['00:01', '00:04', '00:02', '00:05', '10:00', '11:00']
+    })
+    return add_datetime(df)
+
+
+def test_playlog_round_trip(tmp_path):
+    df = _plays()
+    PlayLog.from_frame(df).save(str(tmp_path))
+    log = PlayLog.load(str(tmp_path))
+
+    assert log.songs == ['S1', 'S2', 'S3']
+    assert log.song.tolist() == [0, 1, 0, 2, 0, -1]
+    pd.testing.assert_frame_equal(log.to_frame(), df[log.to_frame().columns])
+
+
+def test_playlog_analysis_matches_frame():
+    df = _plays()
+    log = PlayLog.from_frame(df)
+
+    pd.testing.assert_frame_equal(
+        rra.repetition_histograms(log), rra.repetition_histograms(df))
+    pd.testing.assert_frame_equal(rra.overlaps(log), rra.overlaps(df))
+    for radio in ['rfm', 'comercial', 'megafm']:
+        assert rra.count_daily_radio_repetitions(log, radio).equals(
+            rra.count_daily_radio_repetitions(df, radio))
+        assert rra.count_week_radio_repetitions(log, radio).equals(
+            rra.count_week_radio_repetitions(df, radio))
@@ -1,5 +1,6 @@
 from radio_repeat import __version__
 import radio_repeat.analysis as rra
+from radio_repeat.dataset import add_datetime, time_to_minutes
 import pandas as pd
 import numpy as np
 
@@ -204,3 +205,95 @@ def test_avg_week_radio_repetitions():
     expected = 4. / 3.
 
     assert np.isclose(result, expected)
+
+
+def test_add_datetime():
+    df = pd.concat([
+        make_simple_radio_df('rfm'),
+        pd.DataFrame({
+            'date': ['2020-08-10', '2020-08-11', '2020-08-10', '2020-12-31'],
+            'time': ['23:58', '00:03', '00:00', '23:59']
+        })
+    ],
+                   ignore_index=True)
+    expected = _add_datetime_to_df(df.copy())
+    df = add_datetime(df)
+
+    pd.testing.assert_series_equal(df['datetime'], expected['datetime'])
+    pd.testing.assert_series_equal(df['date'], expected['date'])
+
+
+def test_add_datetime_with_missing_values():
+    df = add_datetime(
+        pd.DataFrame({
+            'date': ['2020-08-10', np.nan, '2020-08-11', '2020-08-11'],
+            'time': ['10:00', '11:00', np.nan, '12:00']
+        }))
+
+    assert df['datetime'].isna().tolist() == [False, True, True, False]
+    assert df['date'].isna().tolist() == [False, True, False, False]
+    assert df['datetime'][3] == pd.Timestamp('2020-08-11 12:00')
+    assert time_to_minutes(['00:01', np.nan]).tolist() == [
+        1, np.iinfo(np.int64).min
+    ]
+
+
+def test_overlaps_is_silent_and_keeps_input(capsys):
+    df = pd.DataFrame({
+        'date': ['2020-08-10', '2020-08-10', '2020-08-10', '2020-08-10'],
+        'song': ['S1', 'S2', 'S1', 'S3'],
+        'artist': ['A1', 'A1', 'A1', 'A2'],
+        'radio': ['rfm', 'rfm', 'comercial', 'comercial'],
+        'time': ['00:01', '00:04', '00:05', '00:09']
+    })
+    df = _add_datetime_to_df(df)
+    columns = list(df.columns)
+
+    result = rra.overlaps(df)
+    assert list(result.columns) == rra.OVERLAP_COLUMNS
+    assert list(df.columns) == columns
+    assert capsys.readouterr().out == ''
+
+
+def test_repetition_histograms():
+    df = pd.concat([make_simple_radio_df('rfm'),
+                    make_simple_radio_df('comercial')[:3]])
+    histograms = rra.repetition_histograms(df)
+
+    assert set(histograms.columns) == {
+        'radio', 'period', 'repetitions', 'occurrences'
+    }
+    assert rra.radio_histogram(histograms, 'rfm', 'daily').equals(
+        rra.count_daily_radio_repetitions(df, 'rfm'))
+    assert rra.radio_histogram(histograms, 'rfm', 'week').equals(
+        rra.count_week_radio_repetitions(df, 'rfm'))
+    # - comercial, day 1: 2x S1 + 1x S2
+    expected = pd.Series([1, 1], index=[1, 2])
+    assert rra.radio_histogram(histograms, 'comercial',
+                               'daily').equals(expected)
+
+
+def test_import_does_not_load_matplotlib():
+    import subprocess
+    import sys
+
+    code = ('import sys, radio_repeat.analysis; '
+            'print("matplotlib" in sys.modules)')
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == 'False'
+
+
+def test_main_stats_with_filters(tmp_path, monkeypatch, capsys):
+    df = pd.concat([make_simple_radio_df('rfm'), make_simple_radio_df('megafm')])
+    df.to_csv(tmp_path / 'plays.csv', sep='|', index=False)
+    monkeypatch.setattr('sys.argv', [
+        'analysis.py', 'stats', '-i', str(tmp_path / 'plays.csv'),
+        '--start', '2020-08-11', '--end', '2020-08-11', '--radios', 'rfm'
+    ])
+    rra.main()
+
+    out = capsys.readouterr().out
+    assert 'rfm: plays musics an avg of 1.0 times per day' in out
+    assert 'rfm: plays musics an avg of 1.0 days per week' in out
+    assert 'megafm' not in out and 'Overlaps' not in out
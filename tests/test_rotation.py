@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from radio_repeat.dataset import add_datetime
+from radio_repeat.playlog import PlayLog
+from radio_repeat.rotation import group_percentiles, rotation
+
+
+def _plays():
+    times = {
+        # - every two hours
+        ('rfm', 'S1'): ['08:00', '10:00', '12:01', '13:59', '16:00'],
+        # - anytime
+        ('rfm', 'S2'): ['08:10', '08:40', '12:00', '12:30', '20:00'],
+        ('comercial', 'S1'): ['09:00', '09:30'],
+        ('comercial', 'S3'): ['10:00'],
+    }
+    rows = [(radio, song, 'A1', time) for (radio, song), values in
+            times.items() for time in values]
+    df = pd.DataFrame(rows, columns=['radio', 'song', 'artist', 'time'])
+    df['date'] = '2020-08-10'
+    # - the order of the plays does not matter
+    return add_datetime(df.sample(frac=1, random_state=0))
+
+
+def test_group_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    group = rng.integers(0, 20, 500)
+    values = rng.integers(0, 1000, 500)
+    result = group_percentiles(group, values, 21, [0, 10, 50, 99, 100])
+
+    for g in range(20):
+        assert np.allclose(result[g],
+                           np.percentile(values[group == g],
+                                         [0, 10, 50, 99, 100]))
+    assert np.isnan(result[20]).all()
+
+
+def test_rotation():
+    df = _plays()
+    for plays in [df, PlayLog.from_frame(df)]:
+        result = rotation(plays).set_index(['radio', 'song'])
+        assert result['plays'].to_dict() == {
+            ('comercial', 'S1'): 2,
+            ('comercial', 'S3'): 1,
+            ('rfm', 'S1'): 5,
+            ('rfm', 'S2'): 5,
+        }
+        assert result.loc[('rfm', 'S1'), 'p50'] == 120.5
+        assert result.loc[('rfm', 'S2'), 'mean_gap'] == 177.5
+        assert np.isnan(result.loc[('comercial', 'S3'), 'p50'])
+        assert result['rotation'][result['rotation']].index.tolist() == [
+            ('rfm', 'S1')
+        ]
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import radio_repeat.scrape_comercial as comercial
+import radio_repeat.scrape_megafm as megafm
+import radio_repeat.scrape_rfm as rfm
+from radio_repeat import scheduler
+from radio_repeat import scraper
+
+
+def test_poll_only_fetches_the_new_slots(stand_in_server, tmp_path):
+    station = rfm.RFM(stand_in_server.url + '/rfm')
+    cache_dir = str(tmp_path / 'pages')
+
+    # - the first poll fetches everything offered up to now
+    scheduler.poll(station, str(tmp_path), now=datetime(2020, 8, 10, 1, 30),
+                   interval=0, cache_dir=cache_dir)
+    assert len(stand_in_server.requests) == 24 + 2
+    today = scraper.read_rows(tmp_path / 'rfm_10_08_2020.csv')
+    assert len(today) == 5
+
+    # - the next one starts at the last stored play, and stores the
+    #   plays it did not have yet only. Yesterday's pages are final.
+    stand_in_server.requests.clear()
+    added = scheduler.poll(station, str(tmp_path),
+                           now=datetime(2020, 8, 10, 2, 10), interval=0,
+                           cache_dir=cache_dir)
+    assert sorted((fields['dia'][0], fields['hora'][0])
+                  for _, fields in stand_in_server.requests) == [
+                      ('today', '1'), ('today', '2')]
+    assert added == 0
+    assert scraper.read_rows(tmp_path / 'rfm_10_08_2020.csv') == today
+
+
+def test_poll_fills_the_gaps(stand_in_server, tmp_path):
+    station = megafm.MegaFM(stand_in_server.url + '/megafm')
+    now = datetime(2020, 8, 10, 0, 20)
+    scheduler.poll(station, str(tmp_path), now=now, interval=0)
+    expected = scraper.read_rows(tmp_path / 'megafm_09_08_2020.csv')
+
+    # - a day that stops early is fetched from where it stops
+    path = tmp_path / 'megafm_09_08_2020.csv'
+    scraper.write_rows(path, expected[:2])
+    stand_in_server.requests.clear()
+    added = scheduler.poll(station, str(tmp_path), now=now, interval=0)
+    assert added == len(expected) - 2
+    assert sorted(scraper.read_rows(path)) == sorted(expected)
+    assert len(stand_in_server.requests) < 2 * 24 * 5
+
+
+def test_poll_skips_the_final_cached_pages(stand_in_server, tmp_path):
+    station = comercial.Comercial(stand_in_server.url + '/comercial')
+    cache_dir = str(tmp_path / 'pages')
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+
+    scheduler.poll(station, str(out_dir), now=datetime(2020, 8, 10, 12),
+                   interval=0, cache_dir=cache_dir)
+    assert len(stand_in_server.requests) == 7
+
+    # - once the day is over, only the new day is requested
+    stand_in_server.requests.clear()
+    scheduler.poll(station, str(out_dir), now=datetime(2020, 8, 11, 0, 5),
+                   interval=0, cache_dir=cache_dir)
+    stand_in_server.requests.clear()
+    scheduler.poll(station, str(out_dir), now=datetime(2020, 8, 11, 1),
+                   interval=0, cache_dir=cache_dir)
+    assert [fields['day'][0] for _, fields in stand_in_server.requests] == [
+        '2020-08-11'
+    ]
+
+
+def test_run_once_survives_a_failed_poll(stand_in_server, tmp_path):
+    stations = [rfm.RFM(stand_in_server.url + '/rfm'),
+                megafm.MegaFM(stand_in_server.url + '/megafm'),
+                comercial.Comercial(stand_in_server.url + '/comercial')]
+    stand_in_server.fail_hours = {'0'}
+
+    def broken(html, slot):
+        raise IndexError('unexpected markup')
+
+    # - neither a network error nor a parsing error stops the loop
+    stations[1].extract = broken
+    scheduler.run(stations, str(tmp_path), once=True, interval=0, retries=0)
+    assert [path.name.split('_')[0] for path in tmp_path.iterdir()
+            ] == ['comercial'] * 7
+
+
+def test_poll_fills_the_holes_in_a_day(stand_in_server, tmp_path):
+    station = rfm.RFM(stand_in_server.url + '/rfm')
+    cache_dir = str(tmp_path / 'pages')
+    now = datetime(2020, 8, 10, 3, 30)
+    scheduler.poll(station, str(tmp_path), now=now, interval=0,
+                   cache_dir=cache_dir)
+    path = tmp_path / 'rfm_10_08_2020.csv'
+    expected = scraper.read_rows(path)
+
+    # - the plays of 01:00-02:00 were lost, e.g. an empty page: the
+    #   hour is requested again, even if later plays are stored
+    scraper.write_rows(path, [row for row in expected
+                              if not row[0].startswith('01:')] +
+                       [('03:10', 'Later', 'Artist')])
+    stand_in_server.requests.clear()
+    added = scheduler.poll(station, str(tmp_path), now=now, interval=0,
+                           cache_dir=cache_dir)
+    assert sorted(fields['hora'][0]
+                  for _, fields in stand_in_server.requests) == ['1', '2', '3']
+    assert added == len([row for row in expected if row[0][:2] == '01'])
+    rows = scraper.read_rows(path)
+    assert [row for row in rows if row[1] != 'Later'] == expected
+    # - the file is still in time order
+    assert rows == sorted(rows, key=lambda row: row[0])
@@ -0,0 +1,193 @@
+import os
+from datetime import datetime
+
+import pytest
+import requests
+
+import radio_repeat.scrape_cidadefm as cidadefm
+import radio_repeat.scrape_comercial as comercial
+import radio_repeat.scrape_megafm as megafm
+import radio_repeat.scrape_rfm as rfm
+from radio_repeat import scraper
+from radio_repeat import fetch
+from radio_repeat.fetch import RateLimiter
+
+
+def _read_outputs(out_dir):
+    outputs = {}
+    for name in sorted(os.listdir(out_dir)):
+        with open(os.path.join(out_dir, name)) as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+def test_rfm_concurrent_scrape(stand_in_server, tmp_path):
+    serial_dir, concurrent_dir = tmp_path / 'serial', tmp_path / 'concurrent'
+    serial_dir.mkdir()
+    concurrent_dir.mkdir()
+
+    endpoint = stand_in_server.url + '/rfm'
+    rfm.scrape(str(serial_dir), endpoint=endpoint, workers=1, interval=0)
+    rfm.scrape(str(concurrent_dir), endpoint=endpoint, workers=8, interval=0)
+
+    serial = _read_outputs(serial_dir)
+    assert serial == _read_outputs(concurrent_dir)
+    assert len(stand_in_server.requests) == 2 * 2 * 24
+
+    rows = list(serial.values())[0].splitlines()
+    assert rows == [
+        '00:00|AGAINST ALL ODDS (TAKE A LOOK AT ME NOW)|PHIL COLLINS',
+        '00:03|GROW|FRANCES', '00:07|SLOWLY|RICHIE CAMPBELL',
+        '01:02|ANTES DELA DIZER QUE SIM|BÁRBARA TINOCO',
+        '01:05|7 SECONDS|YOUSSOU NDOUR [+] NENEH CHERRY'
+    ]
+
+
+def test_megafm_concurrent_scrape(stand_in_server, tmp_path):
+    endpoint = stand_in_server.url + '/megafm'
+    megafm.scrape(str(tmp_path), endpoint=endpoint, workers=16, interval=0)
+
+    assert len(stand_in_server.requests) == 2 * 24 * 5
+    outputs = _read_outputs(tmp_path)
+    assert len(outputs) == 2
+    # - the 23:58 play belongs to the previous day, and repeated pages
+    #   of the same hour are deduplicated
+    rows = list(outputs.values())[0].splitlines()
+    assert rows == [
+        '00:00|DONT RUSH|YOUNG T & BUGSEY feat. HEADIE ONE',
+        '00:05|FESTA|DAVID CARREIRA feat. KEVINHO',
+        '01:09|IN YOUR EYES|THE WEEKND', '01:12|IN MY BONES|RAY DALTON'
+    ]
+
+
+def test_rate_limiter_spaces_requests(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr('time.monotonic', lambda: clock[0])
+    monkeypatch.setattr('time.sleep', sleeps.append)
+
+    limiter = RateLimiter(0.5)
+    for _ in range(3):
+        limiter.wait('https://rfm.sapo.pt/a')
+    limiter.wait('https://megahits.sapo.pt/b')
+
+    assert sleeps == [0.5, 1.0]
+
+
+def test_cidadefm_and_comercial_scrape(stand_in_server, tmp_path):
+    cidadefm.scrape(
+        str(tmp_path), endpoint=stand_in_server.url + '/cidadefm', interval=0)
+    comercial.scrape(
+        str(tmp_path), endpoint=stand_in_server.url + '/comercial', interval=0)
+
+    outputs = _read_outputs(tmp_path)
+    assert len(outputs) == 2 + 7
+    cidadefm_rows = [
+        rows for name, rows in outputs.items() if name.startswith('cidadefm')
+    ][0].splitlines()
+    assert cidadefm_rows == [
+        '00:00|Roses [Imanbek remix]|Saint Jhn',
+        '00:05|Savage Love|Jawsh 685, Jason Derulo'
+    ]
+    comercial_rows = [
+        rows for name, rows in outputs.items() if name.startswith('comercial')
+    ][0].splitlines()
+    assert comercial_rows == [
+        '00:02|Blinding Lights|The Weeknd',
+        '00:06|Mulher Loira|Xutos & Pontapés'
+    ]
+
+
+def test_scrape_keeps_fetched_pages_on_failure(stand_in_server, tmp_path):
+    station = rfm.RFM(stand_in_server.url + '/rfm')
+    plan = scraper.make_plan(station, datetime(2020, 8, 10))
+    stand_in_server.fail_hours = {'2'}
+
+    with pytest.raises(requests.HTTPError):
+        scraper.scrape_plan(station, plan, str(tmp_path), workers=1,
+                            interval=0, retries=0)
+
+    partial = tmp_path / 'rfm_10_08_2020.csv.partial'
+    assert not (tmp_path / 'rfm_10_08_2020.csv').exists()
+    assert len(partial.read_text().splitlines()) == 5
+
+
+def test_scrape_cache_and_replay(stand_in_server, tmp_path):
+    station = rfm.RFM(stand_in_server.url + '/rfm')
+    plan = scraper.make_plan(station, datetime(2020, 8, 10))
+    cache_dir = str(tmp_path / 'pages')
+    out_dir, again_dir, replay_dir = [tmp_path / name
+                                      for name in ['out', 'again', 'replay']]
+    for path in [out_dir, again_dir, replay_dir]:
+        path.mkdir()
+
+    # - a failure keeps the pages that were fetched before it
+    stand_in_server.fail_hours = {'2'}
+    with pytest.raises(requests.HTTPError):
+        scraper.scrape_plan(station, plan, str(out_dir), workers=1,
+                            interval=0, retries=0, cache_dir=cache_dir)
+    stand_in_server.fail_hours = set()
+    assert sorted(os.listdir(tmp_path / 'pages' / 'rfm' / '2020-08-10')) == [
+        '00.html', '01.html', 'checkpoint.json'
+    ]
+
+    # - the next run only fetches the missing pages
+    stand_in_server.requests.clear()
+    scraper.scrape_plan(station, plan, str(out_dir), workers=4, interval=0,
+                        cache_dir=cache_dir)
+    assert len(stand_in_server.requests) == 2 * 24 - 2
+
+    stand_in_server.requests.clear()
+    scraper.scrape_plan(station, plan, str(again_dir), workers=4, interval=0,
+                        cache_dir=cache_dir)
+    assert stand_in_server.requests == []
+
+    station.backend = 'bs4'
+    scraper.replay(station, str(replay_dir), cache_dir)
+    assert stand_in_server.requests == []
+    assert _read_outputs(out_dir) == _read_outputs(again_dir)
+    assert _read_outputs(out_dir) == _read_outputs(replay_dir)
+
+
+def test_scrape_cache_fetches_the_current_day_again(stand_in_server,
+                                                    tmp_path):
+    station = rfm.RFM(stand_in_server.url + '/rfm')
+    plan = scraper.make_plan(station, datetime.today())
+    cache_dir = str(tmp_path / 'pages')
+
+    for _ in range(2):
+        stand_in_server.requests.clear()
+        scraper.scrape_plan(station, plan, str(tmp_path), workers=4,
+                            interval=0, cache_dir=cache_dir)
+    # - the pages of yesterday were final, today's may still change
+    assert len(stand_in_server.requests) == 24
+    assert {fields['dia'][0]
+            for _, fields in stand_in_server.requests} == {'today'}
+
+
+def test_fetch_times_out_on_a_stalled_server(monkeypatch):
+    import socket
+
+    # - accepts the connections but never answers
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    url = f'http://127.0.0.1:{server.getsockname()[1]}/rfm'
+
+    closed = []
+
+    class Session(requests.Session):
+
+        def close(self):
+            closed.append(True)
+            super().close()
+
+    monkeypatch.setattr(fetch, 'make_session', lambda size: Session())
+    try:
+        with pytest.raises(requests.Timeout):
+            fetch.fetch_all([{'method': 'GET', 'url': url}], workers=1,
+                            retries=1, timeout=0.2)
+    finally:
+        server.close()
+    # - the session created by iter_fetch is closed
+    assert closed == [True]
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from radio_repeat.dataset import add_datetime
+from radio_repeat.playlog import PlayLog
+from radio_repeat.similarity import similarity, similarity_matrix
+
+
+def _plays(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'radio': rng.choice(['rfm', 'megafm', 'comercial'], n),
+        'song': rng.choice([f'S{i}' for i in range(40)], n),
+        'artist': rng.choice(['A1', 'A2'], n),
+        'date': rng.choice(['2020-08-10', '2020-08-11', '2020-08-12'], n),
+        'time': '10:00',
+    })
+    return add_datetime(df)
+
+
+def _dense(df):
+    """Reference similarities from the dense radio x song matrix"""
+    counts = pd.crosstab(df['radio'], [df['song'], df['artist']])
+    expected = {}
+    for a in counts.index:
+        for b in counts.index:
+            x, y = counts.loc[a].to_numpy(), counts.loc[b].to_numpy()
+            expected[a, b] = (np.minimum(x, y).sum() / np.maximum(x, y).sum(),
+                              x @ y / np.linalg.norm(x) / np.linalg.norm(y))
+    return expected
+
+
+def test_similarity_matches_the_dense_matrix():
+    df = _plays()
+    expected = _dense(df)
+    for plays in [df, PlayLog.from_frame(df)]:
+        pairs = similarity(plays)
+        assert len(pairs) == 3
+        for a, b, jaccard, cosine in pairs[[
+                'radio_a', 'radio_b', 'jaccard', 'cosine'
+        ]].itertuples(index=False):
+            assert np.allclose([jaccard, cosine], expected[a, b])
+
+
+def test_similarity_by_day():
+    df = _plays()
+    pairs = similarity(df, by_day=True)
+    assert len(pairs) == 3 * 3
+
+    for date, day in df.groupby('date'):
+        expected = _dense(day)
+        for a, b, jaccard, cosine in pairs[pairs['date'] == date][[
+                'radio_a', 'radio_b', 'jaccard', 'cosine'
+        ]].itertuples(index=False):
+            assert np.allclose([jaccard, cosine], expected[a, b])
+
+
+def test_similarity_without_shared_songs():
+    df = add_datetime(
+        pd.DataFrame({
+            'radio': ['rfm', 'rfm', 'megafm'],
+            'song': ['S1', 'S1', 'S2'],
+            'artist': ['A1', 'A1', 'A1'],
+            'date': ['2020-08-10'] * 3,
+            'time': ['10:00', '11:00', '10:00'],
+        }))
+    pairs = similarity(df)
+    assert pairs.empty
+
+    matrix = similarity_matrix(pairs, radios=['megafm', 'rfm'])
+    assert matrix.to_numpy().tolist() == [[1.0, 0.0], [0.0, 1.0]]
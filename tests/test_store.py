@@ -0,0 +1,44 @@
+import pandas as pd
+
+from radio_repeat.dataset import add_datetime, load_dataset
+from radio_repeat.store import write_store
+
+
+def _cleaned_df():
+    df = pd.DataFrame({
+        'time': ['23:59', '00:10', '12:00', '08:30'],
+        'song': ['s1', 's2', 's1', 's3'],
+        'artist': ['a', 'a & b', 'a', None],
+        'date': ['2020-08-10', '2020-08-11', '2020-08-10', '2020-09-01'],
+        'radio': ['rfm', 'rfm', 'megafm', 'rfm'],
+    })
+    df['artists_list'] = df['artist'].str.split(' & ')
+    return df
+
+
+def test_store_round_trip(tmp_path):
+    root = str(tmp_path / 'all_data')
+    df = _cleaned_df()
+    write_store(df, root)
+    write_store(df, root)
+
+    loaded = load_dataset(root)
+    expected = add_datetime(df.copy())
+    key = ['radio', 'datetime']
+    loaded = loaded.sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(loaded[expected.columns], expected)
+
+
+def test_store_filters(tmp_path):
+    root = str(tmp_path / 'all_data')
+    write_store(_cleaned_df(), root)
+
+    df = load_dataset(root, start='2020-08-11', end='2020-08-31',
+                      radios=['rfm'])
+    assert df['song'].tolist() == ['s2']
+
+    df = load_dataset(root, columns=['song', 'radio'], radios=['megafm'])
+    assert list(df.columns) == ['song', 'radio']
+    assert df['song'].tolist() == ['s1']
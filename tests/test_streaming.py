@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import radio_repeat.analysis as rra
+from radio_repeat.dataset import add_datetime
+from radio_repeat.streaming import RepetitionCounter, streaming_histograms
+
+
+def _plays():
+    df = pd.DataFrame({
+        'date': ['2020-08-10', '2020-08-10', '2020-08-10', '2020-08-11',
+                 '2020-08-11', '2020-08-10', '2020-08-10'],
+        'song': ['S1', 'S1', 'S2', 'S1', 'S3', 'S1', 'S1'],
+        'artist': ['A1', 'A1', 'A2', 'A1', 'A2', 'A1', 'A1'],
+        'radio': ['rfm'] * 5 + ['comercial'] * 2,
+        'time': ['00:01', '00:02', '00:03', '00:04', '00:05', '00:01',
+                 '00:02']
+    })
+    return add_datetime(df)
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3, 7])
+def test_streaming_histograms(chunksize):
+    df = _plays()
+    chunks = [df[i:i + chunksize] for i in range(0, len(df), chunksize)]
+    histograms, days = streaming_histograms(chunks)
+
+    pd.testing.assert_frame_equal(histograms, rra.repetition_histograms(df))
+    assert days == 2
+    assert rra.avg_daily_radio_repetitions(
+        None, 'rfm', histograms,
+        days) == rra.avg_daily_radio_repetitions(df, 'rfm')
+
+
+def test_streaming_rejects_split_days():
+    df = _plays()
+    counter = RepetitionCounter()
+    counter.add(df[:4])
+    with pytest.raises(ValueError):
+        counter.add(df.iloc[[0, 4]])
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from radio_repeat.dataset import add_datetime
+from radio_repeat.playlog import PlayLog
+from radio_repeat.timeline import Timeline
+
+
+def _plays():
+    df = pd.DataFrame({
+        'date': ['2020-08-10'] * 5 + ['2020-08-11'],
+        'song': ['S1', 'S2', 'S3', 'S1', 'S4', 'S5'],
+        'artist': ['A1'] * 6,
+        'radio': ['rfm', 'rfm', 'comercial', 'comercial', 'rfm', 'rfm'],
+        'time': ['10:00', '10:04', '10:02', '10:05', '10:09', '00:01']
+    })
+    return add_datetime(df)
+
+
+def test_locate():
+    timeline = Timeline(_plays())
+    times = pd.to_datetime([
+        '2020-08-10 09:59', '2020-08-10 10:00', '2020-08-10 10:03:59',
+        '2020-08-10 10:04', '2020-08-11 00:00', '2020-08-11 23:59',
+        '2020-08-12 00:00'
+    ])
+    # - the last play is on air until the end of its day
+    assert timeline.locate('rfm', times).tolist() == [-1, 0, 0, 1, 4, 5, -1]
+    assert timeline.locate(['comercial', 'megafm'],
+                           '2020-08-10 10:03').tolist() == [2, -1]
+
+
+def test_now_playing_and_between():
+    df = _plays()
+    for plays in [df, PlayLog.from_frame(df)]:
+        timeline = Timeline(plays)
+
+        now = timeline.now_playing('2020-08-10 10:06')
+        assert now[['radio', 'song']].values.tolist() == [['comercial', 'S1'],
+                                                          ['rfm', 'S2']]
+
+        plays = timeline.between('2020-08-10 10:03', '2020-08-10 10:09',
+                                 radios=['rfm'])
+        assert plays['song'].tolist() == ['S1', 'S2', 'S4']
+
+
+def test_locate_many_times():
+    df = _plays()
+    timeline = Timeline(df)
+    times = np.repeat(df['datetime'].to_numpy(), 1000)
+    positions = timeline.locate(np.repeat(df['radio'].to_numpy(), 1000),
+                                times)
+    assert (positions == np.repeat(np.arange(len(df)), 1000)).all()